@@ -1,8 +1,13 @@
+import os
 import sys
 from PyQt6.QtWidgets import QApplication, QMainWindow
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtCore import QUrl
 
+# Bundled Leaflet and the tile cache live with the UI
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui"))
+from map_scheme import register_map_scheme, install_map_scheme, BASE_URL
+
 class MapApp(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -11,6 +16,7 @@ class MapApp(QMainWindow):
 
         # Web view for map
         self.browser = QWebEngineView()
+        install_map_scheme(self.browser.page().profile())
         self.setCentralWidget(self.browser)
 
         # Example coordinates (lat, lon, name)
@@ -23,7 +29,7 @@ class MapApp(QMainWindow):
 
         # Create HTML with Leaflet
         html = self.generate_map_html(pins)
-        self.browser.setHtml(html, QUrl("https://leafletjs.com/"))
+        self.browser.setHtml(html, QUrl(BASE_URL))
 
     def generate_map_html(self, pins):
         # JS array of markers
@@ -46,8 +52,8 @@ class MapApp(QMainWindow):
             <title>Leaflet Map</title>
             <meta charset="utf-8"/>
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <link rel="stylesheet" href="https://unpkg.com/leaflet/dist/leaflet.css"/>
-            <script src="https://unpkg.com/leaflet/dist/leaflet.js"></script>
+            <link rel="stylesheet" href="leaflet/leaflet.css"/>
+            <script src="leaflet/leaflet.js"></script>
             <style>
                 body, html {{ height: 100%; margin: 0; }}
                 #map {{ height: 90%; width: 100%; }}
@@ -63,7 +69,7 @@ class MapApp(QMainWindow):
 
             <script>
                 var map = L.map('map').setView([40.1772, 44.5035], 8);
-                L.tileLayer('https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png', {{
+                L.tileLayer('tiles/{{z}}/{{x}}/{{y}}.png', {{
                     maxZoom: 19
                 }}).addTo(map);
 
@@ -80,6 +86,7 @@ class MapApp(QMainWindow):
         """
 
 if __name__ == "__main__":
+    register_map_scheme()
     app = QApplication(sys.argv)
     window = MapApp()
     window.show()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Loads many pins into MapWidget and measures pan/zoom frame times.
+
+Pins are scattered around a search area and sent through add_pin() and the batched
+bridge, then a scripted sequence of animated pans and zooms runs in the page while
+requestAnimationFrame records frame intervals. The report gives ingest time, frame
+time percentiles over the sequence and the pin layer's own redraw time.
+--mode markers instead adds one L.marker per pin, the previous implementation, for
+comparison; keep --pins modest in that mode.
+
+Run with a display, or QT_QPA_PLATFORM=offscreen. No tiles are needed.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui"))
+
+import numpy as np
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QTimer
+from map_scheme import register_map_scheme
+from map_widget import MapWidget
+
+CENTER = (-35.3632, 149.1652)
+
+# Animated steps; each waits for 'moveend' before the next
+SEQUENCE_JS = """
+(function() {
+    window.__bench = null;
+    var frames = [], last = null, running = true;
+    function tick(t) {
+        if (last !== null) { frames.push(t - last); }
+        last = t;
+        if (running) { requestAnimationFrame(tick); }
+    }
+    requestAnimationFrame(tick);
+    var steps = [], i = 0;
+    for (var r = 0; r < %(rounds)d; r++) {
+        steps.push(function() { map.panBy([300, 0]); });
+        steps.push(function() { map.panBy([0, 200]); });
+        steps.push(function() { map.zoomIn(); });
+        steps.push(function() { map.panBy([-300, -200]); });
+        steps.push(function() { map.zoomIn(); });
+        steps.push(function() { map.zoomOut(); });
+        steps.push(function() { map.zoomOut(); });
+    }
+    function next() {
+        if (i >= steps.length) {
+            running = false;
+            window.__bench = { frames: frames, draw: pinLayer.lastDrawMs, drawn: pinLayer.drawn };
+            return;
+        }
+        map.once('moveend', function() { setTimeout(next, 30); });
+        steps[i++]();
+    }
+    map.setView([%(lat)f, %(lon)f], %(zoom)d, { animate: false });
+    setTimeout(next, 200);
+})();
+"""
+
+MARKERS_JS = """
+(function() {
+    var start = performance.now();
+    %(pins)s.forEach(function(p) { L.marker([p[0], p[1]]).bindPopup(p[2]).addTo(map); });
+    return performance.now() - start;
+})();
+"""
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark map pan/zoom with many pins")
+    p.add_argument("--pins", type=int, default=100000)
+    p.add_argument("--mode", choices=("canvas", "markers"), default="canvas")
+    p.add_argument("--spread", type=float, default=0.3, help="Standard deviation of pin positions in degrees")
+    p.add_argument("--zoom", type=int, default=10, help="Zoom the sequence starts at")
+    p.add_argument("--rounds", type=int, default=3, help="Repetitions of the pan/zoom sequence")
+    args = p.parse_args()
+
+    register_map_scheme()
+    app = QApplication(sys.argv)
+
+    rng = np.random.default_rng(0)
+    lat = CENTER[0] + rng.normal(0, args.spread, args.pins)
+    lon = CENTER[1] + rng.normal(0, args.spread, args.pins)
+    pins = [(float(a), float(b), f"pin_{i}") for i, (a, b) in enumerate(zip(lat, lon))]
+
+    widget = MapWidget(udp_port=0, max_pins=max(args.pins, 1))
+    widget.resize(1280, 800)
+    widget.show()
+    page = widget.browser.page()
+    state = {'ingest_start': 0.0}
+
+    def report(result):
+        if not result:
+            QTimer.singleShot(200, lambda: page.runJavaScript("window.__bench", report))
+            return
+        frames = np.array(result['frames'])
+        print(f"{len(frames)} frames over the sequence")
+        for q in (50, 95, 99):
+            print(f"  p{q} frame time: {np.percentile(frames, q):7.1f} ms")
+        print(f"  max frame time: {frames.max():7.1f} ms")
+        if args.mode == "canvas":
+            print(f"  last pin redraw: {result['draw']:.1f} ms for {result['drawn']} pins/clusters on screen")
+        app.quit()
+
+    def run_sequence():
+        print(f"{args.mode}: {args.pins} pins ingested in {time.perf_counter() - state['ingest_start']:.2f} s "
+              f"(bridge {widget.last_flush_ms:.1f} ms, JS {widget.last_js_ms:.1f} ms)")
+        page.runJavaScript(SEQUENCE_JS % {'rounds': args.rounds, 'lat': CENTER[0], 'lon': CENTER[1],
+                                          'zoom': args.zoom})
+        QTimer.singleShot(500, lambda: page.runJavaScript("window.__bench", report))
+
+    def on_markers_added(js_ms):
+        widget.last_js_ms = js_ms or 0.0
+        run_sequence()
+
+    def ingest(ok):
+        if not ok:
+            print("Map page failed to load")
+            app.quit()
+            return
+        state['ingest_start'] = time.perf_counter()
+        if args.mode == "canvas":
+            for pin in pins:
+                widget.add_pin(*pin)
+            widget.flush_updates()
+            # Round trip: the callback runs once the page has applied the batch
+            page.runJavaScript("pinLayer.stats()", lambda _: run_sequence())
+        else:
+            page.runJavaScript(MARKERS_JS % {'pins': json.dumps(pins)}, on_markers_added)
+
+    widget.browser.loadFinished.connect(ingest)
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
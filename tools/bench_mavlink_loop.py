@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Measures MAVLink worker throughput and disconnect latency against a SITL-style replay.
+
+A sender replays a telemetry mix (or a recorded .tlog with --tlog) over UDP loopback
+as fast as possible, or at --rate messages per second. It runs once against
+MavlinkConnectionWorker and once against the old loop of one blocking
+recv_match(timeout=1.0) per message. The report gives messages handled per second and
+how long stop() takes to end the loop, both while busy and while idle in the
+heartbeat wait.
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui"))
+
+from PyQt6.QtCore import Qt
+from pymavlink import mavutil
+from autopilot_control import MavlinkConnectionWorker
+
+L = mavutil.mavlink
+
+
+def synthetic_replay(seconds):
+    """Encoded messages for `seconds` of a typical ArduCopter SITL stream, in send order."""
+    mav = L.MAVLink(None, srcSystem=1, srcComponent=1)
+    # (rate Hz, factory)
+    streams = [
+        (1, lambda t: mav.heartbeat_encode(L.MAV_TYPE_QUADROTOR, L.MAV_AUTOPILOT_ARDUPILOTMEGA,
+                                           L.MAV_MODE_FLAG_SAFETY_ARMED | L.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED, 4, 4)),
+        (50, lambda t: mav.attitude_encode(int(t * 1000), 0.1, -0.05, 1.2, 0.01, 0.0, 0.02)),
+        (50, lambda t: mav.global_position_int_encode(int(t * 1000), int(47.397742e7), int(8.545594e7 + t * 100),
+                                                      500000, 12000, 150, 0, 0, 9000)),
+        (10, lambda t: mav.vfr_hud_encode(1.5, 1.5, 90, 50, 12.0, 0.0)),
+        (2, lambda t: mav.sys_status_encode(0, 0, 0, 500, 12600, 1500, 87, 0, 0, 0, 0, 0, 0)),
+        (10, lambda t: mav.raw_imu_encode(int(t * 1e6), 1, 2, -1000, 0, 0, 0, 200, 10, -400)),
+        (10, lambda t: mav.servo_output_raw_encode(int(t * 1e6), 0, 1500, 1500, 1500, 1500, 0, 0, 0, 0)),
+        (5, lambda t: mav.gps_raw_int_encode(int(t * 1e6), 3, int(47.397742e7), int(8.545594e7), 500000,
+                                             100, 100, 150, 9000, 12)),
+    ]
+    events = []
+    for rate, factory in streams:
+        for i in range(int(seconds * rate)):
+            events.append((i / rate, factory))
+    events.sort(key=lambda e: e[0])
+    return [factory(t).pack(mav) for t, factory in events]
+
+
+def tlog_replay(path):
+    log = mavutil.mavlink_connection(path)
+    packets = []
+    while True:
+        msg = log.recv_msg()
+        if msg is None:
+            break
+        if msg.get_type() != 'BAD_DATA':
+            packets.append(msg.get_msgbuf())
+    return packets
+
+
+def send(packets, port, rate):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    interval = 1.0 / rate if rate > 0 else 0.0
+    start = time.perf_counter()
+    for i, packet in enumerate(packets):
+        sock.sendto(packet, ("127.0.0.1", port))
+        if interval:
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        elif i % 32 == 31:
+            # Let the receiver keep up instead of overflowing the socket buffer
+            time.sleep(0.001)
+    sock.close()
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def settle(counter, quiet=0.3):
+    """Waits until counter() has not changed for `quiet` seconds; returns it and when it last moved."""
+    total, changed = counter(), time.perf_counter()
+    while time.perf_counter() - changed < quiet:
+        time.sleep(0.005)
+        now = counter()
+        if now != total:
+            total, changed = now, time.perf_counter()
+    return total, changed
+
+
+def run_worker(packets, rate):
+    port = free_port()
+    worker = MavlinkConnectionWorker(f"udpin:127.0.0.1:{port}")
+    finished = threading.Event()
+    # No event loop here, so the signal must call back in the worker thread
+    worker.finished.connect(finished.set, Qt.ConnectionType.DirectConnection)
+    threading.Thread(target=worker.connect_and_run, daemon=True).start()
+    time.sleep(0.2)
+    start = time.perf_counter()
+    send(packets, port, rate)
+    handled, last = settle(lambda: worker.messages_received)
+    elapsed = last - start
+    t_stop = time.perf_counter()
+    worker.stop()
+    finished.wait(5)
+    return handled, elapsed, time.perf_counter() - t_stop
+
+
+def run_recv_match(packets, rate):
+    """The original loop: one blocking recv_match(timeout=1.0) per message."""
+    port = free_port()
+    conn = mavutil.mavlink_connection(f"udpin:127.0.0.1:{port}")
+    state = {'running': True, 'handled': 0, 'stopped': None}
+
+    def loop():
+        while state['running']:
+            msg = conn.recv_match(blocking=True, timeout=1.0)
+            if msg:
+                state['handled'] += 1
+        state['stopped'] = time.perf_counter()
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    time.sleep(0.2)
+    start = time.perf_counter()
+    send(packets, port, rate)
+    handled, last = settle(lambda: state['handled'])
+    elapsed = last - start
+    t_stop = time.perf_counter()
+    state['running'] = False
+    thread.join(5)
+    conn.close()
+    return handled, elapsed, state['stopped'] - t_stop
+
+
+def heartbeat_wait_abort():
+    """Stop latency while the worker is still waiting for a first heartbeat."""
+    worker = MavlinkConnectionWorker(f"udpin:127.0.0.1:{free_port()}")
+    finished = threading.Event()
+    worker.finished.connect(finished.set, Qt.ConnectionType.DirectConnection)
+    threading.Thread(target=worker.connect_and_run, daemon=True).start()
+    time.sleep(0.5)
+    t_stop = time.perf_counter()
+    worker.stop()
+    finished.wait(15)
+    return time.perf_counter() - t_stop
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark the MAVLink worker receive loop")
+    p.add_argument("--seconds", type=float, default=20.0, help="Length of the synthetic replay")
+    p.add_argument("--tlog", help="Replay a recorded telemetry log instead")
+    p.add_argument("--rate", type=float, default=0.0, help="Messages per second (0 = as fast as possible)")
+    args = p.parse_args()
+
+    packets = tlog_replay(args.tlog) if args.tlog else synthetic_replay(args.seconds)
+    print(f"replaying {len(packets)} messages")
+    print(f"{'loop':<12} {'handled':>8} {'lost':>6} {'msg/s':>10} {'stop ms':>9}")
+    for name, run in (("worker", run_worker), ("recv_match", run_recv_match)):
+        handled, elapsed, stop_s = run(packets, args.rate)
+        print(f"{name:<12} {handled:>8} {len(packets) - handled:>6} {handled / elapsed:>10.0f} {stop_s * 1000:>9.1f}")
+    print(f"stop during heartbeat wait: {heartbeat_wait_abort() * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Compares the per-item and batched detection overlays at 10, 100 and 1000 boxes.
+
+For each mode and box count, moving detections are applied with
+update_bounding_boxes() and the scene is rendered into an offscreen image, the
+same work the view does on every detection packet.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui"))
+
+import numpy as np
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtGui import QImage, QPainter
+from PyQt6.QtCore import QRectF
+from video_stream_widget import VideoStreamWidget
+
+
+def make_boxes(rng, count, width=1920, height=1080):
+    x = rng.uniform(0, width - 80, count); y = rng.uniform(0, height - 80, count)
+    w = rng.uniform(10, 80, count); h = rng.uniform(10, 80, count)
+    return np.column_stack([x, y, x + w, y + h, rng.uniform(0, 1, count), np.arange(count)])
+
+
+def bench(widget, mode, count, iterations, target):
+    widget.set_overlay_mode(mode)
+    rng = np.random.default_rng(count)
+    boxes = make_boxes(rng, count)
+    painter = QPainter(target)
+    update_s = render_s = 0.0
+    for _ in range(iterations):
+        boxes[:, 0:4] += rng.uniform(-2, 2, (count, 1))
+        # Both paths are fed the plain lists the JSON detection parser produces
+        payload = boxes.tolist()
+        t0 = time.perf_counter()
+        widget.update_bounding_boxes(payload)
+        t1 = time.perf_counter()
+        widget.scene.render(painter, QRectF(0, 0, target.width(), target.height()))
+        t2 = time.perf_counter()
+        update_s += t1 - t0; render_s += t2 - t1
+    painter.end()
+    widget.update_bounding_boxes([])
+    return update_s / iterations * 1000.0, render_s / iterations * 1000.0
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark per-item vs batched bounding box overlays")
+    p.add_argument("--counts", default="10,100,1000")
+    p.add_argument("--iterations", type=int, default=50)
+    args = p.parse_args()
+
+    app = QApplication(sys.argv)
+    widget = VideoStreamWidget()
+    target = QImage(1280, 720, QImage.Format.Format_RGB32)
+
+    print(f"{'boxes':>6} {'mode':<8} {'update ms':>10} {'repaint ms':>11}")
+    for count in (int(c) for c in args.counts.split(",")):
+        for mode in ("items", "batched"):
+            update_ms, render_ms = bench(widget, mode, count, args.iterations, target)
+            print(f"{count:>6} {mode:<8} {update_ms:>10.3f} {render_ms:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
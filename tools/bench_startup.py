@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Measures ground station cold start: import time per module and time to first paint.
+
+Launches ui/main.py `--runs` times under `python -X importtime` with
+CSIE_STARTUP_PROFILE=1, so the window prints its startup milestones and quits once
+every subsystem is built and the map page has loaded. The report gives the median
+time of each milestone (first_paint is when the window shell first appears) and the
+slowest top-level imports with their cumulative time. --compare also runs with
+CSIE_EAGER_STARTUP=1, which builds everything before showing the window as the UI
+used to. --max-first-paint exits non-zero when the median first paint is slower, so
+a regression can fail a check.
+
+Run with a display, or QT_QPA_PLATFORM=offscreen. Tiles come from the cache only.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "ui", "main.py")
+
+
+def parse_importtime(stderr):
+    """{top-level module: cumulative microseconds} from `-X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        try:
+            _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+            cumulative = int(cumulative)
+        except ValueError:
+            # The header line
+            continue
+        # Nested imports are indented below the module importing them
+        if name == name.lstrip():
+            modules[name] = modules.get(name, 0) + cumulative
+    return modules
+
+
+def parse_milestones(stdout):
+    milestones = {}
+    for line in stdout.splitlines():
+        if line.startswith("[Startup] "):
+            parts = line.split()
+            if len(parts) == 3:
+                try:
+                    milestones[parts[1]] = float(parts[2])
+                except ValueError:
+                    pass
+    return milestones
+
+
+def run_once(eager, timeout):
+    env = dict(os.environ, CSIE_STARTUP_PROFILE="1", CSIE_TILES_OFFLINE="1")
+    env["CSIE_EAGER_STARTUP"] = "1" if eager else "0"
+    env["CSIE_STARTUP_T0"] = repr(time.time())
+    result = subprocess.run([sys.executable, "-X", "importtime", MAIN], env=env, cwd=ROOT,
+                            capture_output=True, text=True, timeout=timeout)
+    return parse_milestones(result.stdout), parse_importtime(result.stderr), result
+
+
+def bench(label, eager, args):
+    milestones, imports = {}, {}
+    for i in range(args.runs):
+        run_milestones, run_imports, result = run_once(eager, args.timeout)
+        if "first_paint" not in run_milestones and "first_paint_fallback" not in run_milestones:
+            print(f"{label} run {i + 1}: no first paint (exit {result.returncode})")
+            print(result.stderr[-2000:])
+            continue
+        for name, seconds in run_milestones.items():
+            milestones.setdefault(name, []).append(seconds)
+        for name, us in run_imports.items():
+            imports.setdefault(name, []).append(us)
+
+    print(f"{label}: {len(milestones.get('main', []))} runs")
+    for name, values in sorted(milestones.items(), key=lambda item: statistics.median(item[1])):
+        print(f"  {name:<22} {statistics.median(values) * 1000:8.0f} ms")
+    medians = {name: statistics.median(values) for name, values in imports.items()}
+    total = sum(medians.values())
+    print(f"  imports: {total / 1000:.0f} ms top-level total; slowest:")
+    for name, us in sorted(medians.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"    {us / 1000:8.1f} ms  {name}")
+    paint = milestones.get("first_paint") or milestones.get("first_paint_fallback")
+    return statistics.median(paint) if paint else None
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark ground station startup time")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    p.add_argument("--compare", action="store_true", help="Also measure eager construction")
+    p.add_argument("--timeout", type=float, default=60, help="Seconds before a run is abandoned")
+    p.add_argument("--max-first-paint", type=float, metavar="MS",
+                   help="Exit with status 1 if the median first paint is slower")
+    args = p.parse_args()
+
+    first_paint = bench("staged", False, args)
+    if args.compare:
+        eager_paint = bench("eager", True, args)
+        if first_paint is not None and eager_paint is not None:
+            print(f"First paint: {first_paint * 1000:.0f} ms staged vs {eager_paint * 1000:.0f} ms eager")
+    if first_paint is None:
+        return 2
+    if args.max_first_paint is not None and first_paint * 1000 > args.max_first_paint:
+        print(f"First paint {first_paint * 1000:.0f} ms exceeds --max-first-paint={args.max_first_paint:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
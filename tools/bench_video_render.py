@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Compares per-frame CPU cost of the raster and OpenGL video renderers.
+
+Pushes synthetic BGR frames through VideoThread.convert_frame and the widget's
+mailbox, then forces a synchronous repaint of the view for every frame.
+On a GPU-less machine run with LIBGL_ALWAYS_SOFTWARE=1 to use Mesa llvmpipe.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui"))
+
+import numpy as np
+from PyQt6.QtWidgets import QApplication
+from video_stream_widget import VideoStreamWidget, VideoThread
+
+
+def bench(app, renderer, frames, width, height, view_w, view_h, adaptive):
+    widget = VideoStreamWidget(renderer=renderer)
+    widget.resize(view_w, view_h)
+    widget.show()
+    app.processEvents()
+    scale = widget.display_scale if adaptive else 1.0
+    thread = VideoThread("bench", widget.frame_mailbox, widget.frame_pool, display_scale=scale)
+
+    rng = np.random.default_rng(0)
+    sources = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(4)]
+
+    # Warm-up so texture/pool allocations are not counted
+    for src in sources:
+        widget.frame_mailbox.post(thread.convert_frame(src))
+        widget.update_video_frame()
+        widget.view.viewport().repaint()
+        app.processEvents()
+
+    cpu_start = time.process_time(); wall_start = time.perf_counter()
+    for i in range(frames):
+        widget.frame_mailbox.post(thread.convert_frame(sources[i % len(sources)]))
+        widget.update_video_frame()
+        widget.view.viewport().repaint()
+        app.processEvents()
+    cpu = (time.process_time() - cpu_start) / frames * 1000.0
+    wall = (time.perf_counter() - wall_start) / frames * 1000.0
+
+    actual = widget.renderer
+    widget.close()
+    widget.deleteLater()
+    app.processEvents()
+    return actual, cpu, wall
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark video renderers (CPU ms per frame)")
+    p.add_argument("--frames", type=int, default=300)
+    p.add_argument("--size", default="1920x1080", help="Source frame size WxH")
+    p.add_argument("--view", default="1280x720", help="Widget size WxH")
+    p.add_argument("--renderers", default="raster,opengl")
+    p.add_argument("--full-res", action="store_true", help="Disable display-size-aware downscaling")
+    args = p.parse_args()
+
+    width, height = (int(v) for v in args.size.split("x"))
+    view_w, view_h = (int(v) for v in args.view.split("x"))
+
+    app = QApplication(sys.argv)
+    print(f"{'renderer':<16} {'cpu ms/frame':>14} {'wall ms/frame':>14}")
+    for renderer in args.renderers.split(","):
+        actual, cpu, wall = bench(app, renderer, args.frames, width, height, view_w, view_h,
+                                  not args.full_res)
+        name = renderer if actual == renderer else f"{renderer}->{actual}"
+        print(f"{name:<16} {cpu:>14.2f} {wall:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Compares size and parse time of JSON and binary detection packets.
+
+JSON parsing includes the conversion to an (N, 6) array that the batched overlay
+and the detection timeline need, so both columns end in the same representation.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui"))
+
+import numpy as np
+from detection_protocol import encode_detections, decode_detections
+from bounding_box_layer import boxes_to_array
+
+
+def make_objects(rng, count):
+    x = rng.uniform(0, 1800, count).round(1); y = rng.uniform(0, 1000, count).round(1)
+    size = rng.uniform(10, 100, count).round(1)
+    conf = rng.uniform(0, 1, count).round(3)
+    return [[float(a), float(b), float(a + s), float(b + s), float(c), i]
+            for i, (a, b, s, c) in enumerate(zip(x, y, size, conf))]
+
+
+def time_per_call(fn, data, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(data)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark JSON vs binary detection packet parsing")
+    p.add_argument("--counts", default="10,100,1000,10000")
+    p.add_argument("--iterations", type=int, default=200)
+    args = p.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'objects':>8} {'json bytes':>11} {'bin bytes':>10} {'json us':>10} {'bin us':>10} {'speedup':>8}")
+    for count in (int(c) for c in args.counts.split(",")):
+        objects = make_objects(rng, count)
+        json_data = json.dumps({"objects": objects, "seq": 1, "ts": time.time()}).encode('utf-8')
+        bin_data = encode_detections(objects, seq=1, ts=time.time())
+        iterations = max(5, args.iterations * 100 // max(count, 100))
+        json_us = time_per_call(lambda d: boxes_to_array(decode_detections(d).objects), json_data, iterations)
+        bin_us = time_per_call(decode_detections, bin_data, iterations)
+        print(f"{count:>8} {len(json_data):>11} {len(bin_data):>10} {json_us:>10.1f} {bin_us:>10.1f} {json_us / bin_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Checks that DetectionTimeline pairs frames with interpolated detections on realistic timing.
+
+Simulates the Pi: an object moves across the frame, frames are captured at --fps and
+arrive --video-latency ms later, and every --detect-every'th frame gets a detection
+packet stamped with the Pi's own clock that arrives --detection-latency ms later,
+both with jitter. Each arriving frame is looked up like VideoStreamWidget does, and
+the box it gets is compared with where the object was when that frame was captured.
+The report lists lookup outcomes and box error for the given --delay (default: the
+widget's default), for video minus detection latency, for no delay, and for drawing
+whatever detection arrived last. Exits with status 1 if fewer than
+--min-interpolated of the lookups with --delay interpolated.
+"""
+import os
+import sys
+import argparse
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui"))
+
+import numpy as np
+from detection_sync import DetectionTimeline, DEFAULT_VIDEO_DELAY_MS, LOOKUP_OUTCOMES
+
+# The Pi's clock is not the laptop's; the timeline must not rely on them agreeing
+PI_CLOCK_OFFSET_S = 1234.5
+
+
+def object_box(t, speed):
+    x = 100.0 + speed * t
+    return [x, 500.0, x + 60.0, 560.0, 0.9, 1.0]
+
+
+def simulate(args, rng):
+    """Arrival events (local seconds) for frames and detections, in order."""
+    events = []
+    for n in range(int(args.seconds * args.fps)):
+        t = n / args.fps
+        video_arrival = t + max(0.0, rng.normal(args.video_latency, args.jitter)) / 1000.0
+        events.append((video_arrival, 'frame', t))
+        if n % args.detect_every == 0:
+            detection_arrival = t + max(0.0, rng.normal(args.detection_latency, args.jitter)) / 1000.0
+            events.append((detection_arrival, 'detection', t))
+    # Replayed in arrival order, as the GUI sees them
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def run(events, delay_ms, speed, hold_latest=False):
+    timeline = DetectionTimeline(video_delay_ms=delay_ms)
+    latest = None
+    errors = []
+    for arrival, kind, t in events:
+        if kind == 'detection':
+            boxes = [object_box(t, speed)]
+            timeline.add(boxes, arrival, ts=t + PI_CLOCK_OFFSET_S)
+            latest = np.array(boxes)
+            continue
+        boxes = latest if hold_latest else (timeline.lookup_frame(SimpleNamespace(t_capture=arrival))
+                                            if len(timeline) else None)
+        if boxes is not None and len(boxes):
+            errors.append(abs(boxes[0][0] - object_box(t, speed)[0]))
+    return timeline.stats(), np.array(errors)
+
+
+def report(label, stats, errors):
+    line = f"{label:<26} error mean {errors.mean():6.1f} px  p95 {np.percentile(errors, 95):6.1f} px"
+    if stats is not None:
+        lookups = sum(stats[k] for k in LOOKUP_OUTCOMES)
+        line += "  " + "  ".join(f"{k} {100 * stats[k] / lookups:3.0f}%" for k in LOOKUP_OUTCOMES)
+    print(line)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Check detection/frame pairing on simulated link timing")
+    p.add_argument("--seconds", type=float, default=30)
+    p.add_argument("--fps", type=float, default=30)
+    p.add_argument("--detect-every", type=int, default=3, help="Frames per detection packet")
+    p.add_argument("--video-latency", type=float, default=160, help="Capture to GUI, ms")
+    p.add_argument("--detection-latency", type=float, default=45, help="Capture to detection arrival, ms")
+    p.add_argument("--jitter", type=float, default=8, help="Standard deviation of both latencies, ms")
+    p.add_argument("--speed", type=float, default=300, help="Object speed, px/s")
+    p.add_argument("--delay", type=float, default=DEFAULT_VIDEO_DELAY_MS, help="Video delay setting, ms")
+    p.add_argument("--min-interpolated", type=float, default=0.5)
+    args = p.parse_args()
+
+    events = simulate(args, np.random.default_rng(0))
+    stats, errors = run(events, args.delay, args.speed)
+    report(f"delay {args.delay:.0f} ms", stats, errors)
+    ideal = args.video_latency - args.detection_latency
+    report(f"delay {ideal:.0f} ms (latency diff)", *run(events, ideal, args.speed))
+    report("delay 0 ms", *run(events, 0.0, args.speed))
+    report("latest detection", None, run(events, 0.0, args.speed, hold_latest=True)[1])
+
+    share = stats['interpolated'] / max(1, sum(stats[k] for k in LOOKUP_OUTCOMES))
+    if share < args.min_interpolated:
+        print(f"Only {share:.0%} of frames were interpolated (< {args.min_interpolated:.0%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,44 +1,57 @@
 # raspberry_pi_udp.py
+import os
+import sys
 import socket
 import json
 import time
 import random
 
+# detection_protocol lives next to the laptop UI
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui"))
+from detection_protocol import encode_detections, decode_control, split_packet
+
 LAPTOP_IP = "127.0.0.1"  # ← Change to your laptop IP
 SEND_PORT = 5005
 RECEIVE_PORT = 5006
+USE_BINARY = True  # False sends the legacy JSON payload
 
 send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 recv_sock.bind(("", RECEIVE_PORT))
 recv_sock.settimeout(0.5)
 
-labels = ["car", "person", "bicycle", "dog", "tree"]
+frame_seq = 0
 
 def generate_random_objects():
+    # One [x_min, y_min, x_max, y_max, conf, id] row per object, in 1920x1080 frame pixels
     objects = []
     for i in range(random.randint(1, 4)):
-        obj = {
-            "x": random.randint(0, 640),
-            "y": random.randint(0, 480),
-            "size": random.randint(10, 100),
-            "label": random.choice(labels),
-            "id": i + 1,
-            "data": random.choice(["moving", "static", "lost"])
-        }
-        objects.append(obj)
-    return {"objects": objects}
+        x = random.randint(0, 1800)
+        y = random.randint(0, 980)
+        size = random.randint(10, 100)
+        objects.append([x, y, x + size, y + size, round(random.random(), 2), i + 1])
+    return objects
 
 def send_objects():
-    packet = generate_random_objects()
-    msg = json.dumps(packet).encode('utf-8')
-    send_sock.sendto(msg, (LAPTOP_IP, SEND_PORT))
-    print(f"[Raspberry Pi] Sent: {packet}")
+    global frame_seq
+    objects = generate_random_objects()
+    # Frame reference so the laptop can pair detections with the matching video frame;
+    # "ts" must be the capture time of the frame the detections were computed on
+    ts = time.time()
+    if USE_BINARY:
+        msg = encode_detections(objects, seq=frame_seq, ts=ts)
+    else:
+        msg = json.dumps({"objects": objects, "seq": frame_seq, "ts": ts}).encode('utf-8')
+    # Packets larger than one datagram go out as chunks of the same frame id
+    for datagram in split_packet(msg, frame_seq):
+        send_sock.sendto(datagram, (LAPTOP_IP, SEND_PORT))
+    frame_seq += 1
+    print(f"[Raspberry Pi] Sent {len(objects)} objects ({len(msg)} bytes)")
 
 def receive_control():
     try:
-        data, _ = recv_sock.recvfrom(2048)
-        command = json.loads(data.decode('utf-8'))
+        data, _ = recv_sock.recvfrom(65535)
+        command = decode_control(data)
         print(f"[Raspberry Pi] Received control: {command}")
     except socket.timeout:
         pass
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Pre-seeds the map tile cache for a mission area, so the map works without network.
+
+Downloads every tile covering a lat/lon bounding box at the chosen zoom levels into
+the same SQLite cache the ground station reads (CSIE_TILE_CACHE_DIR, default
+tile_cache/). Tiles already cached are skipped, so an interrupted run can simply be
+restarted. Bulk downloading from tile.openstreetmap.org is limited by its usage
+policy: keep areas small, or point --url at a tile server you are allowed to seed from.
+"""
+import os
+import sys
+import math
+import time
+import argparse
+import urllib.request
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui"))
+
+from tile_cache import TileCache, default_cache_path, tile_url, USER_AGENT
+
+
+def tile_xy(lat, lon, z):
+    """Web Mercator tile containing a point."""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_in_bbox(south, west, north, east, zooms):
+    for z in zooms:
+        x0, y0 = tile_xy(north, west, z)
+        x1, y1 = tile_xy(south, east, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+
+def parse_zooms(text):
+    """'12-16' or '10,12,14'."""
+    zooms = set()
+    for part in text.split(","):
+        if "-" in part:
+            lo, hi = part.split("-")
+            zooms.update(range(int(lo), int(hi) + 1))
+        else:
+            zooms.add(int(part))
+    return sorted(zooms)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Download map tiles for an area into the offline tile cache")
+    p.add_argument("--bbox", type=float, nargs=4, required=True, metavar=("SOUTH", "WEST", "NORTH", "EAST"),
+                   help="Area to cover, in degrees")
+    p.add_argument("--zooms", default="10-16", help="Zoom levels, e.g. 10-16 or 12,14,16")
+    p.add_argument("--cache", help="Cache file (default: the ground station's cache)")
+    p.add_argument("--max-mb", type=float, default=512, help="Cache size cap in MB")
+    p.add_argument("--url", help="Tile URL template with {z}, {x}, {y} (default: CSIE_TILE_URL or OpenStreetMap)")
+    p.add_argument("--delay", type=float, default=0.1, help="Seconds between downloads")
+    p.add_argument("--max-tiles", type=int, default=20000, help="Refuse larger areas unless --force")
+    p.add_argument("--force", action="store_true")
+    args = p.parse_args()
+
+    south, west, north, east = args.bbox
+    zooms = parse_zooms(args.zooms)
+    tiles = list(tiles_in_bbox(south, west, north, east, zooms))
+    print(f"{len(tiles)} tiles at zoom {zooms[0]}-{zooms[-1]}")
+    if len(tiles) > args.max_tiles and not args.force:
+        print(f"More than --max-tiles={args.max_tiles}; narrow the area or zoom range, or pass --force")
+        return 1
+
+    cache = TileCache(args.cache or default_cache_path(), max_bytes=int(args.max_mb * 1024 * 1024))
+    fetched = skipped = failed = 0
+    start = time.monotonic()
+    try:
+        for i, (z, x, y) in enumerate(tiles, 1):
+            if cache.contains(z, x, y):
+                skipped += 1
+                continue
+            request = urllib.request.Request(tile_url(z, x, y, args.url), headers={"User-Agent": USER_AGENT})
+            try:
+                with urllib.request.urlopen(request, timeout=15) as response:
+                    cache.put(z, x, y, response.read())
+                fetched += 1
+            except OSError as e:
+                failed += 1
+                print(f"  {z}/{x}/{y}: {e}")
+            if i % 100 == 0:
+                print(f"  {i}/{len(tiles)}: {fetched} fetched, {skipped} cached, {failed} failed")
+            time.sleep(args.delay)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun to continue")
+    stats = cache.stats()
+    cache.close()
+    print(f"{fetched} fetched, {skipped} already cached, {failed} failed in {time.monotonic() - start:.0f}s; "
+          f"cache holds {stats['tiles']} tiles, {stats['bytes'] / 1e6:.1f} MB, {stats['evictions']} evicted")
+    if stats['evictions']:
+        print("The cache cap evicted tiles from this run; raise --max-mb to keep the whole area")
+    return 0 if not failed else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Loopback stress test for chunked detection packets.
+
+A sender thread pushes frames of `--objects` detections (10k by default, ~240 KB,
+well over one datagram) through split_packet; the receiver feeds every datagram
+to a Reassembler, decodes completed frames and checks them against what was sent.
+--loss and --shuffle inject chunk loss and reordering.
+"""
+import os
+import sys
+import time
+import random
+import socket
+import argparse
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui"))
+
+import numpy as np
+from detection_protocol import encode_detections, decode_detections, split_packet, Reassembler
+
+
+def make_frame(seq, count):
+    rng = np.random.default_rng(seq)
+    boxes = np.empty((count, 6))
+    boxes[:, 0:2] = rng.uniform(0, 1800, (count, 2))
+    boxes[:, 2:4] = boxes[:, 0:2] + rng.uniform(10, 100, (count, 2))
+    boxes[:, 4] = rng.uniform(0, 1, count)
+    boxes[:, 5] = np.arange(count)
+    # float32 on the wire; compare against the rounded values
+    boxes[:, :5] = boxes[:, :5].astype(np.float32)
+    return boxes
+
+
+def sender(args, port, done):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    interval = 1.0 / args.rate if args.rate > 0 else 0.0
+    rng = random.Random(1)
+    for seq in range(args.frames):
+        start = time.perf_counter()
+        chunks = split_packet(encode_detections(make_frame(seq, args.objects), seq=seq, ts=time.time()), seq)
+        if args.shuffle:
+            rng.shuffle(chunks)
+        for chunk in chunks:
+            if rng.random() >= args.loss:
+                sock.sendto(chunk, ("127.0.0.1", port))
+        remaining = interval - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+    done.set()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Loopback stress test for detection packet chunking")
+    p.add_argument("--frames", type=int, default=200)
+    p.add_argument("--objects", type=int, default=10000)
+    p.add_argument("--rate", type=float, default=10.0, help="Frames per second (0 = as fast as possible)")
+    p.add_argument("--loss", type=float, default=0.0, help="Probability of dropping each chunk")
+    p.add_argument("--shuffle", action="store_true", help="Send the chunks of each frame in random order")
+    args = p.parse_args()
+
+    recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    recv_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+    recv_sock.bind(("127.0.0.1", 0))
+    recv_sock.settimeout(0.2)
+    port = recv_sock.getsockname()[1]
+
+    done = threading.Event()
+    thread = threading.Thread(target=sender, args=(args, port, done), daemon=True)
+    reassembler = Reassembler()
+    decoded = corrupt = 0
+    bytes_in = 0
+    start = time.perf_counter()
+    thread.start()
+    while True:
+        try:
+            data, _ = recv_sock.recvfrom(65535)
+        except socket.timeout:
+            if done.is_set():
+                break
+            continue
+        bytes_in += len(data)
+        payload = reassembler.feed(data)
+        if payload is None:
+            continue
+        packet = decode_detections(payload)
+        decoded += 1
+        if not np.array_equal(packet.objects, make_frame(packet.seq, args.objects)):
+            corrupt += 1
+    elapsed = time.perf_counter() - start
+
+    stats = reassembler.stats()
+    print(f"frames sent      {args.frames} x {args.objects} objects")
+    print(f"frames decoded   {decoded} ({corrupt} corrupt)")
+    for key in ('reassembled', 'dropped', 'late', 'late_chunks', 'duplicates', 'malformed', 'pending_frames'):
+        print(f"{key:<16} {stats[key]}")
+    print(f"throughput       {bytes_in / elapsed / 1e6:.1f} MB/s over {elapsed:.1f} s")
+    return 1 if corrupt else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,14 @@
 # laptop_udp.py
+import os
+import sys
 import socket
 import json
 import time
 import random
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui"))
+from detection_protocol import decode_detections
+
 RASPBERRY_IP = "127.0.0.1"  # ← Change to your Pi IP
 SEND_PORT = 5006
 RECEIVE_PORT = 5005
@@ -29,9 +34,9 @@ def send_control():
 
 def receive_objects():
     try:
-        data, _ = recv_sock.recvfrom(2048)
-        objects = json.loads(data.decode('utf-8'))
-        print(f"[Laptop] Received: {objects}")
+        data, _ = recv_sock.recvfrom(65535)
+        packet = decode_detections(data)
+        print(f"[Laptop] Received: {packet.objects}")
     except socket.timeout:
         pass
 
@@ -1,8 +1,18 @@
 #!/usr/bin/env python3
+import math
 import time
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QGroupBox, QFormLayout, QLineEdit, QPushButton, QHBoxLayout, QLabel
-from PyQt6.QtCore import QThread, QObject, pyqtSignal, pyqtSlot
+import queue
+import functools
+import select
+import socket
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QGroupBox, QFormLayout, QLineEdit, QPushButton, QHBoxLayout, QLabel, QSpinBox, QComboBox, QCheckBox, QSlider, QFileDialog
+from PyQt6.QtCore import Qt, QThread, QObject, pyqtSignal, pyqtSlot
 from pymavlink import mavutil
+from telemetry import FleetTelemetry, MessageRateStats, STREAMED_MESSAGES
+from flight_recorder import FlightRecorder, ReplayWorker, default_log_path
+from mavlink_commands import CommandTracker
+from mavlink_outbound import OutboundChannel
+from link_stats import LinkStats
 
 
 # Worker class to handle MAVLink communication in a separate thread
@@ -11,18 +21,60 @@ class MavlinkConnectionWorker(QObject):
     Handles MAVLink communication in a non-blocking way.
     Runs in a separate QThread.
     """
-    # Signal emits a dictionary with drone telemetry data
-    drone_data_updated = pyqtSignal(dict)
+    # Signal emits {(sysid, compid): TelemetrySnapshot} of the vehicles that changed,
+    # at most publish_rate times per second
+    fleet_updated = pyqtSignal(object)
+    # Signal emits {message type: Hz} as received, once per second
+    message_rates_updated = pyqtSignal(dict)
+    # Signal emits a CommandResult when a command is acknowledged or given up on
+    command_result = pyqtSignal(object)
+    # Signal emits CommandTracker.rtt_stats() after every completed command
+    command_stats_updated = pyqtSignal(dict)
+    # Signal emits LinkStats.summary() once per second
+    link_stats_updated = pyqtSignal(dict)
     # Signal emits connection status updates
     connection_status = pyqtSignal(str)
     # Signal to tell the thread to finish
     finished = pyqtSignal()
 
-    def __init__(self, connection_string, parent=None):
+    # Seconds to wait for the COMMAND_ACK of SET_MESSAGE_INTERVAL before falling back
+    INTERVAL_ACK_TIMEOUT = 1.5
+    # Seconds to wait for the first heartbeat before giving up
+    HEARTBEAT_TIMEOUT = 10.0
+    # Longest single wait, so rate stats and ACK timeouts are still serviced on an idle link
+    MAX_WAIT = 0.25
+    # Messages handled per wakeup before publishing, so a flood cannot delay the UI
+    MAX_DRAIN = 1000
+
+    def __init__(self, connection_string, publish_rate=15.0, message_rates=None, record_path=None, baud=57600,
+                 parent=None):
         super().__init__(parent)
         self.connection_string = connection_string
+        self.baud = baud
         self.running = False
         self.mavlink_connection = None
+        # tlog of every received frame, when recording
+        self.record_path = record_path
+        self.recorder = None
+        self.fleet = FleetTelemetry(publish_rate, on_vehicle_added=self.on_vehicle_added)
+        self.rate_stats = MessageRateStats()
+        self.link_stats = LinkStats()
+        self.messages_received = 0
+        # Requested rate per streamed message, in Hz (0 = off)
+        self.message_rates = {name: rate for name, (rate, _) in STREAMED_MESSAGES.items()}
+        self.message_rates.update(message_rates or {})
+        # Rate changes and commands queued by the GUI thread, run by the worker loop
+        self._requests = queue.SimpleQueue()
+        # Every outbound message, written by the worker once per loop wakeup
+        self.outbound = OutboundChannel()
+        # Commands awaiting their COMMAND_ACK, from the GUI and for message intervals
+        self.commands = CommandTracker(self._send_command_long)
+        # Vehicles without SET_MESSAGE_INTERVAL, streamed through the legacy data stream groups
+        self._legacy_vehicles = set()
+        # Written by stop() and set_message_rate() to wake the worker out of select()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
 
     def connect_and_run(self):
         """
@@ -34,99 +86,226 @@ class MavlinkConnectionWorker(QObject):
             self.finished.emit()
             return
 
+        # Set before the heartbeat wait so stop() can abort it
+        self.running = True
         try:
             print(f"[Mavlink] Attempting to connect to {self.connection_string}")
             # Establish connection
-            self.mavlink_connection = mavutil.mavlink_connection(self.connection_string, autoreconnect=True, baud=57600)
-            self.mavlink_connection.wait_heartbeat()
-            print(f"[Mavlink] Heartbeat received! System {self.mavlink_connection.target_system} Component {self.mavlink_connection.target_component}")
-            self.connection_status.emit(f"Connected to SYSID {self.mavlink_connection.target_system}")
-            self.running = True
+            self.mavlink_connection = mavutil.mavlink_connection(self.connection_string, autoreconnect=True, baud=self.baud)
+            self.outbound.attach(self.mavlink_connection)
+            if isinstance(self.mavlink_connection, mavutil.mavserial):
+                # 8N1 framing: ten bits on the wire per byte
+                self.link_stats.capacity = self.baud / 10
+            if self.record_path:
+                self.recorder = FlightRecorder(self.record_path)
+                print(f"[Mavlink] Recording to {self.record_path}")
+            if not self.wait_heartbeat(self.HEARTBEAT_TIMEOUT):
+                raise TimeoutError(f"no heartbeat within {self.HEARTBEAT_TIMEOUT:.0f}s" if self.running else "cancelled")
+            sysid, compid = next(iter(self.fleet.vehicles))
+            print(f"[Mavlink] Heartbeat received! System {sysid} Component {compid}")
+            self.connection_status.emit(f"Connected to SYSID {sysid}")
         except Exception as e:
             print(f"[Mavlink] Connection error: {e}")
             self.connection_status.emit(f"Connection Failed: {e}")
+            self.running = False
+            self.close()
             self.finished.emit()
             return
 
-        # Request necessary data streams from the autopilot
-        self.request_data_streams()
-
-        telemetry_data = {
-            'lat': 0.0,
-            'lon': 0.0,
-            'alt': 0.0,
-            'speed': 0.0,
-            'battery_v': 0.0,
-            'battery_remaining': 0,
-            'mode': 'Unknown',
-            'armed': False
-        }
-
-        # Main loop to receive messages
+        # Main loop: sleep in select() until the link or the wake-up socket is readable,
+        # then handle every message that is pending
         while self.running:
             try:
-                # Wait for a message, blocking for up to 1 second
-                msg = self.mavlink_connection.recv_match(
-                    type=['GLOBAL_POSITION_INT', 'VFR_HUD', 'HEARTBEAT', 'SYS_STATUS'],
-                    blocking=True,
-                    timeout=1.0 
-                )
-                if not msg:
-                    # Timeout occurred, loop again to check self.running
-                    continue
-
-                msg_type = msg.get_type()
-
-                # Parse known message types
-                if msg_type == 'GLOBAL_POSITION_INT':
-                    telemetry_data['lat'] = msg.lat / 1e7
-                    telemetry_data['lon'] = msg.lon / 1e7
-                    telemetry_data['alt'] = msg.relative_alt / 1000.0  # Relative altitude in meters
-                
-                elif msg_type == 'VFR_HUD':
-                    telemetry_data['speed'] = msg.groundspeed # Groundspeed in m/s
-
-                elif msg_type == 'HEARTBEAT':
-                    telemetry_data['armed'] = (msg.base_mode & mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED) > 0
-                    # Try to get the mode name from ArduPilot mapping
-                    mode_name = mavutil.mode_mapping_apm.get(msg.custom_mode, str(msg.custom_mode))
-                    telemetry_data['mode'] = mode_name
-                
-                elif msg_type == 'SYS_STATUS':
-                    telemetry_data['battery_v'] = msg.voltage_battery / 1000.0
-                    telemetry_data['battery_remaining'] = msg.battery_remaining
-
-                # Emit the updated data dictionary
-                self.drone_data_updated.emit(telemetry_data)
+                self._process_requests()
+                # Commands queued above and retries due from the last pass go out together
+                self.link_stats.on_sent(self.outbound.flush())
+
+                # Wake up no later than the pending snapshot or a command retry is due,
+                # so coalesced updates still reach the UI on time
+                timeout = self.MAX_WAIT
+                for due in (self.fleet.time_until_due(), self.commands.time_until_due()):
+                    if due is not None:
+                        timeout = min(timeout, due)
+                self.wait_readable(timeout)
+                now = time.monotonic()
+                self.drain_messages(now)
+
+                # Publish at the UI rate; messages in between are coalesced
+                changed = self.fleet.take_due(now)
+                if changed is not None:
+                    self.fleet_updated.emit(changed)
+
+                rates = self.rate_stats.update(now)
+                if rates is not None:
+                    self.message_rates_updated.emit(rates)
+                link = self.link_stats.update(now)
+                if link is not None:
+                    self.link_stats_updated.emit(link)
+                self.commands.poll(now)
 
             except Exception as e:
                 print(f"[Mavlink] Error in message loop: {e}")
-                time.sleep(1) # Don't spam errors
+                self.wait_readable(1.0, wake_only=True) # Don't spam errors
         
+        self.close()
         print("[Mavlink] Worker loop stopped.")
         self.finished.emit()
 
-    def request_data_streams(self):
-        """Requests standard data streams from the autopilot."""
+    def wait_readable(self, timeout, wake_only=False):
+        """
+        Sleeps until the link has data, a wake-up arrives or `timeout` elapses; returns
+        True if the link is readable. Links without a selectable descriptor (serial
+        ports on Windows) fall back to pymavlink's own polling select.
+        """
+        fd = None if wake_only else getattr(self.mavlink_connection, 'fd', None)
+        if fd is None and not wake_only:
+            return self.mavlink_connection.select(min(timeout, 0.02))
+        watched = [self._wake_r] if fd is None else [self._wake_r, fd]
+        try:
+            readable, _, _ = select.select(watched, [], [], timeout)
+        except (OSError, ValueError):
+            # The descriptor was closed under us, e.g. during an autoreconnect
+            return False
+        if self._wake_r in readable:
+            try:
+                while self._wake_r.recv(4096):
+                    pass
+            except BlockingIOError:
+                pass
+        return fd is not None and fd in readable
+
+    def drain_messages(self, now):
+        """Handles every message pymavlink can parse from what is pending; returns the count."""
+        conn = self.mavlink_connection
+        count = 0
+        while count < self.MAX_DRAIN:
+            msg = conn.recv_msg()
+            if msg is None:
+                break
+            count += 1
+            self.handle_message(msg, now)
+        return count
+
+    def handle_message(self, msg, now):
+        msg_type = msg.get_type()
+        self.messages_received += 1
+        self.link_stats.on_message(msg, now)
+        if self.recorder and msg_type != 'BAD_DATA':
+            self.recorder.write(msg)
+        self.rate_stats.count(msg_type)
+        if msg_type == 'COMMAND_ACK':
+            self.commands.on_ack(msg)
+        else:
+            self.fleet.fold(msg, now)
+
+    def wait_heartbeat(self, timeout):
+        """Waits for the first vehicle heartbeat; bounded and abortable by stop()."""
+        deadline = time.monotonic() + timeout
+        while self.running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.wait_readable(min(remaining, self.MAX_WAIT))
+            while True:
+                msg = self.mavlink_connection.recv_msg()
+                if msg is None:
+                    break
+                self.handle_message(msg, time.monotonic())
+                if self.fleet.vehicles:
+                    return True
+        return False
+
+    def on_vehicle_added(self, vehicle):
+        print(f"[Mavlink] New vehicle: System {vehicle[0]} Component {vehicle[1]}")
+        self.request_data_streams(vehicle)
+
+    def request_data_streams(self, vehicle):
+        """Requests every streamed message from a vehicle at its configured rate."""
         if not self.mavlink_connection:
             return
-            
-        # Request streams at 2 Hz
-        rate = 2
-        for stream in [mavutil.mavlink.MAV_DATA_STREAM_EXTENDED_STATUS, 
-                       mavutil.mavlink.MAV_DATA_STREAM_POSITION, 
-                       mavutil.mavlink.MAV_DATA_STREAM_EXTRA1]:
-            self.mavlink_connection.mav.request_data_stream_send(
-                self.mavlink_connection.target_system,
-                self.mavlink_connection.target_component,
+        for name, rate in self.message_rates.items():
+            self.request_message_interval(vehicle, name, rate)
+
+    def set_message_rate(self, msg_name, rate_hz):
+        """Queues a rate change for one message type; safe to call from the GUI thread."""
+        self._requests.put(functools.partial(self._apply_message_rate, msg_name, rate_hz))
+        self._wake()
+
+    def submit_command(self, target, command, params=(), name=None):
+        """Queues a COMMAND_LONG for a (sysid, compid) target; safe to call from the GUI thread."""
+        self._requests.put(functools.partial(self.commands.submit, target, command, params, name,
+                                             on_result=self.on_command_result))
+        self._wake()
+
+    def send_message(self, msg):
+        """Queues any MAVLink message for the link; safe to call from the GUI thread."""
+        self.outbound.post(msg)
+        self._wake()
+
+    def _process_requests(self):
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                return
+            request()
+
+    def _apply_message_rate(self, msg_name, rate_hz):
+        self.message_rates[msg_name] = rate_hz
+        for vehicle in self.fleet.vehicles:
+            self.request_message_interval(vehicle, msg_name, rate_hz)
+
+    def request_message_interval(self, vehicle, msg_name, rate_hz):
+        """Sends MAV_CMD_SET_MESSAGE_INTERVAL for one message to one vehicle; 0 Hz stops it."""
+        if vehicle in self._legacy_vehicles:
+            self.request_legacy_streams(vehicle)
+            return
+        msg_id = getattr(mavutil.mavlink, f"MAVLINK_MSG_ID_{msg_name}")
+        interval_us = 1e6 / rate_hz if rate_hz > 0 else -1
+        self.commands.submit(vehicle, mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL, [msg_id, interval_us],
+                             name=f"SET_MESSAGE_INTERVAL {msg_name}", retries=0, timeout=self.INTERVAL_ACK_TIMEOUT,
+                             on_result=functools.partial(self._on_interval_result, msg_name), supersede=False)
+
+    def _on_interval_result(self, msg_name, result):
+        if result.ok or result.superseded or result.target in self._legacy_vehicles:
+            return
+        outcome = f"rejected ({result.result_text})" if result.result is not None else "not acknowledged"
+        print(f"[Mavlink] SYSID {result.target[0]}: SET_MESSAGE_INTERVAL for {msg_name} {outcome}, using data streams")
+        # An autopilot without SET_MESSAGE_INTERVAL gets every rate through data streams
+        self._legacy_vehicles.add(result.target)
+        self.commands.cancel(result.target, mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL)
+        self.request_legacy_streams(result.target)
+
+    def request_legacy_streams(self, vehicle):
+        """
+        Fallback for autopilots without SET_MESSAGE_INTERVAL. A data stream sets the rate
+        of its whole group, so it runs at the highest rate asked of any of its messages.
+        """
+        stream_rates = {}
+        for name, (_, stream) in STREAMED_MESSAGES.items():
+            stream_rates[stream] = max(stream_rates.get(stream, 0), self.message_rates[name])
+        for stream, rate in stream_rates.items():
+            self.outbound.send(mavutil.mavlink.MAVLink_request_data_stream_message(
+                vehicle[0],
+                vehicle[1],
                 stream,
-                rate,
-                1   # Start
-            )
+                math.ceil(rate),
+                1 if rate > 0 else 0  # Start / stop
+            ))
+
+    def _send_command_long(self, target, command, confirmation, params):
+        self.outbound.send(mavutil.mavlink.MAVLink_command_long_message(
+            target[0], target[1], command, confirmation, *params))
+
+    def on_command_result(self, result):
+        print(f"[Mavlink] {result.name} -> SYSID {result.target[0]}: {result.result_text} "
+              f"after {result.attempts} attempt(s), {result.elapsed_ms:.0f} ms")
+        self.command_result.emit(result)
+        self.command_stats_updated.emit(self.commands.rtt_stats())
 
-    def get_connection(self):
-        """Allows the main thread to get the connection object for sending commands."""
-        return self.mavlink_connection
+    def set_publish_rate(self, rate_hz):
+        """UI refresh rate in Hz; safe to call from the GUI thread."""
+        self.fleet.set_rate(rate_hz)
 
     def stop(self):
         """
@@ -134,19 +313,52 @@ class MavlinkConnectionWorker(QObject):
         """
         print("[Mavlink] Stopping worker...")
         self.running = False
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            # Buffer full (a wake-up is already pending) or already closed
+            pass
+
+    def close(self):
+        """Closes the link and the wake-up socket; runs in the worker thread once the loop exits."""
+        if self.mavlink_connection:
+            try:
+                # Last commands queued before stop(), e.g. a disarm
+                self.outbound.flush()
+                out = self.outbound.stats()
+                print(f"[Mavlink] Sent {out['messages_sent']} messages ({out['bytes_sent']} bytes) "
+                      f"in {out['writes']} writes")
+                self.mavlink_connection.close()
+            except Exception as e:
+                print(f"[Mavlink] Error closing connection: {e}")
+        if self.recorder:
+            self.recorder.close()
+            print(f"[Mavlink] Recorded {self.recorder.frames} frames to {self.record_path}")
+            self.recorder = None
+        self._wake_r.close()
+        self._wake_w.close()
 
 
 class AutopilotControlPanel(QWidget):
-    # Signal to send drone position to other widgets (like the map)
+    # Signal to send the selected drone's position to other widgets (like the map)
     drone_position_updated = pyqtSignal(float, float)
+    # Signal with one dict per vehicle whose position changed, once per telemetry publish
+    fleet_positions_updated = pyqtSignal(list)
+    # Emitted when another vehicle is selected, before any of its positions
+    selected_vehicle_changed = pyqtSignal()
 
     def __init__(self, parent=None):
         super().__init__(parent)
         main_layout = QVBoxLayout()
         
-        self.mavlink_connection = None
         self.mavlink_thread = None
         self.mavlink_worker = None
+        # Latest TelemetrySnapshot per (sysid, compid), and the keys in vehicle_combo order
+        self.fleet = {}
+        self.vehicle_keys = []
 
         # Autopilot connection group
         connection_group = QGroupBox("Autopilot Connection")
@@ -156,6 +368,30 @@ class AutopilotControlPanel(QWidget):
         self.autopilot_path_field.setPlaceholderText("e.g., udp:127.0.0.1:14550")
         self.autopilot_path_field.setText("udp:127.0.0.1:14550")
         conn_layout.addRow("Autopilot Path:", self.autopilot_path_field)
+
+        # Only used by serial links; writes never block the GUI whatever the rate
+        self.baud_combo = QComboBox()
+        self.baud_combo.setEditable(True)
+        self.baud_combo.addItems(["57600", "115200", "230400", "460800", "921600"])
+        conn_layout.addRow("Baud Rate:", self.baud_combo)
+
+        # How often telemetry reaches the labels and the map, independent of the message rate
+        self.ui_rate_spinbox = QSpinBox()
+        self.ui_rate_spinbox.setRange(1, 60)
+        self.ui_rate_spinbox.setValue(15)
+        self.ui_rate_spinbox.setSuffix(" Hz")
+        self.ui_rate_spinbox.valueChanged.connect(self.set_ui_rate)
+        conn_layout.addRow("UI Refresh:", self.ui_rate_spinbox)
+
+        # Vehicle that commands go to and whose telemetry is shown
+        self.vehicle_combo = QComboBox()
+        self.vehicle_combo.setPlaceholderText("No vehicles")
+        self.vehicle_combo.currentIndexChanged.connect(self.on_vehicle_selected)
+        conn_layout.addRow("Vehicle:", self.vehicle_combo)
+
+        # Writes every received frame to a .tlog with a sidecar index
+        self.record_checkbox = QCheckBox("Record telemetry log")
+        conn_layout.addRow(self.record_checkbox)
         
         self.connect_button = QPushButton("Connect")
         self.connect_button.clicked.connect(self.connect_autopilot)
@@ -171,6 +407,30 @@ class AutopilotControlPanel(QWidget):
         connection_group.setLayout(conn_layout)
         main_layout.addWidget(connection_group)
 
+        # Replays a recorded .tlog instead of a live link; Disconnect stops it
+        replay_group = QGroupBox("Flight Replay")
+        replay_layout = QFormLayout()
+        self.replay_button = QPushButton("Open Log...")
+        self.replay_button.clicked.connect(self.open_replay)
+        self.replay_speeds = [1.0, 2.0, 5.0, 10.0, 0.0]
+        self.replay_speed_combo = QComboBox()
+        self.replay_speed_combo.addItems(["1x", "2x", "5x", "10x", "Max"])
+        self.replay_speed_combo.currentIndexChanged.connect(self.set_replay_speed)
+        replay_row = QHBoxLayout()
+        replay_row.addWidget(self.replay_button)
+        replay_row.addWidget(self.replay_speed_combo)
+        replay_layout.addRow(replay_row)
+        self.replay_slider = QSlider(Qt.Orientation.Horizontal)
+        self.replay_slider.setRange(0, 1000)
+        self.replay_slider.setEnabled(False)
+        self.replay_slider.sliderReleased.connect(self.seek_replay)
+        self.replay_time_label = QLabel("-")
+        replay_layout.addRow(self.replay_slider)
+        replay_layout.addRow("Position:", self.replay_time_label)
+        self.replay_duration = 0.0
+        replay_group.setLayout(replay_layout)
+        main_layout.addWidget(replay_group)
+
         # Drone commands group
         commands_group = QGroupBox("Drone Commands")
         cmd_layout = QHBoxLayout()
@@ -180,7 +440,16 @@ class AutopilotControlPanel(QWidget):
         self.disarm_button.clicked.connect(self.send_disarm)
         cmd_layout.addWidget(self.arm_button)
         cmd_layout.addWidget(self.disarm_button)
-        commands_group.setLayout(cmd_layout)
+        # Outcome of the last command and round-trip times of acknowledged ones
+        cmd_status_layout = QFormLayout()
+        self.command_result_label = QLabel("-")
+        self.command_rtt_label = QLabel("-")
+        cmd_status_layout.addRow("Last Command:", self.command_result_label)
+        cmd_status_layout.addRow("Command RTT:", self.command_rtt_label)
+        cmd_outer_layout = QVBoxLayout()
+        cmd_outer_layout.addLayout(cmd_layout)
+        cmd_outer_layout.addLayout(cmd_status_layout)
+        commands_group.setLayout(cmd_outer_layout)
         main_layout.addWidget(commands_group)
 
         # Mode change buttons
@@ -203,13 +472,51 @@ class AutopilotControlPanel(QWidget):
         self.speed_label = QLabel("N/A")
         self.battery_label = QLabel("N/A")
         self.current_mode_label = QLabel("N/A")
+        self.attitude_label = QLabel("N/A")
         info_layout.addRow("Position (Lat, Lon, Alt):", self.position_label)
+        info_layout.addRow("Attitude (Roll, Pitch, Yaw):", self.attitude_label)
         info_layout.addRow("Speed:", self.speed_label)
         info_layout.addRow("Battery:", self.battery_label)
         info_layout.addRow("Current Mode:", self.current_mode_label)
         info_group.setLayout(info_layout)
         main_layout.addWidget(info_group)
 
+        # Requested and received rate per telemetry message
+        rates_group = QGroupBox("Telemetry Rates")
+        rates_layout = QFormLayout()
+        self.rate_spinboxes = {}
+        self.received_rate_labels = {}
+        for name, (rate, _) in STREAMED_MESSAGES.items():
+            spinbox = QSpinBox()
+            spinbox.setRange(0, 100)
+            spinbox.setValue(rate)
+            spinbox.setSuffix(" Hz")
+            spinbox.setSpecialValueText("Off")
+            spinbox.valueChanged.connect(lambda value, n=name: self.set_message_rate(n, value))
+            received_label = QLabel("-")
+            row = QHBoxLayout()
+            row.addWidget(spinbox)
+            row.addWidget(received_label)
+            rates_layout.addRow(f"{name}:", row)
+            self.rate_spinboxes[name] = spinbox
+            self.received_rate_labels[name] = received_label
+        self.total_rate_label = QLabel("-")
+        rates_layout.addRow("All messages:", self.total_rate_label)
+        rates_group.setLayout(rates_layout)
+        main_layout.addWidget(rates_group)
+
+        # Loss from MAVLink sequence gaps, throughput and radio signal, over the last 10 s
+        link_group = QGroupBox("Link Quality")
+        link_layout = QFormLayout()
+        self.link_loss_label = QLabel("-")
+        self.link_throughput_label = QLabel("-")
+        self.link_radio_label = QLabel("-")
+        link_layout.addRow("Packet Loss:", self.link_loss_label)
+        link_layout.addRow("Throughput:", self.link_throughput_label)
+        link_layout.addRow("Radio:", self.link_radio_label)
+        link_group.setLayout(link_layout)
+        main_layout.addWidget(link_group)
+
         self.camera_mode_button = QPushButton("Change Camera Mode")
         self.camera_mode_button.clicked.connect(self.change_camera_mode)
         main_layout.addWidget(self.camera_mode_button)
@@ -234,47 +541,86 @@ class AutopilotControlPanel(QWidget):
         self.connect_button.setEnabled(False)
         self.connect_button.setText("Connecting...")
 
+        rates = {name: spinbox.value() for name, spinbox in self.rate_spinboxes.items()}
+        record_path = default_log_path() if self.record_checkbox.isChecked() else None
+        try:
+            baud = int(self.baud_combo.currentText())
+        except ValueError:
+            baud = 57600
+        worker = MavlinkConnectionWorker(autopilot_path, self.ui_rate_spinbox.value(), rates, record_path, baud)
+        self.start_worker(worker, worker.connect_and_run)
+
+    def open_replay(self):
+        if self.mavlink_thread and self.mavlink_thread.isRunning():
+            print("[Autopilot] Disconnect before replaying a log.")
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Open Telemetry Log", "", "Telemetry logs (*.tlog);;All files (*)")
+        if path:
+            self.start_replay(path)
+
+    def start_replay(self, path):
+        if self.mavlink_thread and self.mavlink_thread.isRunning():
+            return
+        self.connect_button.setEnabled(False)
+        speed = self.replay_speeds[self.replay_speed_combo.currentIndex()]
+        worker = ReplayWorker(path, speed, self.ui_rate_spinbox.value())
+        worker.position_changed.connect(self.on_replay_position)
+        self.replay_slider.setEnabled(True)
+        self.start_worker(worker, worker.run)
+
+    def start_worker(self, worker, entry):
+        """Runs a live or replay worker in a new thread and wires it to the panel."""
         # Create thread and worker
         self.mavlink_thread = QThread()
-        self.mavlink_worker = MavlinkConnectionWorker(autopilot_path)
+        self.mavlink_worker = worker
         self.mavlink_worker.moveToThread(self.mavlink_thread)
 
         # Connect signals from worker to slots in this class
-        self.mavlink_worker.drone_data_updated.connect(self.update_drone_display)
+        self.mavlink_worker.fleet_updated.connect(self.on_fleet_updated)
         self.mavlink_worker.connection_status.connect(self.on_connection_status)
+        self.mavlink_worker.message_rates_updated.connect(self.on_message_rates)
+        if self.live_worker():
+            self.mavlink_worker.command_result.connect(self.on_command_result)
+            self.mavlink_worker.command_stats_updated.connect(self.on_command_stats)
+            self.mavlink_worker.link_stats_updated.connect(self.on_link_stats)
         
         # Connect thread management signals
-        self.mavlink_thread.started.connect(self.mavlink_worker.connect_and_run)
-        self.mavlink_worker.finished.connect(self.mavlink_thread.quit)
+        self.mavlink_thread.started.connect(entry)
+        # Direct, so the thread also quits while the GUI thread is blocked in wait()
+        self.mavlink_worker.finished.connect(self.mavlink_thread.quit, Qt.ConnectionType.DirectConnection)
         self.mavlink_worker.finished.connect(self.mavlink_worker.deleteLater)
         self.mavlink_thread.finished.connect(self.mavlink_thread.deleteLater)
-        self.mavlink_thread.finished.connect(self.on_thread_finished)
+        self.mavlink_thread.finished.connect(lambda thread=self.mavlink_thread: self.on_thread_finished(thread))
 
         # Start the thread
         self.mavlink_thread.start()
 
-    def disconnect_autopilot(self):
+    def disconnect_autopilot(self, wait=False):
         print("[Autopilot] Disconnecting...")
         if self.mavlink_worker:
             self.mavlink_worker.stop() # Tell worker loop to stop
-        # Thread will quit and clean up via connected signals
+        # Thread will quit and clean up via connected signals; it keeps its reference
+        # until then, so it is never destroyed while still running
+        if wait and self.mavlink_thread:
+            self.mavlink_thread.wait(1000)
         
         # Reset UI
         self.on_connection_status("Disconnected")
-        self.mavlink_connection = None
-        self.mavlink_thread = None
         self.mavlink_worker = None
 
-    def on_thread_finished(self):
+    def on_thread_finished(self, thread=None):
         print("[Autopilot] MAVLink thread finished.")
+        if thread is not None and thread is not self.mavlink_thread:
+            # A previous worker finishing after a new one was started
+            return
         # Clean up references
-        self.mavlink_connection = None
         self.mavlink_thread = None
         self.mavlink_worker = None
         # Reset UI
         self.connect_button.setEnabled(True)
         self.connect_button.setText("Connect")
         self.disconnect_button.setEnabled(False)
+        self.replay_slider.setEnabled(False)
         self.on_connection_status("Disconnected")
 
     @pyqtSlot(str)
@@ -285,9 +631,9 @@ class AutopilotControlPanel(QWidget):
         if "Connected" in status:
             self.connect_button.setText("Connected")
             self.disconnect_button.setEnabled(True)
-            # Retrieve the connection object from the worker for sending commands
-            if self.mavlink_worker:
-                self.mavlink_connection = self.mavlink_worker.get_connection()
+        elif status.startswith("Replaying"):
+            self.connect_button.setText("Replaying")
+            self.disconnect_button.setEnabled(True)
         elif "Failed" in status or "Error" in status:
             self.connect_button.setEnabled(True)
             self.connect_button.setText("Connect")
@@ -297,73 +643,190 @@ class AutopilotControlPanel(QWidget):
             self.position_label.setText("N/A")
             self.speed_label.setText("N/A")
             self.battery_label.setText("N/A")
+            self.attitude_label.setText("N/A")
+            self.fleet = {}
+            self.vehicle_keys = []
+            self.vehicle_combo.clear()
+            for label in self.received_rate_labels.values():
+                label.setText("-")
+            self.total_rate_label.setText("-")
+            self.total_rate_label.setToolTip("")
+            for label in (self.link_loss_label, self.link_throughput_label, self.link_radio_label):
+                label.setText("-")
+                label.setToolTip("")
+
+    def set_replay_speed(self, index):
+        if isinstance(self.mavlink_worker, ReplayWorker):
+            self.mavlink_worker.set_speed(self.replay_speeds[index])
+
+    def seek_replay(self):
+        if isinstance(self.mavlink_worker, ReplayWorker):
+            self.mavlink_worker.seek(self.replay_slider.value() / 1000 * self.replay_duration)
+
+    @pyqtSlot(float, float)
+    def on_replay_position(self, t, duration):
+        self.replay_duration = duration
+        if not self.replay_slider.isSliderDown() and duration > 0:
+            self.replay_slider.setValue(int(t / duration * 1000))
+        self.replay_time_label.setText(f"{t:.1f} / {duration:.1f} s")
+
+    def set_ui_rate(self, rate_hz):
+        if self.mavlink_worker:
+            self.mavlink_worker.set_publish_rate(rate_hz)
+
+    def set_message_rate(self, msg_name, rate_hz):
+        if self.mavlink_worker:
+            self.mavlink_worker.set_message_rate(msg_name, rate_hz)
 
     @pyqtSlot(dict)
+    def on_message_rates(self, rates):
+        for name, label in self.received_rate_labels.items():
+            label.setText(f"{rates.get(name, 0.0):.1f} Hz received")
+        self.total_rate_label.setText(f"{sum(rates.values()):.0f} msg/s")
+        # Every message type on the link, busiest first
+        self.total_rate_label.setToolTip("\n".join(
+            f"{name}: {rate:.1f} Hz" for name, rate in sorted(rates.items(), key=lambda item: -item[1])))
+
+    @pyqtSlot(dict)
+    def on_link_stats(self, stats):
+        loss = f"{stats['loss_pct']:.1f}% ({stats['lost']} of {stats['received'] + stats['lost']} frames"
+        if stats['bad']:
+            loss += f", {stats['bad']} corrupt"
+        self.link_loss_label.setText(loss + ")")
+        self.link_loss_label.setToolTip("\n".join(
+            f"SYSID {sysid}/{compid}: {source['loss_pct']:.1f}% ({source['lost']} lost)"
+            for (sysid, compid), source in sorted(stats['sources'].items())))
+        throughput = f"in {stats['bytes_in_s']:.0f} B/s, out {stats['bytes_out_s']:.0f} B/s"
+        if stats['utilisation'] is not None:
+            throughput += f" ({stats['utilisation'] * 100:.0f}% of link)"
+        self.link_throughput_label.setText(throughput)
+        radio = stats['radio']
+        if radio is None:
+            self.link_radio_label.setText("No RADIO_STATUS")
+        else:
+            self.link_radio_label.setText(
+                f"RSSI {radio['rssi']}/{radio['remrssi']}, noise {radio['noise']}/{radio['remnoise']}, "
+                f"TX buffer {radio['txbuf']}%")
+            self.link_radio_label.setToolTip(
+                f"Local/remote values; {radio['rxerrors']} RX errors, {radio['fixed']} corrected, "
+                f"{radio['age']:.1f}s old")
+
+    def selected_vehicle(self):
+        """(sysid, compid) of the vehicle selected for commands, or None."""
+        index = self.vehicle_combo.currentIndex()
+        return self.vehicle_keys[index] if 0 <= index < len(self.vehicle_keys) else None
+
+    @pyqtSlot(object)
+    def on_fleet_updated(self, changed):
+        """
+        Slot to receive the snapshots of every vehicle that changed since the last
+        publish; one call per UI interval regardless of fleet size.
+        """
+        for key, data in changed.items():
+            if key not in self.fleet:
+                self.vehicle_keys.append(key)
+                self.vehicle_combo.addItem(data.label)
+        self.fleet.update(changed)
+        if self.vehicle_combo.currentIndex() < 0 and self.vehicle_keys:
+            # The placeholder keeps the combo unselected; default to the first vehicle
+            self.vehicle_combo.setCurrentIndex(0)
+        selected = self.selected_vehicle()
+        if selected in changed:
+            self.update_drone_display(changed[selected])
+        self.publish_fleet_positions(changed.values())
+
+    def on_vehicle_selected(self, index):
+        # Listeners reset per-vehicle state (e.g. the map trail) before the new position arrives
+        self.selected_vehicle_changed.emit()
+        data = self.fleet.get(self.selected_vehicle())
+        if data is not None:
+            self.update_drone_display(data)
+        # Re-send every vehicle so the map can move the highlight
+        self.publish_fleet_positions(self.fleet.values())
+
+    def publish_fleet_positions(self, snapshots):
+        selected = self.selected_vehicle()
+        positions = [{'id': f"{d.sysid}:{d.compid}", 'label': d.label, 'lat': d.lat, 'lon': d.lon,
+                      'heading': d.yaw, 'mode': d.mode, 'armed': d.armed, 'selected': d.key == selected}
+                     for d in snapshots if d.has_position]
+        if positions:
+            self.fleet_positions_updated.emit(positions)
+
     def update_drone_display(self, data):
         """
-        Slot to receive drone data from the MAVLink worker thread.
+        Shows the telemetry snapshot of the selected vehicle.
         """
         # Update labels
-        self.position_label.setText(f"{data['lat']:.6f}, {data['lon']:.6f} @ {data['alt']:.1f}m")
-        self.speed_label.setText(f"{data['speed']:.1f} m/s")
-        self.battery_label.setText(f"{data['battery_remaining']}% ({data['battery_v']:.1f}V)")
-        self.current_mode_label.setText(f"{data['mode']} ({'ARMED' if data['armed'] else 'DISARMED'})")
+        self.position_label.setText(f"{data.lat:.6f}, {data.lon:.6f} @ {data.alt:.1f}m")
+        self.attitude_label.setText(f"{data.roll:.1f}°, {data.pitch:.1f}°, {data.yaw:.1f}°")
+        self.speed_label.setText(f"{data.speed:.1f} m/s")
+        self.battery_label.setText(f"{data.battery_remaining}% ({data.battery_v:.1f}V)")
+        self.current_mode_label.setText(f"{data.mode} ({'ARMED' if data.armed else 'DISARMED'})")
 
         # Emit signal for the map, only if position is valid
-        if data['lat'] != 0.0 or data['lon'] != 0.0:
-             self.drone_position_updated.emit(data['lat'], data['lon'])
+        if data.has_position:
+             self.drone_position_updated.emit(data.lat, data.lon)
+
+    def live_worker(self):
+        """The worker of a live link, or None when disconnected or replaying."""
+        return self.mavlink_worker if isinstance(self.mavlink_worker, MavlinkConnectionWorker) else None
 
     def send_arm(self):
-        if self.mavlink_connection:
-            print("Sending ARM command")
-            self.mavlink_connection.mav.command_long_send(
-                self.mavlink_connection.target_system,
-                self.mavlink_connection.target_component,
-                mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM,
-                0,  # confirmation
-                1,  # 1 to arm, 0 to disarm
-                0, 0, 0, 0, 0, 0  # params 2-7 not used
-            )
+        target = self.selected_vehicle()
+        if self.live_worker() and target:
+            print(f"Sending ARM command to SYSID {target[0]}")
+            # param1: 1 to arm, 0 to disarm
+            self.live_worker().submit_command(target, mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM, [1], "ARM")
         else:
             print("[Autopilot] Not connected, cannot arm.")
 
     def send_disarm(self):
-        if self.mavlink_connection:
-            print("Sending DISARM command")
-            self.mavlink_connection.mav.command_long_send(
-                self.mavlink_connection.target_system,
-                self.mavlink_connection.target_component,
-                mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM,
-                0,  # confirmation
-                0,  # 0 to disarm
-                0, 0, 0, 0, 0, 0  # params 2-7 not used
-            )
+        target = self.selected_vehicle()
+        if self.live_worker() and target:
+            print(f"Sending DISARM command to SYSID {target[0]}")
+            self.live_worker().submit_command(target, mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM, [0], "DISARM")
         else:
             print("[Autopilot] Not connected, cannot disarm.")
 
     def send_mode(self, mode_name):
-        if self.mavlink_connection:
-            print(f"Changing mode to {mode_name}")
+        target = self.selected_vehicle()
+        if self.live_worker() and target:
+            print(f"Changing mode of SYSID {target[0]} to {mode_name}")
             
-            # Find mode ID from string using the connection's mapping
-            mode_id = self.mavlink_connection.mode_mapping().get(mode_name.upper())
+            # Find mode ID from string using the mapping for the vehicle's frame type
+            mode_id = (mavutil.mode_mapping_byname(self.fleet[target].vehicle_type) or {}).get(mode_name.upper())
             
             if mode_id is None:
                 print(f"[Autopilot] Unknown mode: {mode_name}")
                 return
 
-            self.mavlink_connection.mav.set_mode_send(
-                self.mavlink_connection.target_system,
-                mavutil.mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED,
-                mode_id
+            # DO_SET_MODE rather than SET_MODE, so the change is acknowledged
+            self.live_worker().submit_command(
+                target,
+                mavutil.mavlink.MAV_CMD_DO_SET_MODE,
+                [mavutil.mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED, mode_id],
+                f"MODE {mode_name}"
             )
         else:
             print(f"[Autopilot] Not connected, cannot change mode to {mode_name}.")
 
+    @pyqtSlot(object)
+    def on_command_result(self, result):
+        self.command_result_label.setText(
+            f"{result.name}: {result.result_text} ({result.attempts} attempt{'s' if result.attempts > 1 else ''}, "
+            f"{result.elapsed_ms:.0f} ms)")
+
+    @pyqtSlot(dict)
+    def on_command_stats(self, stats):
+        self.command_rtt_label.setText(
+            f"p50 {stats['rtt_p50_ms']:.0f} ms, p95 {stats['rtt_p95_ms']:.0f} ms "
+            f"({stats['retransmissions']} resent, {stats['failed']} failed)")
+        self.command_rtt_label.setToolTip("\n".join(f"{bin_}: {count}" for bin_, count in stats['histogram'].items()))
+
     def change_camera_mode(self):
         print("Camera mode changed (Simulation)")
         
     def closeEvent(self, event):
         # Ensure the thread is stopped when the widget (or window) closes
-        self.disconnect_autopilot()
+        self.disconnect_autopilot(wait=True)
         super().closeEvent(event)
@@ -6,21 +6,44 @@ from PyQt6.QtGui import QPen, QColor, QBrush
 from PyQt6.QtCore import pyqtSignal
 
 class BoundingBoxItem(QGraphicsRectItem):
+    # Shared by all boxes; created on first use since Qt GUI objects need an application
+    _pen = None
+    _brush = None
+
     def __init__(self, metadata: dict, rect: QRectF, on_click_callback=None, *args, **kwargs):
         super().__init__(rect, *args, **kwargs)
         self.metadata = metadata
         self.bbox_id = metadata.get("id", -1)
         self.on_click_callback = on_click_callback
 
-        pen = QPen(QColor("red"))
-        pen.setWidth(2)
-        self.setPen(pen)
-        self.setBrush(QBrush(QColor(255, 0, 0, 50)))
+        if BoundingBoxItem._pen is None:
+            pen = QPen(QColor("red"))
+            pen.setWidth(2)
+            BoundingBoxItem._pen = pen
+            BoundingBoxItem._brush = QBrush(QColor(255, 0, 0, 50))
+        self.setPen(BoundingBoxItem._pen)
+        self.setBrush(BoundingBoxItem._brush)
 
         self.setFlag(QGraphicsRectItem.GraphicsItemFlag.ItemIsSelectable, True)
         self.setAcceptHoverEvents(True)
 
-        self.setToolTip(f"{metadata.get('label', '')} - ID: {self.bbox_id} - {metadata.get('data', '')}")
+        self._tooltip = self.make_tooltip(metadata)
+        self.setToolTip(self._tooltip)
+
+    @staticmethod
+    def make_tooltip(metadata):
+        return f"{metadata.get('label', '')} - ID: {metadata.get('id', -1)} - {metadata.get('data', '')}"
+
+    def update_object(self, metadata: dict, rect: QRectF):
+        """Re-targets the item at a (possibly different) object, touching Qt state only where it changed."""
+        self.metadata = metadata
+        self.bbox_id = metadata.get("id", -1)
+        if rect != self.rect():
+            self.setRect(rect)
+        tooltip = self.make_tooltip(metadata)
+        if tooltip != self._tooltip:
+            self._tooltip = tooltip
+            self.setToolTip(tooltip)
 
     def mousePressEvent(self, event):
         center = self.rect().center()
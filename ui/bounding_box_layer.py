@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+import numpy as np
+from PyQt6.QtWidgets import QGraphicsItem
+from PyQt6.QtCore import QRectF, QRect, Qt
+from PyQt6.QtGui import QPen, QColor, QBrush
+
+# Column layout of a detection array, one row per object
+X_MIN, Y_MIN, X_MAX, Y_MAX, CONF, OBJ_ID = range(6)
+
+
+def boxes_to_array(object_list):
+    """Converts [[x_min, y_min, x_max, y_max, conf, id], ...] into an (N, 6) float array, skipping malformed rows."""
+    if isinstance(object_list, np.ndarray) and object_list.ndim == 2 and object_list.shape[1] == 6:
+        return object_list
+    try:
+        boxes = np.asarray(object_list, dtype=np.float64)
+        if boxes.ndim == 2 and boxes.shape[1] == 6:
+            return boxes
+    except (ValueError, TypeError):
+        pass
+    rows = [row for row in object_list if isinstance(row, (list, tuple)) and len(row) == 6]
+    try:
+        return np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+    except (ValueError, TypeError):
+        return np.empty((0, 6))
+
+
+class BoundingBoxLayer(QGraphicsItem):
+    """
+    Draws every detection box in a single paint() call from an (N, 6) array instead of
+    one QGraphicsRectItem per object. Clicks and tooltips use a vectorized hit test.
+    """
+
+    def __init__(self, bounds: QRectF, on_click_callback=None, parent=None):
+        super().__init__(parent)
+        self.bounds = QRectF(bounds)
+        self.on_click_callback = on_click_callback
+        self.boxes = np.empty((0, 6))
+        self._rects = None  # QRectF list, rebuilt lazily on the next paint
+
+        # Boxes are drawn in device pixels; a 1 px outline is about what the per-item
+        # 2-unit pen ends up as at the usual view scale and strokes several times faster
+        self.pen = QPen(QColor("red"), 1)
+        self.brush = QBrush(QColor(255, 0, 0, 50))
+        self.setAcceptHoverEvents(True)
+        self.setAcceptedMouseButtons(Qt.MouseButton.LeftButton)
+
+    def set_boxes(self, boxes):
+        self.boxes = boxes_to_array(boxes)
+        self._rects = None
+        self.update()
+
+    def boundingRect(self):
+        return self.bounds
+
+    def paint(self, painter, option, widget=None):
+        if not len(self.boxes):
+            return
+        painter.setPen(self.pen)
+        painter.setBrush(self.brush)
+        t = painter.worldTransform()
+        if t.isRotating():
+            if self._rects is None:
+                b = self.boxes
+                self._rects = [QRectF(x0, y0, x1 - x0, y1 - y0)
+                               for x0, y0, x1, y1 in zip(b[:, X_MIN], b[:, Y_MIN], b[:, X_MAX], b[:, Y_MAX])]
+            painter.drawRects(self._rects)
+            return
+        # Map to device pixels with NumPy and draw integer rects: Qt's raster engine takes a
+        # much faster path for those than for transformed QRectF (which become paths).
+        b = self.boxes
+        x0 = np.rint(b[:, X_MIN] * t.m11() + t.dx()).astype(np.int32)
+        y0 = np.rint(b[:, Y_MIN] * t.m22() + t.dy()).astype(np.int32)
+        x1 = np.rint(b[:, X_MAX] * t.m11() + t.dx()).astype(np.int32)
+        y1 = np.rint(b[:, Y_MAX] * t.m22() + t.dy()).astype(np.int32)
+        rects = [QRect(a, c, w, h) for a, c, w, h in zip(x0.tolist(), y0.tolist(), (x1 - x0).tolist(), (y1 - y0).tolist())]
+        painter.save()
+        painter.resetTransform()
+        painter.drawRects(rects)
+        painter.restore()
+
+    def box_at(self, x, y):
+        """Returns the row of the smallest box containing (x, y), or -1."""
+        b = self.boxes
+        if not len(b):
+            return -1
+        hits = np.flatnonzero((b[:, X_MIN] <= x) & (x <= b[:, X_MAX]) & (b[:, Y_MIN] <= y) & (y <= b[:, Y_MAX]))
+        if not hits.size:
+            return -1
+        areas = (b[hits, X_MAX] - b[hits, X_MIN]) * (b[hits, Y_MAX] - b[hits, Y_MIN])
+        return int(hits[np.argmin(areas)])
+
+    def metadata_for(self, row):
+        obj_id = int(self.boxes[row, OBJ_ID])
+        return {"id": obj_id, "label": f"obj_{obj_id}", "data": f"Conf: {self.boxes[row, CONF]:.2f}"}
+
+    def mousePressEvent(self, event):
+        pos = event.pos()
+        row = self.box_at(pos.x(), pos.y())
+        if row < 0:
+            # Not on a box: let items underneath handle the click
+            event.ignore()
+            return
+        metadata = self.metadata_for(row)
+        print(f"Clicked bbox {metadata['id']} @ ({pos.x():.1f}, {pos.y():.1f})")
+        if self.on_click_callback:
+            self.on_click_callback(metadata)
+
+    def hoverMoveEvent(self, event):
+        pos = event.pos()
+        row = self.box_at(pos.x(), pos.y())
+        if row < 0:
+            self.setToolTip("")
+        else:
+            metadata = self.metadata_for(row)
+            self.setToolTip(f"{metadata['label']} - ID: {metadata['id']} - {metadata['data']}")
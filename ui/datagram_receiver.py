@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+import socket
+import weakref
+from PyQt6.QtCore import QObject, QSocketNotifier, pyqtSignal
+
+# Live receivers, for per-port counters across the application
+_receivers = weakref.WeakSet()
+
+
+class DatagramReceiver(QObject):
+    """
+    Event-driven UDP receiver for the GUI thread. A QSocketNotifier wakes the event loop
+    only when datagrams are pending; each wakeup drains the socket and emits the whole
+    burst as one list of (data, addr) tuples, oldest first.
+    """
+    datagrams_received = pyqtSignal(list)
+
+    def __init__(self, port, host="0.0.0.0", bufsize=65535, max_burst=1024, parent=None):
+        super().__init__(parent)
+        self.port = port
+        self.bufsize = bufsize
+        # Upper bound per wakeup so a flood cannot starve the GUI; the notifier is
+        # level-triggered and fires again for whatever is left
+        self.max_burst = max_burst
+        self.packets = 0
+        self.bytes = 0
+        self.bursts = 0
+        self.largest_burst = 0
+        self.errors = 0
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.sock.bind((host, port))
+        except OSError:
+            self.sock.close()
+            raise
+        self.sock.setblocking(False)
+        self.notifier = QSocketNotifier(self.sock.fileno(), QSocketNotifier.Type.Read, self)
+        self.notifier.activated.connect(self._on_ready_read)
+        _receivers.add(self)
+
+    def _on_ready_read(self):
+        batch = []
+        while len(batch) < self.max_burst:
+            try:
+                data, addr = self.sock.recvfrom(self.bufsize)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                # e.g. ICMP port-unreachable surfacing as ConnectionResetError on Windows
+                self.errors += 1
+                print(f"[UDP:{self.port}] Receive error: {e}")
+                break
+            batch.append((data, addr))
+            self.bytes += len(data)
+        if batch:
+            self.packets += len(batch)
+            self.bursts += 1
+            self.largest_burst = max(self.largest_burst, len(batch))
+            self.datagrams_received.emit(batch)
+
+    def set_receive_buffer(self, size):
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+
+    def stats(self):
+        return {
+            'port': self.port,
+            'packets': self.packets,
+            'bytes': self.bytes,
+            'bursts': self.bursts,
+            'largest_burst': self.largest_burst,
+            'errors': self.errors,
+        }
+
+    def close(self):
+        self.notifier.setEnabled(False)
+        self.sock.close()
+        _receivers.discard(self)
+
+
+def receiver_stats():
+    """Packet and byte counters of every open receiver, keyed by port."""
+    return {r.port: r.stats() for r in list(_receivers)}
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Wire format for the Pi <-> laptop detection (UDP 5005) and control (UDP 5006) packets.
+
+Binary packets start with a magic byte that can never begin a JSON document, so
+receivers accept both and fall back to the original JSON payloads:
+
+  detection: header <magic 0xD7, version, flags, seq u32, count u32, ts f64>
+             followed by `count` records <x_min, y_min, x_max, y_max, conf: f32, id: i32>
+  control:   <magic 0xC7, version, camera_mode u8, tracking_mode u8, id i32>
+  chunk:     <magic 0xD8, version, chunk_index u16, chunk_count u16, frame_id u32>
+             followed by a slice of a detection packet too large for one datagram
+
+All fields are little-endian. Bit 0 of the detection flags marks `ts` as present.
+"""
+import json
+import time
+import struct
+from collections import OrderedDict, deque
+from typing import NamedTuple, Optional
+import numpy as np
+
+VERSION = 1
+DETECTION_MAGIC = 0xD7
+CONTROL_MAGIC = 0xC7
+CHUNK_MAGIC = 0xD8
+FLAG_HAS_TS = 0x01
+
+DETECTION_HEADER = struct.Struct("<BBHIId")
+# Object ids are signed like the control packet's, so -1 survives the round trip
+DETECTION_RECORD = np.dtype([("box", "<f4", (5,)), ("id", "<i4")])
+CONTROL_PACKET = struct.Struct("<BBBBi")
+CHUNK_HEADER = struct.Struct("<BBHHI")
+# Keeps chunks under a typical 1500-byte Ethernet MTU after IP/UDP headers
+MAX_DATAGRAM = 1400
+
+
+class DetectionPacket(NamedTuple):
+    objects: np.ndarray  # (N, 6) float64 [x_min, y_min, x_max, y_max, conf, id]
+    seq: Optional[int] = None
+    ts: Optional[float] = None
+    binary: bool = False
+
+
+def encode_detections(objects, seq=0, ts=None):
+    """Packs [[x_min, y_min, x_max, y_max, conf, id], ...] (list or (N, 6) array) into a binary packet."""
+    boxes = np.asarray(objects, dtype=np.float64).reshape(-1, 6)
+    records = np.empty(len(boxes), dtype=DETECTION_RECORD)
+    records["box"] = boxes[:, :5]
+    records["id"] = boxes[:, 5]
+    flags = FLAG_HAS_TS if ts is not None else 0
+    header = DETECTION_HEADER.pack(DETECTION_MAGIC, VERSION, flags, seq & 0xFFFFFFFF, len(records),
+                                   ts if ts is not None else 0.0)
+    return header + records.tobytes()
+
+
+def decode_detections(data):
+    """Decodes a binary or JSON detection datagram; raises ValueError if it is neither."""
+    if not data:
+        raise ValueError("empty detection packet")
+    if data[0] == DETECTION_MAGIC:
+        if len(data) < DETECTION_HEADER.size:
+            raise ValueError("truncated detection header")
+        _, version, flags, seq, count, ts = DETECTION_HEADER.unpack_from(data)
+        if version != VERSION:
+            raise ValueError(f"unsupported detection packet version {version}")
+        if len(data) < DETECTION_HEADER.size + count * DETECTION_RECORD.itemsize:
+            raise ValueError(f"truncated detection packet ({count} records announced)")
+        records = np.frombuffer(data, dtype=DETECTION_RECORD, count=count, offset=DETECTION_HEADER.size)
+        boxes = np.empty((count, 6))
+        boxes[:, :5] = records["box"]
+        boxes[:, 5] = records["id"]
+        return DetectionPacket(boxes, seq, ts if flags & FLAG_HAS_TS else None, True)
+    payload = json.loads(data.decode('utf-8'))
+    if not isinstance(payload, dict) or "objects" not in payload:
+        raise ValueError("JSON packet without 'objects'")
+    seq, ts = payload.get("seq"), payload.get("ts")
+    if seq is not None and (not isinstance(seq, int) or isinstance(seq, bool)):
+        raise ValueError(f"JSON packet with non-integer seq {seq!r}")
+    if ts is not None and (not isinstance(ts, (int, float)) or isinstance(ts, bool) or not np.isfinite(ts)):
+        raise ValueError(f"JSON packet with invalid ts {ts!r}")
+    return DetectionPacket(objects_to_array(payload["objects"]), seq, ts, False)
+
+
+def objects_to_array(objects):
+    """
+    Converts a JSON "objects" value, a list of [x_min, y_min, x_max, y_max, conf, id],
+    into an (N, 6) float array; raises ValueError unless every entry is six finite
+    numbers with an integer id that fits the binary format.
+    """
+    if not isinstance(objects, list):
+        raise ValueError(f"'objects' is {type(objects).__name__}, not a list")
+    if not objects:
+        return np.empty((0, 6))
+    try:
+        # No dtype, so strings, nulls and ragged rows show up as a non-numeric array
+        boxes = np.array(objects)
+    except ValueError:
+        raise ValueError("'objects' rows are not all the same length") from None
+    if boxes.dtype.kind not in "iuf" or boxes.ndim != 2 or boxes.shape[1] != 6:
+        raise ValueError("'objects' must be a list of 6-number rows")
+    boxes = boxes.astype(np.float64)
+    ids = boxes[:, 5]
+    if not np.isfinite(boxes).all():
+        raise ValueError("'objects' contains NaN or infinite values")
+    if np.any(ids != np.round(ids)) or np.any(ids < -2**31) or np.any(ids >= 2**31):
+        raise ValueError("'objects' ids must be 32-bit signed integers")
+    return boxes
+
+
+def encode_control(obj_id, camera_mode=1, tracking_mode=1, binary=True):
+    if not binary:
+        return json.dumps({"id": obj_id, "camera_mode": camera_mode, "tracking_mode": tracking_mode}).encode('utf-8')
+    return CONTROL_PACKET.pack(CONTROL_MAGIC, VERSION, camera_mode, tracking_mode, int(obj_id))
+
+
+def decode_control(data):
+    """Returns a control command as a dict, from either wire format."""
+    if data and data[0] == CONTROL_MAGIC:
+        _, version, camera_mode, tracking_mode, obj_id = CONTROL_PACKET.unpack_from(data)
+        if version != VERSION:
+            raise ValueError(f"unsupported control packet version {version}")
+        return {"id": obj_id, "camera_mode": camera_mode, "tracking_mode": tracking_mode}
+    return json.loads(data.decode('utf-8'))
+
+
+def split_packet(data, frame_id, max_datagram=MAX_DATAGRAM):
+    """Splits a packet into chunk datagrams; packets that already fit are returned unchanged."""
+    if len(data) <= max_datagram:
+        return [data]
+    size = max_datagram - CHUNK_HEADER.size
+    count = -(-len(data) // size)
+    if count > 0xFFFF:
+        raise ValueError(f"packet of {len(data)} bytes needs more than 65535 chunks")
+    frame_id &= 0xFFFFFFFF
+    return [CHUNK_HEADER.pack(CHUNK_MAGIC, VERSION, i, count, frame_id) + data[i * size:(i + 1) * size]
+            for i in range(count)]
+
+
+def _is_older(a, b):
+    """Serial-number comparison of 32-bit frame ids, so wraparound is handled."""
+    return a != b and ((b - a) & 0xFFFFFFFF) < 0x80000000
+
+
+class _PartialFrame:
+    __slots__ = ('chunks', 'received', 'size', 'first_seen')
+
+    def __init__(self, count, now):
+        self.chunks = [None] * count
+        self.received = 0
+        self.size = 0
+        self.first_seen = now
+
+
+class Reassembler:
+    """
+    Rebuilds chunked packets. Incomplete frames are dropped when they time out, when
+    memory bounds are hit (oldest first) or as soon as a newer frame completes, since
+    only the latest detection set is ever displayed.
+    """
+    # A frame id this far behind the newest one means the sender restarted
+    RESTART_GAP = 1024
+
+    def __init__(self, timeout=0.5, max_frames=8, max_bytes=8 * 1024 * 1024):
+        self.timeout = timeout
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self._frames = OrderedDict()
+        self._bytes = 0
+        # Ids of recently completed or dropped frames, to recognise late chunks
+        self._finished = deque(maxlen=256)
+        self._finished_set = set()
+        self._late_ids = OrderedDict()
+        self._newest_completed = None
+        self.reassembled = 0
+        self.dropped = 0
+        # Frames that got chunks after being completed or dropped, and those chunks
+        self.late = 0
+        self.late_chunks = 0
+        self.duplicates = 0
+        self.malformed = 0
+
+    def feed(self, datagram, now=None):
+        """Adds one chunk datagram; returns the reassembled packet once all chunks arrived, else None."""
+        now = time.monotonic() if now is None else now
+        self.expire(now)
+        if len(datagram) < CHUNK_HEADER.size:
+            self.malformed += 1
+            return None
+        magic, version, index, count, frame_id = CHUNK_HEADER.unpack_from(datagram)
+        if magic != CHUNK_MAGIC or version != VERSION or count == 0 or index >= count:
+            self.malformed += 1
+            return None
+        newest = self._newest_completed
+        if newest is not None and _is_older(frame_id, newest) and (newest - frame_id) & 0xFFFFFFFF > self.RESTART_GAP:
+            # Far behind the newest frame: the sender restarted its counter, start over
+            self._newest_completed = None
+            self._finished.clear()
+            self._finished_set.clear()
+            self._late_ids.clear()
+        elif frame_id in self._finished_set or (newest is not None and _is_older(frame_id, newest)):
+            self.late_chunks += 1
+            if frame_id not in self._late_ids:
+                self.late += 1
+                self._late_ids[frame_id] = None
+                if len(self._late_ids) > self._finished.maxlen:
+                    self._late_ids.popitem(last=False)
+            return None
+
+        part = self._frames.get(frame_id)
+        if part is None:
+            part = self._frames[frame_id] = _PartialFrame(count, now)
+        elif len(part.chunks) != count:
+            self.malformed += 1
+            return None
+        if part.chunks[index] is not None:
+            self.duplicates += 1
+            return None
+        chunk = datagram[CHUNK_HEADER.size:]
+        part.chunks[index] = chunk
+        part.received += 1
+        part.size += len(chunk)
+        self._bytes += len(chunk)
+
+        if part.received == count:
+            del self._frames[frame_id]
+            self._bytes -= part.size
+            self._mark_finished(frame_id)
+            self._newest_completed = frame_id
+            self.reassembled += 1
+            for older in [f for f in self._frames if _is_older(f, frame_id)]:
+                self._drop(older)
+            return b"".join(part.chunks)
+
+        while self._frames and (len(self._frames) > self.max_frames or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._frames)))
+        return None
+
+    def expire(self, now):
+        for frame_id, part in list(self._frames.items()):
+            if now - part.first_seen > self.timeout:
+                self._drop(frame_id)
+
+    def _drop(self, frame_id):
+        part = self._frames.pop(frame_id)
+        self._bytes -= part.size
+        self._mark_finished(frame_id)
+        self.dropped += 1
+
+    def _mark_finished(self, frame_id):
+        if len(self._finished) == self._finished.maxlen:
+            self._finished_set.discard(self._finished[0])
+        self._finished.append(frame_id)
+        self._finished_set.add(frame_id)
+
+    def stats(self):
+        return {
+            'reassembled': self.reassembled,
+            'dropped': self.dropped,
+            'late': self.late,
+            'late_chunks': self.late_chunks,
+            'duplicates': self.duplicates,
+            'malformed': self.malformed,
+            'pending_frames': len(self._frames),
+            'pending_bytes': self._bytes,
+        }
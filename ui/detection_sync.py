@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+import bisect
+from collections import deque
+import numpy as np
+
+from bounding_box_layer import boxes_to_array, OBJ_ID
+
+# How much later a frame reaches the GUI than the detections for it: encode, RTP and
+# decode on the video side, minus inference on the detection side. About right for
+# the default H.264 pipeline; calibrate per setup (VideoStreamWidget.set_video_delay)
+# until boxes stay on a moving object
+DEFAULT_VIDEO_DELAY_MS = 120.0
+# Outcomes of lookup(), counted for calibration
+LOOKUP_OUTCOMES = ('interpolated', 'nearest', 'held', 'early')
+
+
+class DetectionTimeline:
+    """
+    Short history of detection sets keyed by time, so each rendered video frame can be
+    paired with the detections that belong to it instead of whatever arrived last.
+
+    Detection packets may carry "ts" (sender capture time, seconds) and "seq". Sender
+    timestamps are mapped onto the local perf_counter clock with a running minimum of
+    (arrival - ts), i.e. the fastest observed transit; packets without "ts" are keyed
+    by their arrival time. Frames are looked up by capture time minus `video_delay_ms`,
+    the extra time video needs over the detection link (encode, jitter buffer, decode).
+    The delay is the video path's latency minus the detection path's and has to be
+    calibrated per setup; with none, frames look newer than every detection set and
+    the latest set is just held. stats() counts how lookups were answered.
+    """
+
+    def __init__(self, capacity=32, max_gap_ms=500.0, video_delay_ms=DEFAULT_VIDEO_DELAY_MS):
+        self.capacity = capacity
+        self.max_gap_ms = max_gap_ms
+        self.video_delay_ms = video_delay_ms
+        self.interpolate = True
+        self._times = []
+        self._sets = []
+        self._offsets = deque(maxlen=64)
+        self.outcomes = dict.fromkeys(LOOKUP_OUTCOMES, 0)
+
+    def __len__(self):
+        return len(self._times)
+
+    def clear(self):
+        self._times.clear()
+        self._sets.clear()
+        self._offsets.clear()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.outcomes = dict.fromkeys(LOOKUP_OUTCOMES, 0)
+
+    def add(self, object_list, arrival_s, ts=None):
+        """Stores a detection set received at `arrival_s` (perf_counter seconds)."""
+        arrival_ms = arrival_s * 1000.0
+        if ts is not None:
+            self._offsets.append(arrival_ms - float(ts) * 1000.0)
+            key = float(ts) * 1000.0 + min(self._offsets)
+        else:
+            key = arrival_ms
+        i = bisect.bisect_right(self._times, key)
+        self._times.insert(i, key)
+        self._sets.insert(i, boxes_to_array(object_list))
+        if len(self._times) > self.capacity:
+            del self._times[0], self._sets[0]
+
+    def lookup_frame(self, frame):
+        return self.lookup(frame.t_capture * 1000.0 - self.video_delay_ms)
+
+    def lookup(self, t_ms):
+        """Returns the (N, 6) detections for local time `t_ms`, interpolated per obj_id when possible."""
+        if not self._times:
+            return None
+        i = bisect.bisect_right(self._times, t_ms)
+        if i == 0:
+            self.outcomes['early'] += 1
+            return self._sets[0]
+        if i == len(self._times):
+            # Newer than every detection set: hold the latest rather than extrapolate
+            self.outcomes['held'] += 1
+            return self._sets[-1]
+        t0, t1 = self._times[i - 1], self._times[i]
+        before, after = self._sets[i - 1], self._sets[i]
+        alpha = (t_ms - t0) / (t1 - t0) if t1 > t0 else 0.0
+        nearest = before if alpha < 0.5 else after
+        if not self.interpolate or t1 - t0 > self.max_gap_ms or not len(before) or not len(after):
+            self.outcomes['nearest'] += 1
+            return nearest
+        self.outcomes['interpolated'] += 1
+        return interpolate_boxes(before, after, alpha, nearest)
+
+    def stats(self):
+        """Lookup outcome counts plus the current delay."""
+        return dict(self.outcomes, video_delay_ms=self.video_delay_ms)
+
+
+def interpolate_boxes(before, after, alpha, nearest):
+    """
+    Linearly interpolates box corners of objects present in both sets; objects present
+    only in `nearest` are passed through unchanged.
+    """
+    common, ib, ia = np.intersect1d(before[:, OBJ_ID], after[:, OBJ_ID], return_indices=True)
+    if not common.size:
+        return nearest
+    out = nearest.copy()
+    rows = np.flatnonzero(np.isin(out[:, OBJ_ID], common))
+    # `common` is sorted, so searchsorted maps each row's id to its ib/ia position
+    pos = np.searchsorted(common, out[rows, OBJ_ID])
+    out[rows, :4] = before[ib[pos], :4] * (1.0 - alpha) + after[ia[pos], :4] * alpha
+    return out
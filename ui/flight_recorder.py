@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Telemetry flight recorder and replay.
+
+Logs use the .tlog layout that MAVProxy, Mission Planner and pymavlink read: each
+record is an 8-byte big-endian timestamp in microseconds since the epoch followed by
+one raw MAVLink frame. Next to every log sits a sidecar index (`<log>.idx`, a .npy
+structured array) with one row per frame: file offset, timestamp, length, message id
+and source. Rows are in time order, so seeking is a binary search, and filtering on
+`msgid` gives the offsets of one message type. A missing or stale index is rebuilt by
+scanning the log.
+"""
+import os
+import mmap
+import time
+import struct
+import threading
+import numpy as np
+from PyQt6.QtCore import QObject, pyqtSignal
+from pymavlink import mavutil
+from telemetry import FleetTelemetry, MessageRateStats, PARSERS
+
+TIMESTAMP = struct.Struct(">Q")
+INDEX_RECORD = np.dtype([("offset", "<u8"), ("t_us", "<u8"), ("length", "<u2"),
+                         ("msgid", "<u4"), ("sysid", "u1"), ("compid", "u1")])
+_INDEX_STRUCT = struct.Struct("<QQHIBB")
+assert _INDEX_STRUCT.size == INDEX_RECORD.itemsize
+
+MAVLINK1_STX = 0xFE
+MAVLINK2_STX = 0xFD
+MAVLINK2_SIGNED = 0x01
+
+
+def index_path(log_path):
+    return log_path + ".idx"
+
+
+def default_log_path(directory=None):
+    directory = directory or os.environ.get("CSIE_LOG_DIR", "flight_logs")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, time.strftime("flight-%Y%m%d-%H%M%S.tlog"))
+
+
+def _frame_info(buf, pos):
+    """(length, msgid, sysid, compid) of the MAVLink frame at `pos`, or None if there is none."""
+    if pos + 8 > len(buf):
+        return None
+    stx = buf[pos]
+    if stx == MAVLINK1_STX:
+        length = buf[pos + 1] + 8
+        info = (length, buf[pos + 5], buf[pos + 3], buf[pos + 4])
+    elif stx == MAVLINK2_STX and pos + 12 <= len(buf):
+        length = buf[pos + 1] + 12 + (13 if buf[pos + 2] & MAVLINK2_SIGNED else 0)
+        info = (length, buf[pos + 7] | buf[pos + 8] << 8 | buf[pos + 9] << 16, buf[pos + 5], buf[pos + 6])
+    else:
+        return None
+    return info if pos + length <= len(buf) else None
+
+
+def build_index(buf):
+    """Scans a tlog and returns its index; stops at the first truncated or corrupt record."""
+    rows = bytearray()
+    pos = 0
+    while pos + TIMESTAMP.size < len(buf):
+        info = _frame_info(buf, pos + TIMESTAMP.size)
+        if info is None:
+            break
+        t_us, = TIMESTAMP.unpack_from(buf, pos)
+        length, msgid, sysid, compid = info
+        rows += _INDEX_STRUCT.pack(pos + TIMESTAMP.size, t_us, length, msgid, sysid, compid)
+        pos += TIMESTAMP.size + length
+    return np.frombuffer(bytes(rows), dtype=INDEX_RECORD)
+
+
+def _index_is_current(index, log_size):
+    if len(index) == 0:
+        return log_size == 0
+    last = index[-1]
+    return int(last["offset"]) + int(last["length"]) == log_size
+
+
+class FlightRecorder:
+    """
+    Appends raw frames to a tlog and keeps the index in memory; close() writes the
+    sidecar. Only used from the MAVLink worker thread.
+    """
+    # Seconds between flushes, bounding what a crash can lose
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "ab")
+        self._offset = self._file.tell()
+        self._index = bytearray()
+        if self._offset:
+            # Appending to an existing log: keep its rows so the sidecar stays complete
+            with open(path, "rb") as f:
+                self._index += build_index(f.read()).tobytes()
+        self._last_flush = time.monotonic()
+        self.frames = 0
+        self.bytes = 0
+
+    def write(self, msg, t=None):
+        """Records one received message with its wall-clock receive time."""
+        frame = msg.get_msgbuf()
+        t_us = int((time.time() if t is None else t) * 1e6)
+        self._file.write(TIMESTAMP.pack(t_us))
+        self._file.write(frame)
+        self._index += _INDEX_STRUCT.pack(self._offset + TIMESTAMP.size, t_us, len(frame), msg.get_msgId(),
+                                          msg.get_srcSystem(), msg.get_srcComponent())
+        self._offset += TIMESTAMP.size + len(frame)
+        self.frames += 1
+        self.bytes += TIMESTAMP.size + len(frame)
+        now = time.monotonic()
+        if now - self._last_flush > self.FLUSH_INTERVAL:
+            self._file.flush()
+            self._last_flush = now
+
+    def close(self):
+        self._file.close()
+        with open(index_path(self.path), "wb") as f:
+            np.save(f, np.frombuffer(bytes(self._index), dtype=INDEX_RECORD))
+
+
+class FlightLog:
+    """A memory-mapped tlog with its index, for random access by time and message type."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.index = self._load_index(size)
+        # Contiguous copies of the columns used per frame during replay
+        self._t_us = np.array(self.index["t_us"], dtype=np.int64)
+        self._offsets = np.array(self.index["offset"], dtype=np.int64)
+        self._lengths = np.array(self.index["length"], dtype=np.int64)
+        self._parser = mavutil.mavlink.MAVLink(None)
+        self._parser.robust_parsing = True
+
+    def _load_index(self, size):
+        try:
+            index = np.load(index_path(self.path), mmap_mode="r")
+            if index.dtype == INDEX_RECORD and _index_is_current(index, size):
+                return index
+        except (OSError, ValueError):
+            pass
+        index = build_index(self._mmap)
+        try:
+            with open(index_path(self.path), "wb") as f:
+                np.save(f, index)
+        except OSError as e:
+            print(f"[FlightLog] Could not write index for {self.path}: {e}")
+        return index
+
+    def __len__(self):
+        return len(self._t_us)
+
+    @property
+    def start(self):
+        """Timestamp of the first frame, in seconds since the epoch."""
+        return self._t_us[0] / 1e6 if len(self._t_us) else 0.0
+
+    @property
+    def duration(self):
+        return (self._t_us[-1] - self._t_us[0]) / 1e6 if len(self._t_us) else 0.0
+
+    def time_of(self, i):
+        """Seconds from the start of the log to frame `i`."""
+        return (self._t_us[i] - self._t_us[0]) / 1e6
+
+    def seek(self, t):
+        """Index of the first frame at or after `t` seconds into the log."""
+        if not len(self._t_us):
+            return 0
+        return int(np.searchsorted(self._t_us, self._t_us[0] + int(t * 1e6), side="left"))
+
+    def indices_of(self, msg_type):
+        """Frame indices of every message of one type, e.g. 'GLOBAL_POSITION_INT'."""
+        msgid = getattr(mavutil.mavlink, f"MAVLINK_MSG_ID_{msg_type}")
+        return np.flatnonzero(self.index["msgid"] == msgid)
+
+    def latest_before(self, i, msg_types):
+        """
+        Indices of the last frame before `i` of each message type and source, heartbeats
+        first and the rest in log order.
+        """
+        ids = [getattr(mavutil.mavlink, f"MAVLINK_MSG_ID_{t}") for t in msg_types]
+        rows = self.index[:i]
+        candidates = np.flatnonzero(np.isin(rows["msgid"], ids))
+        if not len(candidates):
+            return []
+        keys = (rows["msgid"][candidates].astype(np.uint64) << 16
+                | rows["sysid"][candidates].astype(np.uint64) << 8
+                | rows["compid"][candidates].astype(np.uint64))
+        # np.unique keeps the first occurrence, so search the reversed candidates
+        _, last = np.unique(keys[::-1], return_index=True)
+        latest = np.sort(candidates[::-1][last])
+        heartbeat = self.index["msgid"][latest] == mavutil.mavlink.MAVLINK_MSG_ID_HEARTBEAT
+        return np.concatenate([latest[heartbeat], latest[~heartbeat]]).tolist()
+
+    def frame(self, i):
+        start = self._offsets[i]
+        return self._mmap[start:start + self._lengths[i]]
+
+    def message(self, i):
+        """Decodes frame `i`; returns None for frames this dialect cannot decode."""
+        try:
+            return self._parser.decode(bytearray(self.frame(i)))
+        except Exception:
+            return None
+
+    def close(self):
+        self.index = self._t_us = self._offsets = self._lengths = None
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+
+class ReplayWorker(QObject):
+    """
+    Plays a FlightLog through the same telemetry pipeline and signals as
+    MavlinkConnectionWorker, at `speed` times real time (0 = as fast as possible).
+    Runs in a separate QThread; seek(), set_speed() and stop() are safe to call from
+    the GUI thread.
+    """
+    fleet_updated = pyqtSignal(object)
+    message_rates_updated = pyqtSignal(dict)
+    connection_status = pyqtSignal(str)
+    # Seconds into the log and its duration, at the UI rate
+    position_changed = pyqtSignal(float, float)
+    finished = pyqtSignal()
+
+    # Longest single sleep, so the position and rates still update on sparse logs
+    MAX_WAIT = 0.25
+
+    def __init__(self, path, speed=1.0, publish_rate=15.0, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.speed = speed
+        self.running = False
+        self.fleet = FleetTelemetry(publish_rate)
+        self.rate_stats = MessageRateStats()
+        self.messages_replayed = 0
+        self._wake = threading.Event()
+        self._seek_to = None
+        self._last_position = 0.0
+
+    def run(self):
+        try:
+            log = FlightLog(self.path)
+        except (OSError, ValueError) as e:
+            self.connection_status.emit(f"Replay Failed: {e}")
+            self.finished.emit()
+            return
+        print(f"[Replay] {self.path}: {len(log)} frames, {log.duration:.1f}s")
+        self.connection_status.emit(f"Replaying {os.path.basename(self.path)}")
+        self.running = True
+        i = 0
+        # Log time that maps to wall time `anchor_wall`; reset on seek and speed changes
+        anchor_log, anchor_wall, anchor_speed = 0.0, time.monotonic(), self.speed
+        while self.running and i < len(log):
+            if self._seek_to is not None:
+                i = log.seek(self._seek_to)
+                self._seek_to = None
+                if i >= len(log):
+                    break
+                # Restore the state at the new position from the latest message of
+                # each type and vehicle before it, heartbeats first so vehicles exist
+                for j in log.latest_before(i, PARSERS):
+                    msg = log.message(j)
+                    if msg is not None:
+                        self.fleet.fold(msg)
+                anchor_speed = None
+            if self.speed != anchor_speed:
+                anchor_log, anchor_wall, anchor_speed = log.time_of(i), time.monotonic(), self.speed
+
+            now = time.monotonic()
+            t = log.time_of(i)
+            if anchor_speed > 0:
+                delay = anchor_wall + (t - anchor_log) / anchor_speed - now
+                if delay > 0:
+                    due = self.fleet.time_until_due(now)
+                    self._wake.wait(min(delay, self.MAX_WAIT, self.MAX_WAIT if due is None else due))
+                    self._wake.clear()
+                    self._publish(log, i, time.monotonic())
+                    continue
+
+            msg = log.message(i)
+            i += 1
+            if msg is not None:
+                self.messages_replayed += 1
+                self.rate_stats.count(msg.get_type())
+                self.fleet.fold(msg, now)
+            self._publish(log, i - 1, now)
+
+        # Deliver whatever is still coalesced
+        self.fleet.interval = 0.0
+        changed = self.fleet.take_due()
+        if changed is not None:
+            self.fleet_updated.emit(changed)
+        if len(log):
+            self.position_changed.emit(log.time_of(min(i, len(log) - 1)), log.duration)
+        log.close()
+        print(f"[Replay] Stopped after {self.messages_replayed} messages")
+        self.finished.emit()
+
+    def _publish(self, log, i, now):
+        changed = self.fleet.take_due(now)
+        if changed is not None:
+            self.fleet_updated.emit(changed)
+        if now - self._last_position >= self.fleet.interval:
+            self._last_position = now
+            self.position_changed.emit(log.time_of(i), log.duration)
+        rates = self.rate_stats.update(now)
+        if rates is not None:
+            self.message_rates_updated.emit(rates)
+
+    def seek(self, t):
+        self._seek_to = max(0.0, t)
+        self._wake.set()
+
+    def set_speed(self, speed):
+        self.speed = speed
+        self._wake.set()
+
+    def set_publish_rate(self, rate_hz):
+        self.fleet.set_rate(rate_hz)
+
+    def set_message_rate(self, msg_name, rate_hz):
+        # Rates are fixed by the recording
+        pass
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+import threading
+import numpy as np
+
+
+class VideoFrame:
+    """
+    A converted frame plus the size of the capture it came from (it may have been
+    downscaled) and its timestamps through the video path, see video_stats.RECORD_FIELDS.
+    """
+    __slots__ = ('image', 'source_width', 'source_height', 'seq', 'pts_ms',
+                 't_capture', 't_converted', 't_posted', 't_taken', 't_uploaded', 't_painted')
+
+    def __init__(self, image, source_width, source_height):
+        self.image = image
+        self.source_width = source_width
+        self.source_height = source_height
+        self.seq = 0
+        self.pts_ms = float('nan')
+        self.t_capture = self.t_converted = self.t_posted = 0.0
+        self.t_taken = self.t_uploaded = self.t_painted = 0.0
+
+
+class FrameBufferPool:
+    """
+    Recycles preallocated frame buffers between the capture thread and the GUI.
+    With one frame being written, one pending in the mailbox and one on screen,
+    three buffers are enough, so allocations stop after the first few frames.
+    """
+
+    def __init__(self, max_free=3):
+        self._lock = threading.Lock()
+        self._free = []
+        self.max_free = max_free
+        self.allocations = 0
+        self.reuses = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        """Returns a free buffer of the given shape, allocating only if none is available."""
+        with self._lock:
+            while self._free:
+                buf = self._free.pop()
+                # Buffers of a stale shape (resolution change) are simply dropped
+                if buf.shape == shape and buf.dtype == dtype:
+                    self.reuses += 1
+                    return buf
+            self.allocations += 1
+        return np.empty(shape, dtype)
+
+    def release(self, buf):
+        with self._lock:
+            if len(self._free) < self.max_free:
+                self._free.append(buf)
+
+    def stats(self):
+        with self._lock:
+            return {'allocations': self.allocations, 'reuses': self.reuses}
+
+
+class FrameMailbox:
+    """
+    Single-slot, "latest frame wins" handoff between the capture thread and the GUI.
+    Posting over an unread frame replaces it, so memory stays bounded to one pending
+    frame no matter how far the GUI thread falls behind.
+    """
+
+    def __init__(self, recycle=None):
+        self._lock = threading.Lock()
+        self._frame = None
+        # Called with frames that were replaced or cleared before being read
+        self.recycle = recycle
+        self.frames_posted = 0
+        self.frames_taken = 0
+        self.frames_dropped = 0
+
+    def post(self, frame):
+        """
+        Stores `frame` as the newest frame. Returns True when the slot was empty,
+        i.e. the reader needs to be notified; otherwise a notification is already pending.
+        """
+        with self._lock:
+            dropped = self._frame
+            if dropped is not None:
+                self.frames_dropped += 1
+            self._frame = frame
+            self.frames_posted += 1
+        if dropped is not None and self.recycle:
+            self.recycle(dropped)
+        return dropped is None
+
+    def take(self):
+        """Returns the newest frame and empties the slot, or None if nothing is pending."""
+        with self._lock:
+            frame = self._frame
+            self._frame = None
+            if frame is not None:
+                self.frames_taken += 1
+        return frame
+
+    def clear(self):
+        with self._lock:
+            dropped = self._frame
+            self._frame = None
+        if dropped is not None and self.recycle:
+            self.recycle(dropped)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'posted': self.frames_posted,
+                'taken': self.frames_taken,
+                'dropped': self.frames_dropped,
+            }
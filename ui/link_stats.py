@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Link quality derived from what the MAVLink worker receives and sends.
+
+Every MAVLink frame carries an 8-bit sequence number that its sender increments per
+frame, so a gap between consecutive frames of one (sysid, compid) is the number of
+frames lost in between. Loss, throughput in both directions and corrupt data are
+accumulated per interval into a small ring of buckets, and summaries cover the whole
+ring, so the cost per message is a few integer additions and the cost per summary is
+one sum over a fixed-size array.
+"""
+import time
+import numpy as np
+
+# Columns of a bucket
+BYTES_IN, BYTES_OUT, RECEIVED, LOST, BAD = range(5)
+_COLUMNS = 5
+
+
+class _Source:
+    __slots__ = ('last_seq', 'received', 'lost', 'ring')
+
+    def __init__(self, seq, buckets):
+        self.last_seq = seq
+        self.received = 0
+        self.lost = 0
+        # Received and lost frames per bucket
+        self.ring = np.zeros((buckets, 2), dtype=np.int64)
+
+
+class LinkStats:
+    """
+    Rolling link statistics over the last `buckets` intervals of `interval` seconds.
+    `capacity` is the link's bytes per second in each direction, if known (serial
+    links), and turns throughput into a utilisation. Only used from the worker thread.
+    """
+    def __init__(self, interval=1.0, buckets=10, capacity=None):
+        self.interval = interval
+        self.capacity = capacity
+        self._ring = np.zeros((buckets, _COLUMNS), dtype=np.int64)
+        self._durations = np.zeros(buckets)
+        self._slot = 0
+        self._current = [0] * _COLUMNS
+        self._bucket_start = time.monotonic()
+        self._sources = {}
+        # Latest RADIO_STATUS fields and when they arrived
+        self._radio = None
+        self._radio_time = 0.0
+
+    def on_message(self, msg, now=None):
+        """Counts a received message, BAD_DATA included."""
+        current = self._current
+        current[BYTES_IN] += len(msg.get_msgbuf())
+        msg_type = msg.get_type()
+        if msg_type == 'BAD_DATA':
+            current[BAD] += 1
+            return
+        current[RECEIVED] += 1
+        key = (msg.get_srcSystem(), msg.get_srcComponent())
+        seq = msg.get_seq()
+        source = self._sources.get(key)
+        if source is None:
+            source = self._sources[key] = _Source(seq, len(self._ring))
+        else:
+            # A repeated sequence number is a duplicate, not 255 lost frames
+            gap = (seq - source.last_seq - 1) & 0xFF
+            if gap != 0xFF:
+                source.lost += gap
+                current[LOST] += gap
+            source.last_seq = seq
+        source.received += 1
+        if msg_type == 'RADIO_STATUS':
+            self._radio = {field: getattr(msg, field) for field in
+                           ('rssi', 'remrssi', 'noise', 'remnoise', 'txbuf', 'rxerrors', 'fixed')}
+            self._radio_time = time.monotonic() if now is None else now
+
+    def on_sent(self, nbytes):
+        self._current[BYTES_OUT] += nbytes
+
+    def update(self, now=None):
+        """Closes the bucket once its interval has elapsed; returns summary(), else None."""
+        now = time.monotonic() if now is None else now
+        elapsed = now - self._bucket_start
+        if elapsed < self.interval:
+            return None
+        slot = self._slot
+        self._ring[slot] = self._current
+        self._durations[slot] = elapsed
+        for source in self._sources.values():
+            source.ring[slot] = (source.received, source.lost)
+            source.received = source.lost = 0
+        self._current = [0] * _COLUMNS
+        self._slot = (slot + 1) % len(self._ring)
+        self._bucket_start = now
+        return self.summary(now)
+
+    def summary(self, now=None):
+        """Totals over the window as a plain dict for the GUI thread."""
+        now = time.monotonic() if now is None else now
+        totals = self._ring.sum(axis=0)
+        duration = self._durations.sum() or 1.0
+        bytes_in, bytes_out = totals[BYTES_IN] / duration, totals[BYTES_OUT] / duration
+        sources = {}
+        for key, source in self._sources.items():
+            received, lost = source.ring.sum(axis=0)
+            if received or lost:
+                sources[key] = {'received': int(received), 'lost': int(lost),
+                                'loss_pct': _percent(lost, received + lost)}
+        radio = None
+        if self._radio is not None:
+            radio = dict(self._radio, age=now - self._radio_time)
+        return {
+            'window': float(self._durations.sum()),
+            'received': int(totals[RECEIVED]),
+            'lost': int(totals[LOST]),
+            'bad': int(totals[BAD]),
+            'loss_pct': _percent(totals[LOST], totals[RECEIVED] + totals[LOST]),
+            'bytes_in_s': float(bytes_in),
+            'bytes_out_s': float(bytes_out),
+            'messages_in_s': float(totals[RECEIVED] / duration),
+            # Busiest direction as a fraction of what the link can carry
+            'utilisation': max(bytes_in, bytes_out) / self.capacity if self.capacity else None,
+            'sources': sources,
+            'radio': radio,
+        }
+
+
+def _percent(part, whole):
+    return float(part) * 100.0 / whole if whole else 0.0
@@ -5,57 +5,111 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 import sys as _sys
+import time
+import threading
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, 
-    QLineEdit, QPushButton, QSizePolicy, QSplitter
+    QLineEdit, QPushButton, QSizePolicy, QSplitter, QLabel
 )
-from PyQt6.QtCore import Qt
-from autopilot_control import AutopilotControlPanel
-from video_stream_widget import VideoStreamWidget
-from map_widget import MapWidget
+from PyQt6.QtCore import Qt, QEvent, QTimer, pyqtSignal
+# Only the scheme declaration (QtWebEngineCore) is needed before the QApplication; the
+# heavy modules (QtWebEngineWidgets, cv2, numpy, pymavlink) are imported by the stage
+# that builds the widget using them, after the window has first painted.
+from map_scheme import register_map_scheme
+
+# Startup milestones are measured from CSIE_STARTUP_T0 (epoch seconds, set by
+# tools/bench_startup.py just before launching) or else from this module's import
+_STARTUP_T0 = float(os.environ.get("CSIE_STARTUP_T0") or time.time())
+PROFILE_STARTUP = os.environ.get("CSIE_STARTUP_PROFILE") == "1"
+# Building everything in MainWindow.__init__, as before, for comparison
+EAGER_STARTUP = os.environ.get("CSIE_EAGER_STARTUP") == "1"
+# Modules imported on a background thread while the shell is shown
+WARM_MODULES = ("numpy", "cv2", "pymavlink.mavutil")
+
+
+def startup_milestone(name):
+    if PROFILE_STARTUP:
+        print(f"[Startup] {name} {time.time() - _STARTUP_T0:.3f}", flush=True)
+
+
+def warm_imports(modules=WARM_MODULES):
+    """Imports modules on a daemon thread so the stages that need them find them loaded."""
+    def run():
+        for name in modules:
+            try:
+                __import__(name)
+            except ImportError as e:
+                print(f"[Startup] Could not preload {name}: {e}")
+        startup_milestone("warm_imports")
+    thread = threading.Thread(target=run, name="warm-imports", daemon=True)
+    thread.start()
+    return thread
+
+
+def _placeholder(text):
+    label = QLabel(text)
+    label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+    label.setStyleSheet("color: gray;")
+    return label
+
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    """
+    The window shell (splitter, video source field and placeholders) is built in
+    __init__ so it can show at once. After its first paint the subsystems are built
+    one per event-loop pass, so the window stays responsive between them:
+    autopilot panel (pymavlink), video widget (OpenCV/GStreamer), map (Chromium).
+    """
+    startup_finished = pyqtSignal()
+
+    STAGES = ("autopilot_panel", "video_widget", "map_widget")
+    # Builds the stages anyway if no paint event arrives, e.g. a minimised start
+    FIRST_PAINT_FALLBACK_MS = 500
+
+    def __init__(self, staged=True):
         super().__init__()
         self.setWindowTitle("Modular Drone Control UI")
+        self.autopilot_panel = None
+        self.video_widget = None
+        self.map_widget = None
+        self._stages = list(self.STAGES)
+        self._first_paint = False
         
         # Use a QSplitter as the central widget's main layout mechanism
         self.splitter = QSplitter(Qt.Orientation.Horizontal)
 
         # --- Left Panel Container ---
         left_container = QWidget()
-        left_layout = QVBoxLayout(left_container)
-        left_layout.setContentsMargins(0, 0, 0, 0) # Tight layout
+        self.left_layout = QVBoxLayout(left_container)
+        self.left_layout.setContentsMargins(0, 0, 0, 0) # Tight layout
 
         self.rtsp_field = QLineEdit()
         self.rtsp_field.setPlaceholderText("Enter video source (RTSP URL or GStreamer pipeline)")
         self.rtsp_set_button = QPushButton("Set Video Source")
         self.rtsp_set_button.clicked.connect(self.set_video_source)
+        # Enabled once the video widget exists
+        self.rtsp_set_button.setEnabled(False)
         rtsp_layout = QHBoxLayout()
         rtsp_layout.addWidget(self.rtsp_field)
         rtsp_layout.addWidget(self.rtsp_set_button)
         
-        left_layout.addLayout(rtsp_layout)
+        self.left_layout.addLayout(rtsp_layout)
 
-        self.video_widget = VideoStreamWidget()
-        # Use 'Ignored' instead of 'Ignoring' for compatibility
-        self.video_widget.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
-        left_layout.addWidget(self.video_widget)
+        self.video_placeholder = _placeholder("Loading video...")
+        self.video_placeholder.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+        self.left_layout.addWidget(self.video_placeholder)
 
         # --- Right Panel Container ---
         right_container = QWidget()
-        right_layout = QVBoxLayout(right_container)
-        right_layout.setContentsMargins(0, 0, 0, 0) # Tight layout
-
-        self.map_widget = MapWidget()
-        self.map_widget.setMinimumHeight(400) 
-        right_layout.addWidget(self.map_widget)
+        self.right_layout = QVBoxLayout(right_container)
+        self.right_layout.setContentsMargins(0, 0, 0, 0) # Tight layout
 
-        self.autopilot_panel = AutopilotControlPanel()
-        right_layout.addWidget(self.autopilot_panel)
+        self.map_placeholder = _placeholder("Loading map...")
+        self.map_placeholder.setMinimumHeight(400)
+        self.right_layout.addWidget(self.map_placeholder)
 
-        # Connect signals
-        self.autopilot_panel.drone_position_updated.connect(self.map_widget.update_drone_position)
+        self.autopilot_placeholder = _placeholder("Loading autopilot controls...")
+        self.right_layout.addWidget(self.autopilot_placeholder)
 
         # Add containers to splitter
         self.splitter.addWidget(left_container)
@@ -75,23 +129,131 @@ class MainWindow(QMainWindow):
 
         self.setCentralWidget(self.splitter)
 
+        if not staged:
+            while self._stages:
+                self._build_next_stage(schedule=False)
+
+    def event(self, event):
+        if event.type() == QEvent.Type.Paint and not self._first_paint:
+            self._on_first_paint("first_paint")
+        return super().event(event)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._stages:
+            QTimer.singleShot(self.FIRST_PAINT_FALLBACK_MS, lambda: self._on_first_paint("first_paint_fallback"))
+
+    def _on_first_paint(self, milestone):
+        if self._first_paint:
+            return
+        self._first_paint = True
+        startup_milestone(milestone)
+        if self._stages:
+            # Queued, so this paint completes before the first stage starts
+            QTimer.singleShot(0, self._build_next_stage)
+
+    def _build_next_stage(self, schedule=True):
+        if not self._stages:
+            return
+        stage = self._stages.pop(0)
+        getattr(self, f"_build_{stage}")()
+        startup_milestone(stage)
+        if self._stages:
+            if schedule:
+                QTimer.singleShot(0, self._build_next_stage)
+            return
+        self._connect_subsystems()
+        startup_milestone("startup_finished")
+        self.startup_finished.emit()
+
+    def _swap_in(self, layout, placeholder, widget):
+        layout.replaceWidget(placeholder, widget)
+        placeholder.deleteLater()
+
+    def _build_autopilot_panel(self):
+        from autopilot_control import AutopilotControlPanel
+        self.autopilot_panel = AutopilotControlPanel()
+        self._swap_in(self.right_layout, self.autopilot_placeholder, self.autopilot_panel)
+
+    def _build_video_widget(self):
+        from video_stream_widget import VideoStreamWidget
+        self.video_widget = VideoStreamWidget()
+        # Use 'Ignored' instead of 'Ignoring' for compatibility
+        self.video_widget.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+        self._swap_in(self.left_layout, self.video_placeholder, self.video_widget)
+        self.rtsp_set_button.setEnabled(True)
+
+    def _build_map_widget(self):
+        from map_widget import MapWidget
+        self.map_widget = MapWidget()
+        self.map_widget.setMinimumHeight(400) 
+        self.map_widget.browser.loadFinished.connect(lambda ok: startup_milestone("map_loaded"))
+        self._swap_in(self.right_layout, self.map_placeholder, self.map_widget)
+
+    def _connect_subsystems(self):
+        # Connect signals
+        self.autopilot_panel.fleet_positions_updated.connect(self.map_widget.update_fleet_positions)
+        self.autopilot_panel.drone_position_updated.connect(self.map_widget.append_track_position)
+        # The trail follows the selected vehicle, so it restarts when another is selected
+        self.autopilot_panel.selected_vehicle_changed.connect(self.map_widget.clear_track)
+
     def set_video_source(self):
+        if self.video_widget is None:
+            return
         source = self.rtsp_field.text()
         self.video_widget.set_video_source(source)
 
     def closeEvent(self, event):
         print("Main window closing...")
-        self.autopilot_panel.disconnect_autopilot()
-        self.video_widget.close() 
+        # Stages not built yet are skipped
+        self._stages.clear()
+        if self.autopilot_panel is not None:
+            self.autopilot_panel.disconnect_autopilot(wait=True)
+        if self.video_widget is not None:
+            self.video_widget.close() 
         event.accept()
 
+
+def _quit_when_profiled(app, window, timeout_ms=30000):
+    """With CSIE_STARTUP_PROFILE=1, quits once every stage is built and the map page has loaded."""
+    pending = {"startup", "map"}
+
+    def done(what):
+        pending.discard(what)
+        if not pending:
+            startup_milestone("ready")
+            window.close()
+            app.quit()
+
+    def on_startup_finished():
+        window.map_widget.browser.loadFinished.connect(lambda ok: done("map"))
+        done("startup")
+
+    if window.map_widget is not None and not window._stages:
+        # Eager startup: everything was built in __init__
+        on_startup_finished()
+    else:
+        window.startup_finished.connect(on_startup_finished)
+    QTimer.singleShot(timeout_ms, lambda: (startup_milestone("timeout"), window.close(), app.quit()))
+
+
 def main():
+    startup_milestone("main")
+    if not EAGER_STARTUP:
+        warm_imports()
+    # Lets QtWebEngineWidgets be imported after the QApplication, when the map is built
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+    # Custom URL schemes must be known before the QApplication exists
+    register_map_scheme()
     app = QApplication(_sys.argv)
-    window = MainWindow()
+    startup_milestone("qapplication")
+    window = MainWindow(staged=not EAGER_STARTUP)
+    if PROFILE_STARTUP:
+        _quit_when_profiled(app, window)
     # Set a generous default size
     window.resize(2480, 900)
     window.show()
     _sys.exit(app.exec())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
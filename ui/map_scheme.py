@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+map:// URL scheme for the Leaflet page, so the map needs no network to start.
+
+map://app/leaflet/... serves the Leaflet build bundled in ui/assets, and
+map://app/tiles/{z}/{x}/{y}.png serves tiles from the TileCache, fetching missing
+ones from the tile server when online and caching them. The page is loaded with
+map://app/ as its base URL so both resolve relative to it.
+"""
+import os
+import time
+import sqlite3
+from collections import deque
+from PyQt6.QtCore import QBuffer, QIODevice, QUrl, QCoreApplication
+from PyQt6.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
+from PyQt6.QtWebEngineCore import (QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob,
+                                   QWebEngineProfile)
+
+from tile_cache import TileCache, default_cache_path, tile_url, USER_AGENT
+
+SCHEME = b"map"
+BASE_URL = "map://app/"
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+MIME_TYPES = {
+    '.js': b"text/javascript",
+    '.css': b"text/css",
+    '.png': b"image/png",
+    '.jpg': b"image/jpeg",
+    '.svg': b"image/svg+xml",
+}
+
+_handler = None
+# Seconds a cache write on the GUI thread may wait for tools/seed_tiles.py's write lock
+CACHE_WRITE_TIMEOUT = 0.05
+
+
+def _percentile(values, q):
+    # Imported before the QApplication, so kept free of NumPy to start fast
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def register_map_scheme():
+    """Declares the map:// scheme; must run before the QApplication is created."""
+    scheme = QWebEngineUrlScheme(SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    # Secure so the page may load it like https, local access for the bundled files
+    scheme.setFlags(QWebEngineUrlScheme.Flag.SecureScheme | QWebEngineUrlScheme.Flag.LocalAccessAllowed)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+def install_map_scheme(profile=None):
+    """Installs the shared handler on a profile (default: the default profile); returns it."""
+    global _handler
+    profile = profile or QWebEngineProfile.defaultProfile()
+    if _handler is None:
+        app = QCoreApplication.instance()
+        _handler = MapSchemeHandler(TileCache(default_cache_path(), timeout=CACHE_WRITE_TIMEOUT), parent=app)
+        app.aboutToQuit.connect(_handler.cache.close)
+    if profile.urlSchemeHandler(SCHEME) is None:
+        profile.installUrlSchemeHandler(SCHEME, _handler)
+    return _handler
+
+
+class MapSchemeHandler(QWebEngineUrlSchemeHandler):
+    """
+    Serves map:// requests on the GUI thread. Cache hits are answered immediately;
+    misses are fetched asynchronously and answered when the download completes, or
+    failed at once when offline (CSIE_TILES_OFFLINE=1).
+    """
+    def __init__(self, cache, online=None, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.online = os.environ.get("CSIE_TILES_OFFLINE") != "1" if online is None else online
+        self.network = QNetworkAccessManager(self)
+        self._assets = {}
+        self.hits = 0
+        self.misses = 0
+        self.fetched = 0
+        self.fetch_errors = 0
+        self.cache_errors = 0
+        # Milliseconds from request to reply, for recent hits and fetched misses
+        self._hit_ms = deque(maxlen=500)
+        self._miss_ms = deque(maxlen=500)
+
+    def requestStarted(self, job):
+        path = job.requestUrl().path()
+        if path.startswith("/tiles/"):
+            self._serve_tile(job, path, time.perf_counter())
+        else:
+            self._serve_asset(job, path)
+
+    def _serve_asset(self, job, path):
+        data = self._assets.get(path)
+        if data is None:
+            full = os.path.normpath(os.path.join(ASSETS_DIR, path.lstrip("/")))
+            if not full.startswith(ASSETS_DIR + os.sep) or not os.path.isfile(full):
+                job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+                return
+            with open(full, "rb") as f:
+                data = self._assets[path] = f.read()
+        self._reply(job, MIME_TYPES.get(os.path.splitext(path)[1], b"application/octet-stream"), data)
+
+    def _serve_tile(self, job, path, start):
+        try:
+            z, x, y = (int(part) for part in path[len("/tiles/"):].rsplit(".", 1)[0].split("/"))
+        except ValueError:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlInvalid)
+            return
+        data = self.cache.get(z, x, y)
+        if data is not None:
+            self.hits += 1
+            self._reply(job, b"image/png", data)
+            self._hit_ms.append((time.perf_counter() - start) * 1000)
+            return
+        self.misses += 1
+        if not self.online:
+            job.fail(QWebEngineUrlRequestJob.Error.RequestFailed)
+            return
+        request = QNetworkRequest(QUrl(tile_url(z, x, y)))
+        request.setHeader(QNetworkRequest.KnownHeaders.UserAgentHeader, USER_AGENT)
+        reply = self.network.get(request)
+        # The page may cancel the request (e.g. tiles panned out of view) before it completes
+        job.destroyed.connect(reply.abort)
+        reply.finished.connect(lambda: self._on_fetched(job, reply, (z, x, y), start))
+
+    def _on_fetched(self, job, reply, key, start):
+        reply.deleteLater()
+        if reply.error() == QNetworkReply.NetworkError.OperationCanceledError:
+            return
+        data = bytes(reply.readAll())
+        try:
+            if reply.error() != QNetworkReply.NetworkError.NoError or not data:
+                self.fetch_errors += 1
+                job.fail(QWebEngineUrlRequestJob.Error.RequestFailed)
+                return
+            try:
+                self.cache.put(*key, data)
+            except sqlite3.OperationalError:
+                # Locked by the seeder; serve the tile uncached and fetch it again next time
+                self.cache_errors += 1
+            self.fetched += 1
+            job.destroyed.disconnect(reply.abort)
+            self._reply(job, b"image/png", data)
+            self._miss_ms.append((time.perf_counter() - start) * 1000)
+        except RuntimeError:
+            # The job was deleted while the download finished
+            pass
+
+    @staticmethod
+    def _reply(job, mime, data):
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        job.reply(mime, buffer)
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return dict(self.cache.stats(), **{
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'fetched': self.fetched,
+            'fetch_errors': self.fetch_errors,
+            'cache_errors': self.cache_errors,
+            'hit_ms_p50': _percentile(self._hit_ms, 50),
+            'hit_ms_p95': _percentile(self._hit_ms, 95),
+            'miss_ms_p50': _percentile(self._miss_ms, 50),
+            'miss_ms_p95': _percentile(self._miss_ms, 95),
+        })
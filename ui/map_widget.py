@@ -1,35 +1,88 @@
 #!/usr/bin/env python3
 import json
-import socket
+import time
 from PyQt6.QtWidgets import QWidget, QVBoxLayout
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 # Import QUrl, QTimer, AND pyqtSlot
-from PyQt6.QtCore import QUrl, QTimer, pyqtSlot
+from PyQt6.QtCore import Qt, QUrl, QTimer, pyqtSlot
+
+from datagram_receiver import DatagramReceiver
+from map_scheme import install_map_scheme, BASE_URL
+from pin_store import PinStore
+from track_history import TrackHistory
 
 class MapWidget(QWidget):
-    def __init__(self, parent=None, udp_port=6007):
+    """
+    Leaflet map in a QWebEngineView. Pins, the drone position and fleet positions are
+    queued on the Python side and flushed once per animation frame as a single
+    applyBatch() call, since every runJavaScript() is an IPC round-trip into the
+    renderer. Only the latest drone position and the latest state of each vehicle
+    are kept between flushes. Pins go through a PinStore first, so a repeated report
+    of the same detection only updates the existing pin, and only new or changed
+    pins are sent.
+    """
+    # Milliseconds between flushes, about one display frame
+    FLUSH_INTERVAL_MS = 16
+    # A page that fails to load is reloaded after 1, 2, 4... seconds, this many times
+    MAX_LOAD_RETRIES = 5
+    LOAD_RETRY_MS = 1000
+
+    def __init__(self, parent=None, udp_port=6007, max_pins=50000, pin_merge_radius=5.0):
         super().__init__(parent)
         self.udp_port = udp_port
+        # Pins kept on the map; the oldest are evicted beyond this
+        self.max_pins = max_pins
+        # Reports within pin_merge_radius metres of a pin with the same name merge into it
+        self.pins = PinStore(pin_merge_radius, max_pins)
+        # Latest position of the drone, or of the selected vehicle, for pins_near_drone()
+        self.drone_position = None
+        # Full-resolution trail of the selected vehicle; its simplified line is drawn
+        self.track = TrackHistory()
+        self._track_dirty = False
+
+        # Updates waiting for the next flush
+        self._pending_pins = {}
+        self._pending_drone = None
+        self._pending_fleet = {}
+        # Batches are held until the page and Leaflet have loaded
+        self._page_ready = False
+        # Set while the page has failed to load; updates are dropped rather than queued
+        self._page_failed = False
+        self.load_retries = 0
+        self.updates_dropped = 0
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._flush_timer.timeout.connect(self.flush_updates)
+        self.batches = 0
+        self.pins_sent = 0
+        self.pins_coalesced = 0
+        self.drone_updates = 0
+        self.drone_coalesced = 0
+        self.fleet_coalesced = 0
+        self.max_queue_depth = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.last_js_ms = 0.0
+        self.pin_layer_stats = {}
 
         layout = QVBoxLayout(self)
         # Remove margins for a cleaner look
         layout.setContentsMargins(0, 0, 0, 0)
         self.browser = QWebEngineView(self)
+        # Bundled Leaflet and cached tiles; needs register_map_scheme() before the QApplication
+        self.tile_handler = install_map_scheme(self.browser.page().profile())
+        self.browser.loadFinished.connect(self.on_load_finished)
         layout.addWidget(self.browser)
         self.setLayout(layout)
 
         self.load_map_html()
 
-        # UDP socket for receiving pin coordinates
-        self.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.udp_sock.bind(("", self.udp_port))
-        self.udp_sock.setblocking(False)
+        # UDP receiver for pin coordinates, woken only when datagrams arrive
+        self.udp_receiver = DatagramReceiver(self.udp_port, host="", parent=self)
+        self.udp_receiver.datagrams_received.connect(self.on_pin_datagrams)
         print(f"[MapWidget] Listening for UDP on port {self.udp_port}")
 
-        self.poll_timer = QTimer(self)
-        self.poll_timer.timeout.connect(self.poll_udp_socket)
-        self.poll_timer.start(200)  # check every 200 ms
-
     def load_map_html(self):
         html = """
         <!DOCTYPE html>
@@ -38,8 +91,8 @@ class MapWidget(QWidget):
             <title>Leaflet Map</title>
             <meta charset="utf-8"/>
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <link rel="stylesheet" href="https://unpkg.com/leaflet/dist/leaflet.css"/>
-            <script src="https://unpkg.com/leaflet/dist/leaflet.js"></script>
+            <link rel="stylesheet" href="leaflet/leaflet.css"/>
+            <script src="leaflet/leaflet.js"></script>
             <style>
                 body, html { height: 100%; margin: 0; padding: 0; }
                 #map { height: 100%; width: 100%; }
@@ -49,26 +102,233 @@ class MapWidget(QWidget):
             <div id="map"></div>
             <script>
                 var map = L.map('map').setView([40.1772, 44.5035], 8); // Default view
-                L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+                // Served from the tile cache, which fetches what it lacks when online
+                L.tileLayer('tiles/{z}/{x}/{y}.png', {
                     maxZoom: 19,
                     attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a>'
                 }).addTo(map);
 
-                var markers = [];
+                // Pins from UDP, drawn on one canvas instead of one L.marker each.
+                // Pins live in a fixed-size ring, so the oldest is evicted once maxPins
+                // is reached; a pin sent again with the same id is updated in place.
+                // Positions are kept in normalised Web Mercator (0..1), so placing them
+                // at any zoom is a multiply. Each redraw culls pins outside the view and
+                // merges the rest into clusters on a screen grid.
+                var PinLayer = L.Layer.extend({
+                    // Grid cell size in screen pixels; pins sharing a cell are one cluster
+                    cellSize: 60,
+
+                    initialize: function(maxPins) {
+                        this._allocate(maxPins);
+                        this.evicted = 0;
+                        this.drawn = 0;
+                        this.lastDrawMs = 0;
+                        this._items = [];
+                        this._frame = null;
+                    },
+
+                    _allocate: function(maxPins) {
+                        this.maxPins = maxPins;
+                        this._lat = new Float64Array(maxPins);
+                        this._lon = new Float64Array(maxPins);
+                        this._nx = new Float64Array(maxPins);
+                        this._ny = new Float64Array(maxPins);
+                        this._names = new Array(maxPins);
+                        this._ids = new Array(maxPins);
+                        this._hits = new Uint32Array(maxPins);
+                        this._slots = new Map(); // id -> slot
+                        this._head = 0; // next slot to write
+                        this.count = 0;
+                    },
+
+                    // Slot of the k-th oldest pin
+                    _slot: function(k) {
+                        return (this._head - this.count + k + this.maxPins) % this.maxPins;
+                    },
+
+                    setMaxPins: function(maxPins) {
+                        if (maxPins === this.maxPins) { return; }
+                        // Keep the newest pins that still fit
+                        var keep = [];
+                        for (var k = Math.max(0, this.count - maxPins); k < this.count; k++) {
+                            var s = this._slot(k);
+                            keep.push([this._ids[s], this._lat[s], this._lon[s], this._names[s], this._hits[s]]);
+                        }
+                        this.evicted += this.count - keep.length;
+                        this._allocate(maxPins);
+                        keep.forEach(function(p) { this.add(p[0], p[1], p[2], p[3], p[4]); }, this);
+                        this.redraw();
+                    },
+
+                    // Adds a pin, or updates the one with the same id; id may be null
+                    add: function(id, lat, lon, name, hits) {
+                        var s = id === null ? undefined : this._slots.get(id);
+                        if (s === undefined) {
+                            s = this._head;
+                            if (this.count === this.maxPins) {
+                                this.evicted++;
+                                this._slots.delete(this._ids[s]);
+                            } else {
+                                this.count++;
+                            }
+                            this._head = (s + 1) % this.maxPins;
+                            this._ids[s] = id;
+                            if (id !== null) { this._slots.set(id, s); }
+                        }
+                        this._lat[s] = lat;
+                        this._lon[s] = lon;
+                        this._names[s] = name;
+                        this._hits[s] = hits || 1;
+                        // Same projection and latitude limit as L.Projection.SphericalMercator
+                        var clamped = Math.max(Math.min(lat, 85.0511287798), -85.0511287798);
+                        var sin = Math.sin(clamped * Math.PI / 180);
+                        this._nx[s] = (lon + 180) / 360;
+                        this._ny[s] = 0.5 - Math.log((1 + sin) / (1 - sin)) / (4 * Math.PI);
+                    },
+
+                    clear: function() {
+                        this._allocate(this.maxPins);
+                        this.redraw();
+                    },
+
+                    onAdd: function(map) {
+                        this._canvas = L.DomUtil.create('canvas', 'leaflet-zoom-hide');
+                        // Clicks go to the map, which hit-tests the drawn pins
+                        this._canvas.style.pointerEvents = 'none';
+                        map.getPanes().overlayPane.appendChild(this._canvas);
+                        map.on('moveend resize', this.redraw, this);
+                        map.on('click', this._onClick, this);
+                        this.redraw();
+                    },
+
+                    onRemove: function(map) {
+                        L.DomUtil.remove(this._canvas);
+                        map.off('moveend resize', this.redraw, this);
+                        map.off('click', this._onClick, this);
+                    },
+
+                    // Coalesces redraw requests into the next animation frame
+                    redraw: function() {
+                        if (this._map && this._frame === null) {
+                            this._frame = L.Util.requestAnimFrame(this._draw, this);
+                        }
+                        return this;
+                    },
+
+                    _draw: function() {
+                        this._frame = null;
+                        var start = performance.now();
+                        var map = this._map, size = map.getSize(), canvas = this._canvas;
+                        var ratio = window.devicePixelRatio || 1;
+                        L.DomUtil.setPosition(canvas, map.containerPointToLayerPoint([0, 0]));
+                        if (canvas.width !== size.x * ratio || canvas.height !== size.y * ratio) {
+                            canvas.width = size.x * ratio;
+                            canvas.height = size.y * ratio;
+                            canvas.style.width = size.x + 'px';
+                            canvas.style.height = size.y + 'px';
+                        }
+                        var ctx = canvas.getContext('2d');
+                        ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+                        ctx.clearRect(0, 0, size.x, size.y);
+
+                        var zoom = map.getZoom(), scale = 256 * Math.pow(2, zoom);
+                        var origin = map.getPixelBounds().min;
+                        // Cells are aligned to the world, not the view, so clusters do not
+                        // reshuffle while panning; at the deepest zoom every pin stands alone
+                        var cellSize = zoom >= map.getMaxZoom() ? 0 : this.cellSize;
+                        var pad = 20, cells = new Map();
+                        for (var k = 0; k < this.count; k++) {
+                            var s = this._slot(k);
+                            var ax = this._nx[s] * scale, ay = this._ny[s] * scale;
+                            var x = ax - origin.x, y = ay - origin.y;
+                            if (x < -pad || y < -pad || x > size.x + pad || y > size.y + pad) { continue; }
+                            var key = cellSize ? Math.floor(ax / cellSize) * 4194304 + Math.floor(ay / cellSize) : s;
+                            var cell = cells.get(key);
+                            if (cell) {
+                                cell.n++; cell.x += x; cell.y += y; cell.slot = s;
+                            } else {
+                                cells.set(key, { n: 1, x: x, y: y, slot: s });
+                            }
+                        }
+
+                        var items = [], clusters = [];
+                        // Single pins in one path, clusters with their counts on top
+                        ctx.beginPath();
+                        cells.forEach(function(c) {
+                            var item = { x: c.x / c.n, y: c.y / c.n, n: c.n, slot: c.slot, r: 6 };
+                            if (c.n === 1) {
+                                ctx.moveTo(item.x + 5, item.y);
+                                ctx.arc(item.x, item.y, 5, 0, 2 * Math.PI);
+                            } else {
+                                item.r = 10 + Math.min(12, 2 * Math.log2(c.n));
+                                clusters.push(item);
+                            }
+                            items.push(item);
+                        });
+                        ctx.fillStyle = '#e8491d';
+                        ctx.strokeStyle = '#ffffff';
+                        ctx.lineWidth = 1.5;
+                        ctx.fill();
+                        ctx.stroke();
+                        ctx.font = 'bold 11px sans-serif';
+                        ctx.textAlign = 'center';
+                        ctx.textBaseline = 'middle';
+                        clusters.forEach(function(c) {
+                            ctx.beginPath();
+                            ctx.arc(c.x, c.y, c.r, 0, 2 * Math.PI);
+                            ctx.fillStyle = 'rgba(232, 73, 29, 0.75)';
+                            ctx.fill();
+                            ctx.stroke();
+                            ctx.fillStyle = '#ffffff';
+                            ctx.fillText(c.n < 1000 ? String(c.n) : Math.round(c.n / 1000) + 'k', c.x, c.y);
+                        });
+                        this._items = items;
+                        this.drawn = items.length;
+                        this.lastDrawMs = performance.now() - start;
+                    },
+
+                    // A click on a pin shows its name; on a cluster, zooms into it
+                    _onClick: function(e) {
+                        var p = e.containerPoint, best = null, bestDist = Infinity;
+                        this._items.forEach(function(item) {
+                            var d = (item.x - p.x) * (item.x - p.x) + (item.y - p.y) * (item.y - p.y);
+                            if (d <= item.r * item.r && d < bestDist) { best = item; bestDist = d; }
+                        });
+                        if (!best) { return; }
+                        var map = this._map;
+                        if (best.n === 1) {
+                            // Names come from the network, so never as HTML
+                            var content = L.DomUtil.create('span');
+                            var hits = this._hits[best.slot];
+                            content.textContent = this._names[best.slot] + (hits > 1 ? ' (seen ' + hits + ' times)' : '');
+                            L.popup().setLatLng([this._lat[best.slot], this._lon[best.slot]])
+                                .setContent(content).openOn(map);
+                        } else {
+                            map.setView(map.containerPointToLatLng([best.x, best.y]),
+                                        Math.min(map.getZoom() + 2, map.getMaxZoom()));
+                        }
+                    },
+
+                    stats: function() {
+                        return { pins: this.count, maxPins: this.maxPins, evicted: this.evicted,
+                                 drawn: this.drawn, drawMs: this.lastDrawMs };
+                    }
+                });
+
+                var pinLayer = new PinLayer(50000).addTo(map);
                 var droneMarker = null;
                 var followDrone = true; // Flag to control map panning
 
                 // Function to add a static pin (from UDP)
                 function addMarker(lat, lon, name) {
                     try {
-                        var marker = L.marker([lat, lon]).addTo(map);
-                        marker.bindPopup(name);
-                        markers.push(marker);
+                        pinLayer.add(null, lat, lon, name, 1);
+                        pinLayer.redraw();
                     } catch (e) {
                         console.error("addMarker error:", e);
                     }
                 }
-                
+
                 // Function to update the drone's position
                 function updateDrone(lat, lon) {
                     try {
@@ -98,9 +358,85 @@ class MapWidget(QWidget):
                     }
                 }
 
+                // Flight trail of the selected vehicle: simplified vertices are only ever
+                // appended, and a separate two-point tail runs on to the current position
+                var trackStyle = { color: '#0050ff', weight: 3, opacity: 0.7, interactive: false };
+                var trackLine = L.polyline([], trackStyle).addTo(map);
+                var trackTail = L.polyline([], trackStyle).addTo(map);
+
+                function updateTrack(track) {
+                    if (track.reset) {
+                        trackLine.setLatLngs(track.append);
+                    } else {
+                        track.append.forEach(function(v) { trackLine.addLatLng(v); });
+                    }
+                    var vertices = trackLine.getLatLngs();
+                    if (track.tail && vertices.length) {
+                        trackTail.setLatLngs([vertices[vertices.length - 1], track.tail]);
+                    } else {
+                        trackTail.setLatLngs([]);
+                    }
+                }
+
+                // Markers of every vehicle on the link, by "sysid:compid"
+                var vehicleMarkers = {};
+
+                // Updates many vehicles in one call; each entry is
+                // {id, label, lat, lon, heading, mode, armed, selected}
+                function updateFleet(vehicles) {
+                    try {
+                        vehicles.forEach(function(v) {
+                            var pos = [v.lat, v.lon];
+                            var style = v.selected
+                                ? { radius: 8, color: '#0000ff', weight: 3, fillColor: '#3388ff', fillOpacity: 0.9 }
+                                : { radius: 6, color: '#555555', weight: 2, fillColor: '#aaaaaa', fillOpacity: 0.8 };
+                            var marker = vehicleMarkers[v.id];
+                            if (!marker) {
+                                marker = L.circleMarker(pos, style).addTo(map);
+                                vehicleMarkers[v.id] = marker;
+                                if (Object.keys(vehicleMarkers).length === 1) {
+                                    map.setView(pos, 16);
+                                }
+                            } else {
+                                marker.setLatLng(pos);
+                                if (marker.selected !== v.selected) {
+                                    marker.setStyle(style);
+                                }
+                            }
+                            marker.selected = v.selected;
+                            var content = '<b>' + v.label + '</b><br>' + v.mode + (v.armed ? ' (ARMED)' : '');
+                            if (marker.popupContent !== content) {
+                                marker.popupContent = content;
+                                if (marker.getPopup()) { marker.setPopupContent(content); }
+                                else { marker.bindPopup(content); }
+                            }
+                            if (v.selected && followDrone) {
+                                map.panTo(pos);
+                            }
+                        });
+                    } catch (e) {
+                        console.error("updateFleet error:", e);
+                    }
+                }
+
+                // Applies everything queued on the Python side in one call:
+                // {pins: [[id, lat, lon, name, hits], ...], fleet: [...], drone: [lat, lon] | null,
+                //  track: {reset, append: [[lat, lon], ...], tail: [lat, lon]} | null}.
+                // Returns the milliseconds spent and the pin layer's statistics.
+                function applyBatch(batch) {
+                    var start = performance.now();
+                    batch.pins.forEach(function(p) { pinLayer.add(p[0], p[1], p[2], p[3], p[4]); });
+                    if (batch.pins.length) { pinLayer.redraw(); }
+                    if (batch.fleet.length) { updateFleet(batch.fleet); }
+                    if (batch.drone) { updateDrone(batch.drone[0], batch.drone[1]); }
+                    if (batch.track) { updateTrack(batch.track); }
+                    var result = pinLayer.stats();
+                    result.ms = performance.now() - start;
+                    return result;
+                }
+
                 function clearMarkers() {
-                    markers.forEach(function(m) { map.removeLayer(m); });
-                    markers = [];
+                    pinLayer.clear();
                 }
                 
                 // Optional: Stop following if user drags map
@@ -115,66 +451,216 @@ class MapWidget(QWidget):
         </body>
         </html>
         """
-        # Using a base URL is good practice for web engines
-        self.browser.setHtml(html, QUrl("https://base.example.com/"))
+        # Relative asset and tile URLs resolve against the map:// scheme
+        self.browser.setHtml(html, QUrl(BASE_URL))
 
     def add_pin(self, lat, lon, name="pin"):
-        # Use json.dumps for safe JS string quoting
+        """Adds a pin or merges it into a nearby one; either goes out on the next flush."""
         try:
-            js = f"addMarker({float(lat)}, {float(lon)}, {json.dumps(str(name))});"
-            self.browser.page().runJavaScript(js)
-            print(f"[MapWidget] Added pin: {lat}, {lon}, {name}")
-        except Exception as e:
+            pin = self.pins.add(float(lat), float(lon), str(name))
+        except (TypeError, ValueError) as e:
             print(f"[MapWidget] Error adding pin: {e}")
+            return
+        if not self._queueing():
+            return
+        if pin.id in self._pending_pins:
+            self.pins_coalesced += 1
+        self._pending_pins[pin.id] = pin
+        self._schedule_flush()
+
+    @pyqtSlot(float, float)
+    def append_track_position(self, lat, lon):
+        """Public slot for AutopilotControlPanel.drone_position_updated; extends the trail."""
+        self.track.add(lat, lon)
+        self._track_dirty = True
+        self._schedule_flush()
+
+    def clear_track(self):
+        self.track.clear()
+        self._track_dirty = True
+        self._schedule_flush()
+
+    def pins_near_drone(self, radius):
+        """(distance in metres, Pin) within `radius` metres of the drone, nearest first."""
+        if self.drone_position is None:
+            return []
+        return self.pins.pins_within(*self.drone_position, radius)
 
     @pyqtSlot(float, float)
     def update_drone_position(self, lat, lon):
         """
         Public slot to be called from other widgets (like AutopilotControlPanel).
-        Updates the drone's position marker on the map.
+        Updates the drone's position marker on the map at the next flush; a newer
+        position replaces one still waiting.
         """
+        self.drone_position = (lat, lon)
+        if not self._queueing():
+            return
+        if self._pending_drone is not None:
+            self.drone_coalesced += 1
+        self._pending_drone = self.drone_position
+        self._schedule_flush()
+
+    @pyqtSlot(list)
+    def update_fleet_positions(self, vehicles):
+        """
+        Public slot for AutopilotControlPanel.fleet_positions_updated. Queues the
+        markers of every vehicle in the list; a vehicle updated again before the next
+        flush only sends its latest state.
+        """
+        for vehicle in vehicles:
+            if vehicle.get('selected'):
+                self.drone_position = (vehicle['lat'], vehicle['lon'])
+            if not self._queueing():
+                continue
+            if vehicle['id'] in self._pending_fleet:
+                self.fleet_coalesced += 1
+            self._pending_fleet[vehicle['id']] = vehicle
+        self._schedule_flush()
+
+    def queue_depth(self):
+        return (len(self._pending_pins) + len(self._pending_fleet) + (self._pending_drone is not None)
+                + self._track_dirty)
+
+    def _queueing(self):
+        """False while the page has failed to load, counting the update as dropped."""
+        if self._page_failed:
+            self.updates_dropped += 1
+            return False
+        return True
+
+    def _schedule_flush(self):
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth())
+        if self._page_ready and not self._flush_timer.isActive():
+            self._flush_timer.start(self.FLUSH_INTERVAL_MS)
+
+    def on_load_finished(self, ok):
+        self._page_ready = ok
+        if not ok:
+            self._on_load_failed()
+            return
+        # A later failure starts its backoff over
+        self.load_retries = 0
+        if self._page_failed:
+            # Updates were dropped while the page was down; the store and the trail still
+            # hold every pin and sample, so send them all. Vehicles resend on their own.
+            self._page_failed = False
+            self._pending_pins = dict(self.pins.pins)
+            self._track_dirty = True
+            print("[MapWidget] Map page loaded after retrying")
+        self.browser.page().runJavaScript(f"pinLayer.setMaxPins({int(self.max_pins)});")
+        self.flush_updates()
+
+    def _on_load_failed(self):
+        # Nothing queued reaches a page that did not load; stop queueing until one does
+        self._page_failed = True
+        self.updates_dropped += len(self._pending_pins) + len(self._pending_fleet) + (self._pending_drone is not None)
+        self._pending_pins = {}
+        self._pending_fleet = {}
+        self._pending_drone = None
+        if self.load_retries >= self.MAX_LOAD_RETRIES:
+            print(f"[MapWidget] Map page failed to load; giving up after {self.load_retries} retries")
+            return
+        delay = self.LOAD_RETRY_MS * 2 ** self.load_retries
+        self.load_retries += 1
+        print(f"[MapWidget] Map page failed to load; retrying in {delay / 1000:.0f} s")
+        QTimer.singleShot(delay, self.load_map_html)
+
+    def set_max_pins(self, max_pins):
+        """Changes the pin cap; lowering it evicts the oldest pins."""
+        self.max_pins = max_pins
+        self.pins.set_max_pins(max_pins)
+        if self._page_ready:
+            self.browser.page().runJavaScript(f"pinLayer.setMaxPins({int(max_pins)});")
+
+    def flush_updates(self):
+        """Sends everything queued as one applyBatch() call."""
+        if not self._page_ready or not self.queue_depth():
+            return
+        start = time.perf_counter()
+        # Pins evicted from the store since they were queued are not worth sending
+        pins = [[p.id, p.lat, p.lon, p.name, p.hits] for p in self._pending_pins.values() if p.id in self.pins.pins]
+        self._pending_pins = {}
+        fleet, self._pending_fleet = list(self._pending_fleet.values()), {}
+        drone, self._pending_drone = self._pending_drone, None
+        track = self.track.take_update() if self._track_dirty else None
+        self._track_dirty = False
+        # json.dumps also quotes pin names safely for JS
+        batch = json.dumps({'pins': pins, 'fleet': fleet, 'drone': drone, 'track': track})
         try:
-            js = f"updateDrone({lat}, {lon});"
-            self.browser.page().runJavaScript(js)
+            self.browser.page().runJavaScript(f"applyBatch({batch});", self._on_batch_applied)
         except Exception as e:
-            print(f"[MapWidget] Error updating drone position: {e}")
+            print(f"[MapWidget] Error flushing map updates: {e}")
+            return
+        self.batches += 1
+        self.pins_sent += len(pins)
+        self.drone_updates += drone is not None
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+        if pins:
+            print(f"[MapWidget] Sent {len(pins)} new or updated pin(s)")
 
-    def poll_udp_socket(self):
-        try:
-            while True:
-                data, addr = self.udp_sock.recvfrom(4096)
-                try:
-                    payload = json.loads(data.decode('utf-8'))
-                except Exception as e:
-                    print(f"[MapWidget] JSON decode error from {addr}: {e}")
-                    continue
-
-                # Accept either single pin or list under "pins"
-                if isinstance(payload, dict):
-                    if "pins" in payload and isinstance(payload["pins"], list):
-                        for p in payload["pins"]:
-                            try:
-                                # Allow [lat, lon, name] or [lat, lon]
-                                lat, lon = p[0], p[1]
-                                name = p[2] if len(p) > 2 else "Pin"
-                                self.add_pin(lat, lon, name)
-                            except Exception:
-                                continue
-                    elif "lat" in payload and "lon" in payload:
-                        name = payload.get("name", payload.get("label", "pin"))
-                        self.add_pin(payload["lat"], payload["lon"], name)
-                    else:
-                        # try a list-of-lists payload shaped like [ [lat,lon,name], ... ]
-                        if isinstance(payload.get("data"), list):
-                            for p in payload["data"]:
-                                if len(p) >= 2:
-                                    self.add_pin(p[0], p[1], p[2] if len(p) > 2 else "pin")
-                elif isinstance(payload, list):
-                    for p in payload:
-                        if isinstance(p, (list, tuple)) and len(p) >= 2:
-                            self.add_pin(p[0], p[1], p[2] if len(p) > 2 else "pin")
+    def _on_batch_applied(self, result):
+        if isinstance(result, dict):
+            self.last_js_ms = result.pop('ms', 0.0)
+            self.pin_layer_stats = result
 
-        except BlockingIOError:
-            pass # No data available, perfectly normal
-        except Exception as e:
-            print(f"[MapWidget] UDP poll error: {e}")
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'pins_sent': self.pins_sent,
+            'pins_coalesced': self.pins_coalesced,
+            'pin_store': self.pins.stats(),
+            'track': self.track.stats(),
+            'drone_updates': self.drone_updates,
+            'drone_coalesced': self.drone_coalesced,
+            'fleet_coalesced': self.fleet_coalesced,
+            'queue_depth': self.queue_depth(),
+            'max_queue_depth': self.max_queue_depth,
+            'updates_dropped': self.updates_dropped,
+            'load_retries': self.load_retries,
+            'last_flush_ms': self.last_flush_ms,
+            'max_flush_ms': self.max_flush_ms,
+            'last_js_ms': self.last_js_ms,
+            'pin_layer': self.pin_layer_stats,
+            'tiles': self.tile_handler.stats(),
+        }
+
+    def on_pin_datagrams(self, batch):
+        # Pins accumulate, so every datagram of a burst is applied
+        for data, addr in batch:
+            try:
+                payload = json.loads(data.decode('utf-8'))
+            except Exception as e:
+                print(f"[MapWidget] JSON decode error from {addr}: {e}")
+                continue
+            try:
+                self.handle_pin_payload(payload)
+            except Exception as e:
+                print(f"[MapWidget] Pin payload error from {addr}: {e}")
+
+    def handle_pin_payload(self, payload):
+        # Accept either single pin or list under "pins"
+        if isinstance(payload, dict):
+            if "pins" in payload and isinstance(payload["pins"], list):
+                for p in payload["pins"]:
+                    try:
+                        # Allow [lat, lon, name] or [lat, lon]
+                        lat, lon = p[0], p[1]
+                        name = p[2] if len(p) > 2 else "Pin"
+                        self.add_pin(lat, lon, name)
+                    except Exception:
+                        continue
+            elif "lat" in payload and "lon" in payload:
+                name = payload.get("name", payload.get("label", "pin"))
+                self.add_pin(payload["lat"], payload["lon"], name)
+            else:
+                # try a list-of-lists payload shaped like [ [lat,lon,name], ... ]
+                if isinstance(payload.get("data"), list):
+                    for p in payload["data"]:
+                        if len(p) >= 2:
+                            self.add_pin(p[0], p[1], p[2] if len(p) > 2 else "pin")
+        elif isinstance(payload, list):
+            for p in payload:
+                if isinstance(p, (list, tuple)) and len(p) >= 2:
+                    self.add_pin(p[0], p[1], p[2] if len(p) > 2 else "pin")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+COMMAND_LONG delivery with acknowledgement tracking.
+
+COMMAND_ACK carries only the command number, so at most one command per (vehicle,
+command) is in flight; different commands and vehicles run concurrently. A newer
+command with the same key supersedes the one in flight and is sent at once, so a
+DISARM never waits out an unacknowledged ARM's retries; commands that must all be
+delivered, such as SET_MESSAGE_INTERVAL for several messages, can queue instead.
+Unacknowledged commands are resent with an incremented
+`confirmation` field and a growing timeout until they succeed, fail or run out of
+retries. Round-trip times of acknowledged commands feed a histogram used as a link
+quality metric.
+"""
+import time
+import itertools
+from collections import deque, OrderedDict
+from typing import NamedTuple, Optional
+import numpy as np
+from pymavlink import mavutil
+
+# Upper edges of the RTT histogram bins in ms; the last bin is open-ended
+RTT_BINS_MS = (10, 20, 50, 100, 200, 500, 1000, 2000)
+
+
+class CommandResult(NamedTuple):
+    id: int
+    name: str
+    target: tuple
+    command: int
+    result: Optional[int]  # MAV_RESULT, or None if never acknowledged
+    attempts: int
+    rtt_ms: Optional[float]  # from the last transmission to its ACK
+    elapsed_ms: float  # from the first transmission to completion
+    superseded: bool = False  # replaced by a newer command before its ACK
+
+    @property
+    def ok(self):
+        return self.result == mavutil.mavlink.MAV_RESULT_ACCEPTED
+
+    @property
+    def result_text(self):
+        if self.superseded:
+            return "SUPERSEDED"
+        if self.result is None:
+            return "NO ACK"
+        entry = mavutil.mavlink.enums['MAV_RESULT'].get(self.result)
+        return entry.name.replace("MAV_RESULT_", "") if entry else str(self.result)
+
+
+class _Command:
+    __slots__ = ('id', 'name', 'target', 'command', 'params', 'retries', 'timeout', 'on_result',
+                 'attempts', 'first_sent', 'last_sent', 'deadline')
+
+    def __init__(self, id, name, target, command, params, retries, timeout, on_result):
+        self.id = id
+        self.name = name
+        self.target = target
+        self.command = command
+        self.params = params
+        self.retries = retries
+        self.timeout = timeout
+        self.on_result = on_result
+        self.attempts = 0
+        self.first_sent = self.last_sent = self.deadline = 0.0
+
+
+class CommandTracker:
+    """
+    Sends COMMAND_LONGs through `send(target, command, confirmation, params)` and tracks
+    them until their COMMAND_ACK. Only used from the MAVLink worker thread: call
+    on_ack() for every COMMAND_ACK and poll() whenever the loop wakes up.
+    """
+    def __init__(self, send, timeout=1.0, retries=3, backoff=2.0, history=200):
+        self.send = send
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._ids = itertools.count(1)
+        # (target, command) -> in-flight command, and commands waiting behind them
+        self._in_flight = OrderedDict()
+        self._queued = {}
+        self._rtts = deque(maxlen=history)
+        self.histogram = [0] * (len(RTT_BINS_MS) + 1)
+        self.sent = 0
+        self.retransmissions = 0
+        self.completed = 0
+        self.failed = 0
+        self.superseded = 0
+
+    def submit(self, target, command, params=(), name=None, retries=None, timeout=None, on_result=None,
+               supersede=True):
+        """
+        Sends a command to a (sysid, compid) target; `params` are up to 7 floats.
+        `on_result(CommandResult)` runs once it is acknowledged, gives up or is
+        superseded. If the same command is already in flight to the target, it is
+        superseded and this one sent now; with supersede=False this one waits behind
+        it instead. An ACK still on its way for the old one then completes the new
+        one, as COMMAND_ACK cannot tell them apart. Returns its id.
+        """
+        params = (list(params) + [0] * 7)[:7]
+        cmd = _Command(next(self._ids), name or self._command_name(command), target, command, params,
+                       self.retries if retries is None else retries,
+                       self.timeout if timeout is None else timeout, on_result)
+        key = (target, command)
+        now = time.monotonic()
+        if key in self._in_flight and supersede:
+            self._supersede(key, now)
+        if key in self._in_flight:
+            self._queued.setdefault(key, deque()).append(cmd)
+        else:
+            self._start(key, cmd, now)
+        return cmd.id
+
+    def _supersede(self, key, now):
+        """Drops the in-flight command for `key` and any waiting behind it, reporting each as superseded."""
+        dropped = [self._in_flight.pop(key)] + list(self._queued.pop(key, ()))
+        for cmd in dropped:
+            self.superseded += 1
+            if cmd.on_result:
+                cmd.on_result(CommandResult(cmd.id, cmd.name, cmd.target, cmd.command, None, cmd.attempts, None,
+                                            (now - cmd.first_sent) * 1000 if cmd.attempts else 0.0, True))
+
+    def cancel(self, target, command):
+        """Drops commands still waiting behind an in-flight one; returns how many."""
+        return len(self._queued.pop((target, command), ()))
+
+    def on_ack(self, msg, now=None):
+        """Matches a COMMAND_ACK to its command; returns the CommandResult if one completed."""
+        key = ((msg.get_srcSystem(), msg.get_srcComponent()), msg.command)
+        cmd = self._in_flight.get(key)
+        if cmd is None:
+            return None
+        now = time.monotonic() if now is None else now
+        if msg.result == mavutil.mavlink.MAV_RESULT_IN_PROGRESS:
+            # Long-running command: stop retransmitting while the autopilot works on it
+            cmd.deadline = now + cmd.timeout * self.backoff ** cmd.retries
+            return None
+        rtt = (now - cmd.last_sent) * 1000
+        self._rtts.append(rtt)
+        self.histogram[int(np.searchsorted(RTT_BINS_MS, rtt))] += 1
+        return self._finish(key, cmd, msg.result, rtt, now)
+
+    def poll(self, now=None):
+        """Retransmits or gives up on commands whose ACK is overdue."""
+        now = time.monotonic() if now is None else now
+        for key, cmd in list(self._in_flight.items()):
+            if now < cmd.deadline:
+                continue
+            if cmd.attempts > cmd.retries:
+                self._finish(key, cmd, None, None, now)
+            else:
+                self.retransmissions += 1
+                self._transmit(cmd, now)
+
+    def time_until_due(self, now=None):
+        """Seconds until the next retransmission or give-up, or None if nothing is in flight."""
+        if not self._in_flight:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, min(cmd.deadline for cmd in self._in_flight.values()) - now)
+
+    def _start(self, key, cmd, now):
+        self._in_flight[key] = cmd
+        cmd.first_sent = now
+        self._transmit(cmd, now)
+
+    def _transmit(self, cmd, now):
+        # MAVLink asks for confirmation to count up on every retransmission
+        self.send(cmd.target, cmd.command, min(cmd.attempts, 255), cmd.params)
+        cmd.attempts += 1
+        cmd.last_sent = now
+        cmd.deadline = now + cmd.timeout * self.backoff ** (cmd.attempts - 1)
+        self.sent += 1
+
+    def _finish(self, key, cmd, result, rtt, now):
+        del self._in_flight[key]
+        outcome = CommandResult(cmd.id, cmd.name, cmd.target, cmd.command, result, cmd.attempts, rtt,
+                                (now - cmd.first_sent) * 1000)
+        if outcome.ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        waiting = self._queued.get(key)
+        if waiting:
+            self._start(key, waiting.popleft(), now)
+            if not waiting:
+                del self._queued[key]
+        if cmd.on_result:
+            cmd.on_result(outcome)
+        return outcome
+
+    @staticmethod
+    def _command_name(command):
+        entry = mavutil.mavlink.enums['MAV_CMD'].get(command)
+        return entry.name.replace("MAV_CMD_", "") if entry else str(command)
+
+    def rtt_stats(self):
+        """RTT percentiles over recent ACKs, the histogram and delivery counters."""
+        rtts = np.fromiter(self._rtts, dtype=float)
+        p50, p95, p99 = np.percentile(rtts, [50, 95, 99]) if len(rtts) else (float('nan'),) * 3
+        return {
+            'rtt_p50_ms': p50,
+            'rtt_p95_ms': p95,
+            'rtt_p99_ms': p99,
+            'histogram': dict(zip([f"<{b}" for b in RTT_BINS_MS] + [f">={RTT_BINS_MS[-1]}"], self.histogram)),
+            'sent': self.sent,
+            'retransmissions': self.retransmissions,
+            'completed': self.completed,
+            'failed': self.failed,
+            'superseded': self.superseded,
+            'in_flight': len(self._in_flight),
+        }
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Outbound MAVLink path owned by the worker thread.
+
+Every message to the vehicle goes through one OutboundChannel. Other threads only
+post() message objects onto a queue; the worker packs them with the link's sequence
+number and writes everything pending in one go once per loop wakeup, so frames leave
+in order, sequence numbers never race, and a slow serial write never blocks the GUI.
+"""
+import queue
+
+
+class OutboundChannel:
+    """
+    Queue of outbound messages for one connection. post() is safe from any thread;
+    send() and flush() are only used from the worker thread that owns the connection.
+    Pending frames are written in chunks of at most `max_write` bytes, split on frame
+    boundaries so each chunk is also a valid UDP datagram.
+    """
+    def __init__(self, max_write=1024):
+        self.max_write = max_write
+        self.connection = None
+        # Messages posted by other threads, packed on the next flush
+        self._posted = queue.SimpleQueue()
+        # Frames packed by the worker, waiting for the next flush
+        self._frames = []
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.writes = 0
+        self.write_errors = 0
+
+    def attach(self, connection):
+        self.connection = connection
+
+    def post(self, msg):
+        """Queues a message from any thread; it goes out on the worker's next flush."""
+        self._posted.put(msg)
+
+    def send(self, msg):
+        """Packs a message in the worker thread; it goes out on the next flush."""
+        mav = self.connection.mav
+        self._frames.append(msg.pack(mav))
+        # What MAVLink.send() does after packing, minus the immediate write
+        mav.seq = (mav.seq + 1) % 256
+        mav.total_packets_sent += 1
+
+    def flush(self):
+        """Writes every pending frame, in order; returns the number of bytes written."""
+        while True:
+            try:
+                msg = self._posted.get_nowait()
+            except queue.Empty:
+                break
+            self.send(msg)
+        if not self._frames:
+            return 0
+        frames, self._frames = self._frames, []
+        written = 0
+        chunk = []
+        size = 0
+        for frame in frames:
+            if chunk and size + len(frame) > self.max_write:
+                written += self._write(chunk, size)
+                chunk, size = [], 0
+            chunk.append(frame)
+            size += len(frame)
+        written += self._write(chunk, size)
+        self.messages_sent += len(frames)
+        return written
+
+    def _write(self, chunk, size):
+        try:
+            self.connection.write(b"".join(chunk))
+        except Exception as e:
+            # Dropped like a lost packet; commands are retried by the CommandTracker
+            self.write_errors += 1
+            print(f"[Mavlink] Write failed, {len(chunk)} frame(s) dropped: {e}")
+            return 0
+        self.connection.mav.total_bytes_sent += size
+        self.bytes_sent += size
+        self.writes += 1
+        return size
+
+    def stats(self):
+        return {
+            'messages_sent': self.messages_sent,
+            'bytes_sent': self.bytes_sent,
+            'writes': self.writes,
+            'write_errors': self.write_errors,
+            'pending': len(self._frames) + self._posted.qsize(),
+        }
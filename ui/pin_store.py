@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Deduplicated store of map pins with a grid spatial index.
+
+The Pi resends a detection's location for as long as it sees it, so a pin arriving
+within `merge_radius` metres of an existing pin with the same name is merged into
+it: its hit count and last-seen time go up and its position becomes the mean of the
+reports. Pins are bucketed into grid cells about `cell_size` metres across, so a
+merge or a "pins within N m" query only looks at the cells the circle overlaps
+instead of every pin. Distances use an equirectangular approximation, accurate to
+well under a percent at the few-kilometre scale of a search area. Only used from
+the GUI thread.
+"""
+import math
+import time
+import itertools
+from collections import OrderedDict
+
+EARTH_RADIUS = 6371000.0
+# Metres per degree of latitude
+METRES_PER_DEGREE = math.pi * EARTH_RADIUS / 180.0
+
+
+class Pin:
+    __slots__ = ('id', 'lat', 'lon', 'name', 'hits', 'first_seen', 'last_seen', 'cell')
+
+    def __init__(self, id, lat, lon, name, now):
+        self.id = id
+        self.lat = lat
+        self.lon = lon
+        self.name = name
+        self.hits = 1
+        self.first_seen = self.last_seen = now
+        self.cell = None
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return EARTH_RADIUS * math.hypot(x, y)
+
+
+class PinStore:
+    """
+    Pins keyed by id in arrival order, capped at `max_pins` with the oldest evicted
+    first. The grid has rows `cell_size` metres tall; each row's cells are as many
+    degrees of longitude as make `cell_size` metres at that row's latitude.
+    """
+    def __init__(self, merge_radius=5.0, max_pins=50000, cell_size=None):
+        self.merge_radius = merge_radius
+        self.max_pins = max_pins
+        self.cell_size = cell_size or max(merge_radius, 10.0)
+        self._dlat = self.cell_size / METRES_PER_DEGREE
+        self.pins = OrderedDict()
+        # (row, column) -> {id: Pin}
+        self._cells = {}
+        self._ids = itertools.count(1)
+        self.merged = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.pins)
+
+    def _row(self, lat):
+        return math.floor(lat / self._dlat)
+
+    def _dlon(self, row):
+        # Longitude span of a cell in this row, from the latitude of its middle
+        lat = (row + 0.5) * self._dlat
+        return self._dlat / max(math.cos(math.radians(lat)), 1e-6)
+
+    def _cell(self, lat, lon):
+        row = self._row(lat)
+        return row, math.floor(lon / self._dlon(row))
+
+    def _candidates(self, lat, lon, radius):
+        """Pins in every cell a circle of `radius` metres around the point overlaps."""
+        reach = radius / METRES_PER_DEGREE
+        # Widest at the latitude furthest from the equator the circle reaches
+        lon_reach = reach / max(math.cos(math.radians(min(abs(lat) + reach, 89.9))), 1e-6)
+        spans = {}
+        for row in range(self._row(lat - reach), self._row(lat + reach) + 1):
+            dlon = self._dlon(row)
+            spans[row] = (math.floor((lon - lon_reach) / dlon), math.floor((lon + lon_reach) / dlon))
+        if sum(last - first + 1 for first, last in spans.values()) <= len(self._cells):
+            for row, (first, last) in spans.items():
+                for col in range(first, last + 1):
+                    cell = self._cells.get((row, col))
+                    if cell:
+                        yield from cell.values()
+        else:
+            # A circle much larger than the cells: cheaper to walk the occupied ones
+            for (row, col), cell in self._cells.items():
+                span = spans.get(row)
+                if span and span[0] <= col <= span[1]:
+                    yield from cell.values()
+
+    def add(self, lat, lon, name="pin", now=None):
+        """Adds a report; returns the new or merged-into Pin."""
+        now = time.time() if now is None else now
+        nearest, nearest_d = None, self.merge_radius
+        for pin in self._candidates(lat, lon, self.merge_radius):
+            if pin.name != name:
+                continue
+            d = distance_m(lat, lon, pin.lat, pin.lon)
+            if d <= nearest_d:
+                nearest, nearest_d = pin, d
+        if nearest is not None:
+            nearest.hits += 1
+            nearest.last_seen = now
+            # Running mean of the reported positions
+            self._move(nearest, nearest.lat + (lat - nearest.lat) / nearest.hits,
+                       nearest.lon + (lon - nearest.lon) / nearest.hits)
+            self.merged += 1
+            return nearest
+        pin = Pin(next(self._ids), lat, lon, name, now)
+        self.pins[pin.id] = pin
+        self._move(pin, lat, lon)
+        while len(self.pins) > self.max_pins:
+            self.remove(next(iter(self.pins)))
+            self.evicted += 1
+        return pin
+
+    def _move(self, pin, lat, lon):
+        pin.lat, pin.lon = lat, lon
+        cell = self._cell(lat, lon)
+        if cell == pin.cell:
+            return
+        if pin.cell is not None:
+            self._discard_from_cell(pin)
+        self._cells.setdefault(cell, {})[pin.id] = pin
+        pin.cell = cell
+
+    def _discard_from_cell(self, pin):
+        members = self._cells[pin.cell]
+        del members[pin.id]
+        if not members:
+            del self._cells[pin.cell]
+
+    def remove(self, pin_id):
+        pin = self.pins.pop(pin_id, None)
+        if pin is not None:
+            self._discard_from_cell(pin)
+        return pin
+
+    def set_max_pins(self, max_pins):
+        self.max_pins = max_pins
+        while len(self.pins) > max_pins:
+            self.remove(next(iter(self.pins)))
+            self.evicted += 1
+
+    def clear(self):
+        self.pins.clear()
+        self._cells.clear()
+
+    def pins_within(self, lat, lon, radius):
+        """(distance in metres, Pin) for every pin within `radius` metres, nearest first."""
+        found = []
+        for pin in self._candidates(lat, lon, radius):
+            d = distance_m(lat, lon, pin.lat, pin.lon)
+            if d <= radius:
+                found.append((d, pin))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def stats(self):
+        return {
+            'pins': len(self.pins),
+            'cells': len(self._cells),
+            'merged': self.merged,
+            'evicted': self.evicted,
+        }
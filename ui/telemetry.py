@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Telemetry state shared between the MAVLink worker and the GUI.
+
+The worker folds every message into an immutable TelemetrySnapshot per vehicle and
+hands the GUI the changed ones at a fixed UI rate, so ingest rate and refresh rate are
+independent and no mutable state crosses the thread boundary.
+"""
+import math
+import time
+from typing import NamedTuple
+from pymavlink import mavutil
+
+
+class TelemetrySnapshot(NamedTuple):
+    sysid: int = 0
+    compid: int = 0
+    vehicle_type: int = 0  # MAV_TYPE
+    lat: float = 0.0
+    lon: float = 0.0
+    alt: float = 0.0  # relative altitude, m
+    speed: float = 0.0  # groundspeed, m/s
+    battery_v: float = 0.0
+    battery_remaining: int = 0
+    mode: str = 'Unknown'
+    armed: bool = False
+    # Attitude in degrees
+    roll: float = 0.0
+    pitch: float = 0.0
+    yaw: float = 0.0
+    # Messages folded in so far and monotonic time of the last one
+    messages: int = 0
+    t_updated: float = 0.0
+
+    @property
+    def key(self):
+        return (self.sysid, self.compid)
+
+    @property
+    def label(self):
+        return f"SYSID {self.sysid}" if self.compid == 1 else f"SYSID {self.sysid}/{self.compid}"
+
+    @property
+    def has_position(self):
+        return self.lat != 0.0 or self.lon != 0.0
+
+
+def _global_position_int(msg):
+    return {'lat': msg.lat / 1e7, 'lon': msg.lon / 1e7, 'alt': msg.relative_alt / 1000.0}
+
+
+def _vfr_hud(msg):
+    return {'speed': msg.groundspeed}
+
+
+def _attitude(msg):
+    return {'roll': math.degrees(msg.roll), 'pitch': math.degrees(msg.pitch), 'yaw': math.degrees(msg.yaw)}
+
+
+def _heartbeat(msg):
+    return {
+        'armed': (msg.base_mode & mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED) > 0,
+        # Mode names for this vehicle's autopilot and frame type
+        'mode': mavutil.mode_string_v10(msg),
+        'vehicle_type': msg.type,
+    }
+
+
+def _sys_status(msg):
+    return {'battery_v': msg.voltage_battery / 1000.0, 'battery_remaining': msg.battery_remaining}
+
+
+# Message type -> function returning the snapshot fields it sets
+PARSERS = {
+    'GLOBAL_POSITION_INT': _global_position_int,
+    'ATTITUDE': _attitude,
+    'VFR_HUD': _vfr_hud,
+    'HEARTBEAT': _heartbeat,
+    'SYS_STATUS': _sys_status,
+}
+
+
+def is_vehicle_heartbeat(msg):
+    """True for heartbeats of autopilots, as opposed to GCSs, companions or gimbals."""
+    return (msg.type != mavutil.mavlink.MAV_TYPE_GCS
+            and msg.autopilot != mavutil.mavlink.MAV_AUTOPILOT_INVALID)
+
+
+# Streamed messages: default rate in Hz and the legacy data stream that carries them,
+# for autopilots that reject MAV_CMD_SET_MESSAGE_INTERVAL
+STREAMED_MESSAGES = {
+    'GLOBAL_POSITION_INT': (10, mavutil.mavlink.MAV_DATA_STREAM_POSITION),
+    'ATTITUDE': (10, mavutil.mavlink.MAV_DATA_STREAM_EXTRA1),
+    'VFR_HUD': (4, mavutil.mavlink.MAV_DATA_STREAM_EXTRA2),
+    'SYS_STATUS': (2, mavutil.mavlink.MAV_DATA_STREAM_EXTENDED_STATUS),
+}
+
+
+class MessageRateStats:
+    """Receive rate per message type, measured over consecutive windows."""
+    def __init__(self, window=1.0):
+        self.window = window
+        self._counts = {}
+        self._window_start = time.monotonic()
+        self.rates = {}
+
+    def count(self, msg_type):
+        self._counts[msg_type] = self._counts.get(msg_type, 0) + 1
+
+    def update(self, now=None):
+        """Closes the window once it has elapsed; returns the new {type: Hz} rates, else None."""
+        now = time.monotonic() if now is None else now
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return None
+        self.rates = {t: n / elapsed for t, n in self._counts.items()}
+        self._counts = {}
+        self._window_start = now
+        return self.rates
+
+
+class FleetTelemetry:
+    """
+    Telemetry of every vehicle on the link, keyed by (sysid, compid). A vehicle is added
+    on its first autopilot heartbeat; messages from other sources are ignored. Vehicles
+    that changed since the last publish go out together at the UI rate, so the GUI gets
+    one update per interval however many vehicles there are. Only used from the worker
+    thread.
+    """
+    def __init__(self, rate_hz=15.0, on_vehicle_added=None):
+        self.vehicles = {}
+        self.on_vehicle_added = on_vehicle_added
+        self.set_rate(rate_hz)
+        self._changed = set()
+        self._last_publish = 0.0
+        self.folded = 0
+        self.published = 0
+
+    def set_rate(self, rate_hz):
+        self.interval = 1.0 / max(rate_hz, 0.1)
+
+    def fold(self, msg, now=None):
+        """Applies a message to its vehicle's snapshot; returns False if it was not used."""
+        msg_type = msg.get_type()
+        parser = PARSERS.get(msg_type)
+        if parser is None:
+            return False
+        key = (msg.get_srcSystem(), msg.get_srcComponent())
+        snapshot = self.vehicles.get(key)
+        if snapshot is None:
+            if msg_type != 'HEARTBEAT' or not is_vehicle_heartbeat(msg):
+                return False
+            snapshot = TelemetrySnapshot(sysid=key[0], compid=key[1])
+            if self.on_vehicle_added:
+                self.on_vehicle_added(key)
+        now = time.monotonic() if now is None else now
+        self.vehicles[key] = snapshot._replace(messages=snapshot.messages + 1, t_updated=now, **parser(msg))
+        self._changed.add(key)
+        self.folded += 1
+        return True
+
+    def time_until_due(self, now=None):
+        """Seconds until pending changes should go out, or None if nothing changed."""
+        if not self._changed:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._last_publish + self.interval - now)
+
+    def take_due(self, now=None):
+        """Returns {key: snapshot} of changed vehicles once the UI interval has elapsed, else None."""
+        now = time.monotonic() if now is None else now
+        if not self._changed or now - self._last_publish < self.interval:
+            return None
+        changed = {key: self.vehicles[key] for key in self._changed}
+        self._changed.clear()
+        self._last_publish = now
+        self.published += 1
+        return changed
+
+    def stats(self):
+        return {
+            'vehicles': len(self.vehicles),
+            'folded': self.folded,
+            'published': self.published,
+        }
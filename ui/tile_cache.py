@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Disk-backed map tile cache.
+
+Tiles live in a single SQLite file keyed by (z, x, y), with their size and when they
+were last served. The total size is capped; going over it evicts the least recently
+used tiles. The map reads through it from the GUI thread and tools/seed_tiles.py
+fills it ahead of a mission, so it is safe to have both open at once: each write
+re-reads the size from the file inside its transaction, so the cap holds whichever
+process inserted or evicted last.
+"""
+import os
+import time
+import sqlite3
+
+# OpenStreetMap's tile policy asks for an identifying User-Agent
+USER_AGENT = "CSIE-GroundStation/1.0 (tile cache)"
+DEFAULT_TILE_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+
+
+def default_cache_path(directory=None):
+    directory = directory or os.environ.get("CSIE_TILE_CACHE_DIR", "tile_cache")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, "tiles.sqlite")
+
+
+def tile_url(z, x, y, template=None):
+    """Upstream URL of a tile; CSIE_TILE_URL overrides the OpenStreetMap default."""
+    template = template or os.environ.get("CSIE_TILE_URL", DEFAULT_TILE_URL)
+    return template.format(z=z, x=x, y=y)
+
+
+class TileCache:
+    """
+    LRU tile store capped at `max_bytes`. Eviction brings it down to `low_water` of
+    the cap so a full cache does not evict on every insert. Last-use times of served
+    tiles are kept in memory and written in batches rather than once per hit.
+    `timeout` is how long a write waits for another process's write lock before
+    raising sqlite3.OperationalError.
+    """
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, low_water=0.9, timeout=5.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        # Seeding and the map may write at the same time; WAL lets readers carry on
+        self.db = sqlite3.connect(path, timeout=timeout)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS tiles (
+                               z INTEGER, x INTEGER, y INTEGER,
+                               data BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL,
+                               PRIMARY KEY (z, x, y))""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS tiles_last_used ON tiles (last_used)")
+        self.db.commit()
+        self._read_totals()
+        self._touched = {}
+        self.evictions = 0
+
+    def get(self, z, x, y):
+        """Tile bytes, or None if not cached."""
+        row = self.db.execute("SELECT data FROM tiles WHERE z=? AND x=? AND y=?", (z, x, y)).fetchone()
+        if row is None:
+            return None
+        self._touched[(z, x, y)] = time.time()
+        if len(self._touched) >= 256:
+            self._flush_touched()
+        return row[0]
+
+    def contains(self, z, x, y):
+        return self.db.execute("SELECT 1 FROM tiles WHERE z=? AND x=? AND y=?", (z, x, y)).fetchone() is not None
+
+    def _read_totals(self):
+        # Another process may have inserted or evicted since we last looked
+        self.total_bytes, self.tiles = self.db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM tiles").fetchone()
+
+    def _begin_write(self):
+        """Takes the write lock now, so the totals read next stay true until commit."""
+        if not self.db.in_transaction:
+            self.db.execute("BEGIN IMMEDIATE")
+
+    def put(self, z, x, y, data):
+        """Stores a tile; raises sqlite3.OperationalError if the file stays locked past the timeout."""
+        evictions = self.evictions
+        try:
+            self._begin_write()
+            self._read_totals()
+            old = self.db.execute("SELECT size FROM tiles WHERE z=? AND x=? AND y=?", (z, x, y)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO tiles (z, x, y, data, size, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                            (z, x, y, sqlite3.Binary(data), len(data), time.time()))
+            if old is None:
+                self.tiles += 1
+            self.total_bytes += len(data) - (old[0] if old else 0)
+            self._touched.pop((z, x, y), None)
+            written = {}
+            if self.total_bytes > self.max_bytes:
+                written = self._evict_locked(int(self.max_bytes * self.low_water))
+            self.db.commit()
+            self._touched_committed(written)
+        except sqlite3.OperationalError:
+            self.db.rollback()
+            self.evictions = evictions
+            self._read_totals()
+            raise
+
+    def evict(self, target_bytes):
+        """Drops least recently used tiles until the cache holds at most `target_bytes`."""
+        evictions = self.evictions
+        try:
+            self._begin_write()
+            self._read_totals()
+            written = self._evict_locked(target_bytes)
+            self.db.commit()
+            self._touched_committed(written)
+        except sqlite3.OperationalError:
+            self.db.rollback()
+            self.evictions = evictions
+            self._read_totals()
+            raise
+
+    def _evict_locked(self, target_bytes):
+        """Evicts inside the caller's transaction; returns the last-use times it wrote."""
+        # Recent hits must count before choosing the least recently used
+        written = self._write_touched()
+        while self.total_bytes > target_bytes:
+            rows = self.db.execute("SELECT z, x, y, size FROM tiles ORDER BY last_used LIMIT 256").fetchall()
+            if not rows:
+                break
+            for z, x, y, size in rows:
+                if self.total_bytes <= target_bytes:
+                    break
+                self.db.execute("DELETE FROM tiles WHERE z=? AND x=? AND y=?", (z, x, y))
+                self.total_bytes -= size
+                self.tiles -= 1
+                self.evictions += 1
+        return written
+
+    def _write_touched(self):
+        """Writes pending last-use times in the current transaction; returns what it wrote."""
+        written = dict(self._touched)
+        if written:
+            self.db.executemany("UPDATE tiles SET last_used=? WHERE z=? AND x=? AND y=?",
+                                [(t, z, x, y) for (z, x, y), t in written.items()])
+        return written
+
+    def _touched_committed(self, written):
+        # Only forgotten once committed, so a failed transaction leaves them pending
+        for key, t in written.items():
+            if self._touched.get(key) == t:
+                del self._touched[key]
+
+    def _flush_touched(self):
+        if not self._touched:
+            return
+        try:
+            written = self._write_touched()
+            self.db.commit()
+            self._touched_committed(written)
+        except sqlite3.OperationalError:
+            # Locked by another writer: keep the times and try again on a later flush
+            self.db.rollback()
+
+    def stats(self):
+        return {
+            'tiles': self.tiles,
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+        }
+
+    def close(self):
+        self._flush_touched()
+        self.db.close()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Flight track with full-resolution storage and an incrementally simplified display line.
+
+Every position goes into a fixed-size NumPy ring (time, lat, lon), about 24 bytes a
+sample, so hours at 10+ Hz stay a few megabytes and the oldest samples are dropped
+past capacity. The map gets a simplified copy: new samples since the last committed
+vertex are run through Ramer-Douglas-Peucker once every `chunk` samples, and only the
+vertices that survive are appended to the display line. A pass covers at most about
+`max_pending` samples, so each sample costs bounded amortised work and the bridge
+only carries what changed. If the display line outgrows `max_vertices` it is
+re-simplified as a whole with a doubled tolerance and sent again once.
+"""
+import math
+import time
+import numpy as np
+
+from pin_store import METRES_PER_DEGREE
+
+SAMPLE = np.dtype([('t', 'f8'), ('lat', 'f8'), ('lon', 'f8')])
+
+
+def rdp(x, y, tolerance):
+    """Indices of the points Ramer-Douglas-Peucker keeps, first and last included."""
+    n = len(x)
+    if n < 3:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        length = math.hypot(dx, dy)
+        if length > 0:
+            dist = np.abs(px * dy - py * dx) / length
+        else:
+            dist = np.hypot(px, py)
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+class TrackHistory:
+    """
+    Track of one vehicle. add() stores a sample; take_update() returns what the
+    display line gained since the last call. Only used from the GUI thread.
+    """
+    def __init__(self, capacity=262144, tolerance=2.0, chunk=32, max_pending=256, max_vertices=5000):
+        self.capacity = capacity
+        # Metres a simplified line may stray from the samples
+        self.tolerance = tolerance
+        self.base_tolerance = tolerance
+        self.chunk = chunk
+        self.max_pending = max_pending
+        self.max_vertices = max_vertices
+        self._ring = np.zeros(capacity, dtype=SAMPLE)
+        self.total = 0
+        self.resimplified = 0
+        self._reset_display()
+
+    def _reset_display(self):
+        # Display vertices as (lat, lon); those past _sent are not on the map yet
+        self.vertices = []
+        self._sent = 0
+        self._reset_pending = True
+        # Sample number of the last committed vertex
+        self._anchor = None
+        # Sample count at the last simplification pass
+        self._simplified_at = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def clear(self):
+        self.total = 0
+        self.tolerance = self.base_tolerance
+        self._reset_display()
+
+    def add(self, lat, lon, t=None):
+        t = time.time() if t is None else t
+        self._ring[self.total % self.capacity] = (t, lat, lon)
+        self.total += 1
+        if self._anchor is None:
+            self._anchor = self.total - 1
+            self.vertices.append((lat, lon))
+            self._simplified_at = self.total
+        elif self.total - self._simplified_at >= self.chunk:
+            self._simplify_pending()
+
+    def samples(self, start=0):
+        """Stored samples from sample number `start` on, oldest first, as a structured array."""
+        start = max(start, self.total - len(self))
+        indices = np.arange(start, self.total) % self.capacity
+        return self._ring[indices]
+
+    def _local_xy(self, lat, lon):
+        """Metres east and north of the first point, good enough over a flight area."""
+        lat0 = lat[0]
+        return (lon - lon[0]) * METRES_PER_DEGREE * math.cos(math.radians(lat0)), (lat - lat0) * METRES_PER_DEGREE
+
+    def _simplify_pending(self):
+        self._simplified_at = self.total
+        if self.total - self._anchor > self.capacity:
+            # The anchor was overwritten; restart from the oldest sample still stored
+            self._anchor = self.total - self.capacity
+        pending = self.samples(self._anchor)
+        x, y = self._local_xy(pending['lat'], pending['lon'])
+        keep = rdp(x, y, self.tolerance)
+        interior = keep[1:-1]
+        if len(interior):
+            for i in interior:
+                self.vertices.append((float(pending['lat'][i]), float(pending['lon'][i])))
+            self._anchor += int(interior[-1])
+        elif len(pending) >= self.max_pending:
+            # A long straight leg: commit its end so the pending window stays bounded
+            self.vertices.append((float(pending['lat'][-1]), float(pending['lon'][-1])))
+            self._anchor = self.total - 1
+        if len(self.vertices) > self.max_vertices:
+            self._resimplify()
+
+    def _resimplify(self):
+        """Halves the display line's detail when it grows past max_vertices."""
+        while len(self.vertices) > self.max_vertices // 2:
+            self.tolerance *= 2
+            points = np.array(self.vertices)
+            x, y = self._local_xy(points[:, 0], points[:, 1])
+            self.vertices = [self.vertices[i] for i in rdp(x, y, self.tolerance)]
+        self._sent = 0
+        self._reset_pending = True
+        self.resimplified += 1
+
+    def tail(self):
+        """Latest position, which the display line runs to from its last vertex."""
+        if not self.total:
+            return None
+        sample = self._ring[(self.total - 1) % self.capacity]
+        return float(sample['lat']), float(sample['lon'])
+
+    def take_update(self):
+        """
+        {'reset': bool, 'append': [[lat, lon], ...], 'tail': [lat, lon]} with the vertices
+        added since the last call; with reset, 'append' is the whole line. None if
+        nothing changed.
+        """
+        if not self.total and not self._reset_pending:
+            return None
+        update = {'reset': self._reset_pending, 'append': self.vertices[self._sent:], 'tail': self.tail()}
+        self._sent = len(self.vertices)
+        self._reset_pending = False
+        return update
+
+    def stats(self):
+        return {
+            'samples': self.total,
+            'stored': len(self),
+            'vertices': len(self.vertices),
+            'pending': self.total - 1 - self._anchor if self._anchor is not None else 0,
+            'tolerance_m': self.tolerance,
+            'resimplified': self.resimplified,
+        }
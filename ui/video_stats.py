@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+import csv
+import json
+from collections import deque
+import numpy as np
+
+# Per-frame timestamps (time.perf_counter seconds) in pipeline order; pts_ms is the
+# GStreamer buffer timestamp as reported by OpenCV (stream clock, milliseconds).
+RECORD_FIELDS = ('seq', 'pts_ms', 't_capture', 't_converted', 't_posted', 't_taken', 't_uploaded', 't_painted')
+
+# (name, start field, end field) of each latency stage
+STAGES = (
+    ('total', 't_capture', 't_painted'),
+    ('convert', 't_capture', 't_converted'),
+    ('handoff', 't_posted', 't_taken'),
+    ('upload', 't_taken', 't_uploaded'),
+    ('paint', 't_uploaded', 't_painted'),
+)
+
+
+class VideoLatencyStats:
+    """
+    Rolls per-frame timestamps of the video path up into latency percentiles and
+    decode/render rates. Fed from the GUI thread once a frame has been painted.
+    """
+
+    def __init__(self, history=600):
+        self.records = deque(maxlen=history)
+        self.frames_painted = 0
+        # Frames that were uploaded but replaced before the view painted them
+        self.frames_unpainted = 0
+
+    def reset(self):
+        self.records.clear()
+        self.frames_painted = 0
+        self.frames_unpainted = 0
+
+    def record(self, frame):
+        self.records.append(tuple(getattr(frame, name) for name in RECORD_FIELDS))
+        self.frames_painted += 1
+
+    def summary(self):
+        """Returns p50/p95/p99 per stage in ms plus decode and render FPS over the history window."""
+        result = {'frames_painted': self.frames_painted, 'frames_unpainted': self.frames_unpainted}
+        if len(self.records) < 2:
+            return result
+        data = np.array(self.records, dtype=np.float64)
+        col = {name: data[:, i] for i, name in enumerate(RECORD_FIELDS)}
+
+        latency = {}
+        for name, start, end in STAGES:
+            p50, p95, p99 = np.percentile((col[end] - col[start]) * 1000.0, (50, 95, 99))
+            latency[name] = {'p50': round(p50, 2), 'p95': round(p95, 2), 'p99': round(p99, 2)}
+        result['latency_ms'] = latency
+
+        # Sequence numbers count every decoded frame, including those dropped before display
+        capture_span = col['t_capture'][-1] - col['t_capture'][0]
+        paint_span = col['t_painted'][-1] - col['t_painted'][0]
+        if capture_span > 0:
+            result['decode_fps'] = round((col['seq'][-1] - col['seq'][0]) / capture_span, 1)
+        if paint_span > 0:
+            result['render_fps'] = round((len(data) - 1) / paint_span, 1)
+        return result
+
+    def dump(self, path, extra=None):
+        """Writes the per-frame records as CSV, or summary plus records as JSON (by file extension)."""
+        if str(path).lower().endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(RECORD_FIELDS)
+                writer.writerows(self.records)
+        else:
+            # NaN (no PTS) is not valid JSON
+            records = [[None if v != v else v for v in r] for r in self.records]
+            payload = {'summary': self.summary(), 'fields': RECORD_FIELDS, 'records': records}
+            if extra:
+                payload['summary'].update(extra)
+            with open(path, 'w') as f:
+                json.dump(payload, f)
+        print(f"[VideoStats] Wrote {len(self.records)} frame records to {path}")
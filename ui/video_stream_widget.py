@@ -1,26 +1,45 @@
 #!/usr/bin/env python3
+import os
+import math
+import time
 import socket
-import json
-import sys
 import numpy as np
 import cv2
-from PyQt6.QtCore import QTimer, QRectF, Qt, QThread, pyqtSignal, pyqtSlot, QSize
+from PyQt6.QtCore import QTimer, QRectF, Qt, QThread, pyqtSignal, pyqtSlot
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGraphicsView, 
     QGraphicsScene, QSizePolicy, QLineEdit, QPushButton, QLabel, QGraphicsPixmapItem,
-    QDoubleSpinBox, QFrame, QGroupBox
+    QDoubleSpinBox, QFrame, QGroupBox, QGraphicsItem, QGraphicsRectItem, QGraphicsSimpleTextItem
 )
-from PyQt6.QtGui import QBrush, QColor, QPainter, QImage, QPixmap, QResizeEvent
+from PyQt6.QtGui import QBrush, QColor, QPainter, QImage, QPixmap, QResizeEvent, QTransform, QPen, QFont
 
 from bounding_box_item import BoundingBoxItem
+from bounding_box_layer import BoundingBoxLayer
+from detection_sync import DetectionTimeline, DEFAULT_VIDEO_DELAY_MS, LOOKUP_OUTCOMES
+from datagram_receiver import DatagramReceiver
+from detection_protocol import decode_detections, encode_control, Reassembler, CHUNK_MAGIC
+from frame_mailbox import FrameMailbox, FrameBufferPool, VideoFrame
+from video_stats import VideoLatencyStats
 
 class VideoThread(QThread):
-    change_pixmap_signal = pyqtSignal(np.ndarray)
+    # Emitted only when the mailbox goes from empty to full; the frame itself
+    # travels through the mailbox so queued signals never pile up frames.
+    frame_ready = pyqtSignal()
 
-    def __init__(self, pipeline):
+    # Display scale is quantised so dragging the splitter does not reallocate buffers per pixel
+    SCALE_STEPS = 32
+
+    def __init__(self, pipeline, mailbox=None, pool=None, display_scale=1.0):
         super().__init__()
         self.pipeline = pipeline
+        self.pool = pool if pool is not None else FrameBufferPool()
+        self.mailbox = mailbox if mailbox is not None else FrameMailbox(recycle=lambda f: self.pool.release(f.image))
         self._is_running = True
+        # Number of times OpenCV had to allocate a new capture buffer (first frame / resolution change)
+        self.capture_allocations = 0
+        self.display_scale = 1.0
+        self.set_display_scale(display_scale)
+        self._scaled_buf = None
 
     def run(self):
         print(f"[VideoThread] Opening pipeline: {self.pipeline}")
@@ -28,18 +47,103 @@ class VideoThread(QThread):
         if not cap.isOpened():
             print("[VideoThread] Error: Could not open GStreamer pipeline.")
             return
+        capture_buf = None
+        seq = 0
         while self._is_running:
-            ret, cv_img = cap.read()
-            if ret: self.change_pixmap_signal.emit(cv_img)
+            ret, cv_img = cap.read(capture_buf)
+            if ret:
+                t_capture = time.perf_counter()
+                if cv_img is not capture_buf:
+                    self.capture_allocations += 1
+                    capture_buf = cv_img
+                frame = self.convert_frame(cv_img)
+                frame.seq = seq; seq += 1
+                frame.t_capture = t_capture
+                frame.t_converted = time.perf_counter()
+                # Buffer PTS of the appsink sample (stream clock), -1/0 if the backend has none
+                frame.pts_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+                frame.t_posted = time.perf_counter()
+                if self.mailbox.post(frame): self.frame_ready.emit()
             else: self.msleep(1000)
         cap.release()
         print("[VideoThread] Stopped.")
 
+    def set_display_scale(self, scale):
+        """
+        Sets the size frames are delivered at, as a fraction of the source size.
+        Called from the GUI thread whenever the view is resized.
+        """
+        scale = math.ceil(scale * self.SCALE_STEPS) / self.SCALE_STEPS
+        self.display_scale = min(1.0, max(1.0 / self.SCALE_STEPS, scale))
+
+    def convert_frame(self, cv_img):
+        """
+        Downscales a BGR capture to the display size and converts it into the GUI's native
+        32-bit layout (B, G, R, X in memory, i.e. QImage.Format_RGB32) inside a pooled
+        buffer, so the GUI thread only uploads it.
+        """
+        src_h, src_w = cv_img.shape[:2]
+        img = self.downscale(cv_img)
+        if img.ndim == 3 and img.shape[2] == 3:
+            h, w = img.shape[:2]
+            out = self.pool.acquire((h, w, 4))
+            cv2.cvtColor(img, cv2.COLOR_BGR2BGRA, dst=out)
+        else:
+            # Already BGRx/gray: hand over a pooled copy since the capture buffer is reused
+            out = self.pool.acquire(img.shape, img.dtype)
+            np.copyto(out, img)
+        return VideoFrame(out, src_w, src_h)
+
+    def downscale(self, cv_img):
+        """Resizes into a reused buffer when the view shows fewer pixels than the source has."""
+        h, w = cv_img.shape[:2]
+        target_w = int(w * self.display_scale) & ~7
+        if target_w <= 0 or target_w >= w:
+            return cv_img
+        target_h = max(1, round(h * target_w / w))
+        shape = (target_h, target_w) + cv_img.shape[2:]
+        if self._scaled_buf is None or self._scaled_buf.shape != shape:
+            self._scaled_buf = np.empty(shape, cv_img.dtype)
+        cv2.resize(cv_img, (target_w, target_h), dst=self._scaled_buf, interpolation=cv2.INTER_LINEAR)
+        return self._scaled_buf
+
     def stop(self):
         self._is_running = False
         self.wait()
 
+# BGR captures map onto Qt formats directly, no channel swap needed
+_QIMAGE_FORMATS = {
+    1: QImage.Format.Format_Grayscale8,
+    3: QImage.Format.Format_BGR888,
+    4: QImage.Format.Format_RGB32,
+}
+
+def ndarray_to_qimage(frame):
+    """Wraps a uint8 frame as a QImage without copying; `frame` must outlive the QImage."""
+    h, w = frame.shape[:2]
+    channels = frame.shape[2] if frame.ndim == 3 else 1
+    return QImage(frame.data, w, h, frame.strides[0], _QIMAGE_FORMATS[channels])
+
+class VideoPixmapItem(QGraphicsPixmapItem):
+    """Pixmap item that reports when a newly set frame is first painted."""
+
+    def __init__(self, on_painted=None, parent=None):
+        super().__init__(parent)
+        self.on_painted = on_painted
+        self.pending_frame = None
+
+    def paint(self, painter, option, widget=None):
+        super().paint(painter, option, widget)
+        frame = self.pending_frame
+        if frame is not None:
+            self.pending_frame = None
+            frame.t_painted = time.perf_counter()
+            if self.on_painted: self.on_painted(frame)
+
 class ResizingGraphicsView(QGraphicsView):
+    # Device pixels per scene unit after fitting the scene into the view
+    view_scale_changed = pyqtSignal(float)
+
     def __init__(self, scene, parent=None):
         super().__init__(scene, parent)
 
@@ -47,6 +151,7 @@ class ResizingGraphicsView(QGraphicsView):
         super().resizeEvent(event)
         if self.scene():
             self.fitInView(self.scene().sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
+            self.view_scale_changed.emit(self.transform().m11() * self.devicePixelRatioF())
 
 class GimbalAxisControl(QWidget):
     valueChanged = pyqtSignal(float)
@@ -94,8 +199,19 @@ class GimbalAxisControl(QWidget):
     def get_value(self): return self.value
 
 class VideoStreamWidget(QWidget):
-    def __init__(self, parent=None):
+    # Rendering backends for the video view: "raster" scales frames in software,
+    # "opengl" uses a QOpenGLWidget viewport so frames are uploaded as textures and
+    # scaled on the GPU (also works on Mesa llvmpipe without a GPU).
+    RENDERERS = ("raster", "opengl")
+    # Detection overlays: "items" keeps one BoundingBoxItem per object, "batched" paints
+    # all boxes from a single BoundingBoxLayer (better for hundreds of detections).
+    OVERLAY_MODES = ("items", "batched")
+    BBOX_POOL_SIZE = 256
+
+    def __init__(self, parent=None, renderer=None, overlay_mode=None, video_delay_ms=None):
         super().__init__(parent)
+        if video_delay_ms is None:
+            video_delay_ms = float(os.environ.get("CSIE_VIDEO_DELAY_MS", DEFAULT_VIDEO_DELAY_MS))
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(0, 0, 0, 0)
 
@@ -109,13 +225,31 @@ class VideoStreamWidget(QWidget):
         control_layout.addWidget(QLabel("RPi IP:"))
         control_layout.addWidget(self.rpi_ip_input)
         control_layout.addWidget(self.set_ip_button)
+        # How much later video arrives than detections; frames are paired with detections this much older
+        self.video_delay_spin = QDoubleSpinBox()
+        self.video_delay_spin.setRange(0, 2000)
+        self.video_delay_spin.setSingleStep(10)
+        self.video_delay_spin.setDecimals(0)
+        self.video_delay_spin.setSuffix(" ms")
+        self.video_delay_spin.setValue(video_delay_ms)
+        self.video_delay_spin.setToolTip("How much later video arrives than detections; adjust until boxes "
+                                         "stay on moving objects")
+        control_layout.addWidget(QLabel("Video delay:"))
+        control_layout.addWidget(self.video_delay_spin)
+        self.stats_button = QPushButton("Stats")
+        self.stats_button.setCheckable(True)
+        self.stats_button.toggled.connect(self.set_stats_overlay_visible)
+        control_layout.addWidget(self.stats_button)
         main_layout.addLayout(control_layout)
 
         # Graphics View
         self.scene = QGraphicsScene(self)
+        # Boxes move on every detection packet; a BSP index would be rebuilt constantly
+        self.scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex)
         self.VIDEO_WIDTH = 1920; self.VIDEO_HEIGHT = 1080
         self.scene.setSceneRect(0, 0, self.VIDEO_WIDTH, self.VIDEO_HEIGHT)
         self.view = ResizingGraphicsView(self.scene, self)
+        self.view.view_scale_changed.connect(self.on_view_scale_changed)
         self.view.setBackgroundBrush(QBrush(QColor("black")))
         self.view.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
         self.view.setMinimumSize(640, 360)
@@ -125,12 +259,30 @@ class VideoStreamWidget(QWidget):
         self.view.setRenderHint(QPainter.RenderHint.Antialiasing)
         self.view.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
         main_layout.addWidget(self.view)
+        self.renderer = "raster"  # QGraphicsView starts with a plain raster viewport
+        self.set_renderer(renderer or os.environ.get("CSIE_VIDEO_RENDERER", "raster"))
 
         # Video Item
-        self.video_pixmap_item = QGraphicsPixmapItem()
+        self.video_stats = VideoLatencyStats()
+        self.video_pixmap_item = VideoPixmapItem(on_painted=self.video_stats.record)
         self.scene.addItem(self.video_pixmap_item)
         self.video_pixmap_item.setZValue(0)
 
+        # Stats HUD, drawn in view pixels regardless of the scene scale
+        self.stats_hud = QGraphicsRectItem()
+        self.stats_hud.setBrush(QBrush(QColor(0, 0, 0, 160)))
+        self.stats_hud.setPen(QPen(Qt.PenStyle.NoPen))
+        self.stats_hud.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIgnoresTransformations, True)
+        self.stats_hud.setZValue(10)
+        self.stats_hud_text = QGraphicsSimpleTextItem(self.stats_hud)
+        self.stats_hud_text.setBrush(QBrush(QColor("lime")))
+        self.stats_hud_text.setFont(QFont("monospace", 9))
+        self.stats_hud_text.setPos(4, 2)
+        self.stats_hud.setVisible(False)
+        self.scene.addItem(self.stats_hud)
+        self.stats_hud_timer = QTimer(self)
+        self.stats_hud_timer.timeout.connect(self.update_stats_hud)
+
         # --- Gimbal Control Section ---
         gimbal_group = QGroupBox("Gimbal Control")
         # Make it compact vertically
@@ -158,12 +310,59 @@ class VideoStreamWidget(QWidget):
 
         self.current_bbox_id = 0
         self.bbox_items = {}
+        # Hidden items kept in the scene for reuse instead of being destroyed and re-created
+        self.bbox_pool = []
+        self.bbox_layer = BoundingBoxLayer(self.scene.sceneRect(), on_click_callback=self.send_control_packet)
+        self.bbox_layer.setZValue(1)
+        self.scene.addItem(self.bbox_layer)
+        # Pair each rendered frame with the detections closest to it in time
+        self.sync_detections = True
+        self.detection_timeline = DetectionTimeline(video_delay_ms=video_delay_ms)
+        # perf_counter time of the last frame taken for display, None until one arrives
+        self._last_frame_time = None
+        self.video_delay_spin.valueChanged.connect(self.set_video_delay)
+        self.overlay_mode = "items"
+        self.set_overlay_mode(overlay_mode or os.environ.get("CSIE_OVERLAY_MODE", "items"))
         self.send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.gimbal_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.rpi_ip = self.rpi_ip_input.text()
         self.rpi_port = 5005; self.rpi_port_s = 5006; self.gimbal_port = 6010
+        # Control packets stay JSON until the Pi shows it speaks the binary format
+        self.peer_binary = False
         self.start_udp_listener()
+        self.frame_pool = FrameBufferPool()
+        self.frame_mailbox = FrameMailbox(recycle=self.release_frame)
         self.video_thread = None
+        # Frames are decoded at full size but delivered at (roughly) the size they are shown at
+        self.adaptive_resolution = True
+        self.display_scale = 1.0
+        self._video_item_scale = (1.0, 1.0)
+        self._displayed_frame = None
+
+    def set_renderer(self, mode):
+        """Switches the video view between the "raster" and "opengl" viewports."""
+        if mode not in self.RENDERERS:
+            print(f"[UI] Unknown video renderer '{mode}', using raster")
+            mode = "raster"
+        if mode == "opengl":
+            try:
+                from PyQt6.QtOpenGLWidgets import QOpenGLWidget
+                from PyQt6.QtGui import QOpenGLContext
+                if not QOpenGLContext().create(): raise RuntimeError("no OpenGL context")
+            except Exception as e:
+                print(f"[UI] OpenGL renderer unavailable ({e}), using raster")
+                mode = "raster"
+        if mode == self.renderer:
+            return
+        if mode == "opengl":
+            self.view.setViewport(QOpenGLWidget())
+            # Partial updates are pointless on GL, every frame redraws the whole surface anyway
+            self.view.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.FullViewportUpdate)
+        else:
+            self.view.setViewport(QWidget())
+            self.view.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.MinimalViewportUpdate)
+        self.renderer = mode
+        print(f"[UI] Video renderer: {mode}")
 
     def send_gimbal_command(self):
         cmd_str = f"{self.roll_ctrl.get_value():.1f}, {self.pitch_ctrl.get_value():.1f}, {self.yaw_ctrl.get_value():.1f}, {self.zoom_ctrl.get_value():.1f}"
@@ -172,6 +371,13 @@ class VideoStreamWidget(QWidget):
             self.gimbal_sock.sendto(cmd_str.encode('utf-8'), (self.rpi_ip, self.gimbal_port))
         except Exception as e: print(f"[Gimbal] Error: {e}")
 
+    def set_video_delay(self, delay_ms):
+        """Sets how much later frames arrive than their detections, in ms."""
+        self.detection_timeline.video_delay_ms = delay_ms
+        # Outcome counts from the old delay would hide the effect of the new one
+        self.detection_timeline.reset_stats()
+        if self.video_delay_spin.value() != delay_ms: self.video_delay_spin.setValue(delay_ms)
+
     def update_rpi_ip(self):
         new_ip = self.rpi_ip_input.text()
         if new_ip:
@@ -182,53 +388,207 @@ class VideoStreamWidget(QWidget):
         if self.video_thread and self.video_thread.isRunning(): self.video_thread.stop()
         if not source.strip():
             source = ('udpsrc port=5000 caps="application/x-rtp, media=video, encoding-name=H264, clock-rate=90000, payload=96" ! rtph264depay ! avdec_h264 ! videoconvert ! video/x-raw, format=BGR ! appsink drop=1')
-        self.video_thread = VideoThread(source)
-        self.video_thread.change_pixmap_signal.connect(self.update_video_frame)
+        self.frame_mailbox.clear()
+        self.video_stats.reset()
+        self.detection_timeline.clear()
+        self._last_frame_time = None
+        self.video_thread = VideoThread(source, self.frame_mailbox, self.frame_pool,
+                                        display_scale=self.display_scale if self.adaptive_resolution else 1.0)
+        self.video_thread.frame_ready.connect(self.update_video_frame)
         self.video_thread.start()
 
-    @pyqtSlot(np.ndarray)
-    def update_video_frame(self, cv_img):
+    def get_frame_stats(self):
+        """Returns handoff counters (posted/taken/dropped) and buffer allocation counters."""
+        stats = self.frame_mailbox.stats()
+        stats.update(self.frame_pool.stats())
+        stats['capture_allocations'] = self.video_thread.capture_allocations if self.video_thread else 0
+        return stats
+
+    def get_video_stats(self):
+        """
+        Returns end-to-end latency percentiles per stage (ms, appsink pull to paint),
+        decode/render FPS and the frame handoff and buffer counters.
+        """
+        stats = self.video_stats.summary()
+        stats.update(self.get_frame_stats())
+        return stats
+
+    def dump_video_stats(self, path):
+        """Writes per-frame timestamps to `path` (.csv) or summary plus records (.json)."""
+        self.video_stats.dump(path, extra=self.get_frame_stats())
+
+    def set_stats_overlay_visible(self, visible):
+        self.stats_hud.setVisible(visible)
+        if visible:
+            self.update_stats_hud()
+            self.stats_hud_timer.start(500)
+        else:
+            self.stats_hud_timer.stop()
+        if self.stats_button.isChecked() != visible: self.stats_button.setChecked(visible)
+
+    def update_stats_hud(self):
+        stats = self.get_video_stats()
+        total = stats.get('latency_ms', {}).get('total')
+        lines = [
+            f"latency p50/p95/p99: {total['p50']:.1f}/{total['p95']:.1f}/{total['p99']:.1f} ms" if total else "latency: n/a",
+            f"decode {stats.get('decode_fps', 0):.1f} fps  render {stats.get('render_fps', 0):.1f} fps",
+            f"dropped {stats['dropped']}  unpainted {stats['frames_unpainted']}",
+        ]
+        sync = self.detection_timeline.stats()
+        lookups = sum(sync[k] for k in LOOKUP_OUTCOMES)
+        if lookups:
+            lines.append(f"boxes: interpolated {100 * sync['interpolated'] / lookups:.0f}%  "
+                         f"held {100 * sync['held'] / lookups:.0f}%  delay {sync['video_delay_ms']:.0f} ms")
+        self.stats_hud_text.setText("\n".join(lines))
+        self.stats_hud.setRect(self.stats_hud_text.boundingRect().adjusted(0, 0, 8, 4))
+
+    def release_frame(self, frame):
+        self.frame_pool.release(frame.image)
+
+    @pyqtSlot(float)
+    def on_view_scale_changed(self, scale):
+        self.display_scale = scale
+        if self.video_thread and self.adaptive_resolution:
+            self.video_thread.set_display_scale(scale)
+
+    @pyqtSlot()
+    def update_video_frame(self):
+        frame = self.frame_mailbox.take()
+        if frame is None: return
+        frame.t_taken = self._last_frame_time = time.perf_counter()
         try:
-            cv_img = np.ascontiguousarray(cv_img)
-            rgb_image = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb_image.shape
-            qt_image = QImage(rgb_image.data, w, h, ch * w, QImage.Format.Format_RGB888)
+            qt_image = ndarray_to_qimage(frame.image)
+            # For RGB32 frames the raster pixmap shares the buffer instead of copying it
             self.video_pixmap_item.setPixmap(QPixmap.fromImage(qt_image))
-        except Exception as e: print(f"[UI] Error updating video frame: {e}")
+            self.fit_video_item(frame)
+        except Exception as e:
+            print(f"[UI] Error updating video frame: {e}")
+            self.release_frame(frame)
+            return
+        frame.t_uploaded = time.perf_counter()
+        if self.sync_detections and len(self.detection_timeline):
+            self.update_bounding_boxes(self.detection_timeline.lookup_frame(frame))
+        if self.video_pixmap_item.pending_frame is not None: self.video_stats.frames_unpainted += 1
+        self.video_pixmap_item.pending_frame = frame
+        # The displayed buffer goes back to the pool only once a newer frame replaces it
+        if self._displayed_frame is not None: self.release_frame(self._displayed_frame)
+        self._displayed_frame = frame
+
+    def fit_video_item(self, frame):
+        """Scales a downscaled pixmap back up to source coordinates so bounding boxes still line up."""
+        h, w = frame.image.shape[:2]
+        scale = (frame.source_width / w, frame.source_height / h)
+        if scale != self._video_item_scale:
+            self._video_item_scale = scale
+            self.video_pixmap_item.setTransform(QTransform.fromScale(*scale))
+
+    def set_overlay_mode(self, mode):
+        if mode not in self.OVERLAY_MODES:
+            print(f"[UI] Unknown overlay mode '{mode}', using items")
+            mode = "items"
+        # Clear whichever overlay is being switched away from
+        if mode == "batched": self.update_item_boxes([])
+        else: self.bbox_layer.set_boxes([])
+        self.bbox_layer.setVisible(mode == "batched")
+        self.overlay_mode = mode
 
     def update_bounding_boxes(self, object_list):
-        for item in self.bbox_items.values():
-            if item.scene(): self.scene.removeItem(item)
-        self.bbox_items.clear()
+        if self.overlay_mode == "batched": self.bbox_layer.set_boxes(object_list)
+        else: self.update_item_boxes(object_list)
+
+    def update_item_boxes(self, object_list):
+        """
+        Reconciles the scene with `object_list` by obj_id: existing boxes are moved in place,
+        new ones come from the recycle pool, and boxes that disappeared are hidden and pooled.
+        """
+        seen = set()
         for arr in object_list:
             try:
                 x_min, y_min, x_max, y_max, conf, obj_id = arr
+                # Synchronised/interpolated detections arrive as float arrays
+                if isinstance(obj_id, float): obj_id = int(obj_id)
                 rect = QRectF(x_min, y_min, x_max - x_min, y_max - y_min)
                 obj_dict = {"id": obj_id, "label": f"obj_{obj_id}", "data": f"Conf: {conf:.2f}"}
+            except: continue
+            seen.add(obj_id)
+            bbox = self.bbox_items.get(obj_id)
+            if bbox is not None:
+                bbox.update_object(obj_dict, rect)
+            elif self.bbox_pool:
+                bbox = self.bbox_pool.pop()
+                bbox.update_object(obj_dict, rect)
+                bbox.setVisible(True)
+                self.bbox_items[obj_id] = bbox
+            else:
                 bbox = BoundingBoxItem(obj_dict, rect, on_click_callback=self.send_control_packet)
                 bbox.setZValue(1); self.scene.addItem(bbox); self.bbox_items[obj_id] = bbox
-            except: pass
+        if len(seen) == len(self.bbox_items): return
+        for obj_id in [k for k in self.bbox_items if k not in seen]:
+            bbox = self.bbox_items.pop(obj_id)
+            if len(self.bbox_pool) < self.BBOX_POOL_SIZE:
+                bbox.setVisible(False); self.bbox_pool.append(bbox)
+            else: self.scene.removeItem(bbox)
 
     def start_udp_listener(self):
-        self.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        try: self.udp_sock.bind(("0.0.0.0", self.rpi_port))
-        except: return
-        self.udp_sock.setblocking(False)
-        self.poll_timer = QTimer(self)
-        self.poll_timer.timeout.connect(self.poll_udp_socket)
-        self.poll_timer.start(100)
-
-    def poll_udp_socket(self):
-        try:
-            while True:
-                data, _ = self.udp_sock.recvfrom(4096)
-                payload = json.loads(data.decode('utf-8'))
-                if "objects" in payload: self.update_bounding_boxes(payload["objects"])
-        except: pass
+        self.reassembler = Reassembler()
+        # Datagrams dropped because they failed to decode or to apply
+        self.detection_errors = 0
+        try: self.udp_receiver = DatagramReceiver(self.rpi_port, parent=self)
+        except OSError as e:
+            print(f"[UI] Could not listen for detections on UDP {self.rpi_port}: {e}")
+            self.udp_receiver = None
+            return
+        # Room for a few chunked 10k-object frames between GUI wakeups
+        self.udp_receiver.set_receive_buffer(4 * 1024 * 1024)
+        self.udp_receiver.datagrams_received.connect(self.on_detection_datagrams)
+
+    def on_detection_datagrams(self, batch):
+        # Chunks of oversized packets are reassembled first, in arrival order
+        packets = []
+        for data, addr in batch:
+            if data and data[0] == CHUNK_MAGIC:
+                data = self.reassembler.feed(data)
+                if data is None: continue
+            packets.append((data, addr))
+        # Each packet is a full detection set, so only the newest good one in a burst matters
+        for data, addr in reversed(packets):
+            # One bad packet must not escape this slot, which would abort the application
+            try:
+                packet = decode_detections(data)
+                self.apply_detections(packet)
+            except Exception as e:
+                self.detection_errors += 1
+                print(f"[UI] Bad detection packet from {addr}: {e}")
+                continue
+            # A Pi that sends binary detections understands binary control packets too
+            if packet.binary: self.peer_binary = True
+            return
+
+    def get_udp_stats(self):
+        """Datagram counters of the detection port, chunk reassembly counters and dropped packets."""
+        stats = self.udp_receiver.stats() if self.udp_receiver else {}
+        stats.update(self.reassembler.stats())
+        stats['detection_errors'] = self.detection_errors
+        return stats
+
+    def apply_detections(self, packet):
+        """
+        While video is playing, detections go into the timeline and are drawn by the frame
+        they belong to; without video, or while no frame has arrived for max_gap_ms
+        (stalled or not yet started stream), they are drawn immediately.
+        """
+        now = time.perf_counter()
+        if not (self.sync_detections and self.video_thread and self.video_thread.isRunning()):
+            self.update_bounding_boxes(packet.objects)
+            return
+        # Stored even while stalled, so pairing resumes with history when frames do
+        self.detection_timeline.add(packet.objects, now, ts=packet.ts)
+        if self._last_frame_time is None or (now - self._last_frame_time) * 1000 > self.detection_timeline.max_gap_ms:
+            self.update_bounding_boxes(packet.objects)
     
     def send_control_packet(self, metadata):
-        packet = {"id": metadata.get("id", -1), "camera_mode": 1, "tracking_mode": 1}
-        try: self.send_sock.sendto(json.dumps(packet).encode('utf-8'), (self.rpi_ip, self.rpi_port_s))
+        data = encode_control(metadata.get("id", -1), camera_mode=1, tracking_mode=1, binary=self.peer_binary)
+        try: self.send_sock.sendto(data, (self.rpi_ip, self.rpi_port_s))
         except: pass
     
     def closeEvent(self, event):